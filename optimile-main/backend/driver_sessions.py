@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+"""
+Per-driver reoptimization state.
+
+A driver's app posts a /reoptimize on every deviation ping, often every
+few seconds for the same detour. The session of each driver (keyed by
+the request's `driver_id`) remembers
+
+    last_reopt_at    wall-clock time of the last reroute (0 = never)
+    handled_delay    delay (min) that reroute planned around
+    last_plan_id     plan it issued, the warm start of the next one
+    last_stops       stop positions it covered
+    last_conditions  fingerprint of traffic / incidents / profile then
+    last_trigger_at  time of the latest trigger, rerouted or not
+    pending_delay    largest delay of the current burst of triggers
+
+so the endpoint can apply a real cooldown, merge a burst of triggers
+into one decision, and treat changed inputs (new stops, new incidents)
+as new information.
+
+Sessions are plain JSON-ready dicts held by a backend with `get` / `put`.
+The default keeps them in this process (bounded LRU); any other store
+(Redis, a database) plugs in through $OPTIMILE_SESSION_BACKEND =
+"package.module:factory", a zero-argument callable that returns an
+object with the same two methods.
+"""
+
+import importlib
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+SESSION_BACKEND_ENV = "OPTIMILE_SESSION_BACKEND"
+
+
+def new_session() -> Dict:
+    return {
+        "last_reopt_at": 0.0,
+        "handled_delay": 0.0,
+        "last_plan_id": None,
+        "last_stops": [],
+        "last_conditions": None,
+        "last_trigger_at": 0.0,
+        "pending_delay": 0.0,
+    }
+
+
+class InMemorySessionBackend:
+    """Bounded LRU map driver_id -> session (thread-safe)."""
+
+    def __init__(self, max_sessions: int = 10_000):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, driver_id: str) -> Optional[Dict]:
+        with self._lock:
+            session = self._sessions.get(driver_id)
+            if session is not None:
+                self._sessions.move_to_end(driver_id)
+                session = dict(session)
+            return session
+
+    def put(self, driver_id: str, session: Dict):
+        with self._lock:
+            self._sessions[driver_id] = dict(session)
+            self._sessions.move_to_end(driver_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+
+def load_backend(spec: Optional[str] = None):
+    """Backend named by `spec` ("module:factory"), or the in-memory one."""
+    spec = spec if spec is not None else os.getenv(SESSION_BACKEND_ENV)
+    if not spec:
+        return InMemorySessionBackend()
+    module, _, name = spec.partition(":")
+    if not name:
+        raise ValueError(f"{SESSION_BACKEND_ENV} must look like 'package.module:factory'")
+    return getattr(importlib.import_module(module), name)()
+
+
+class SessionStore:
+    """Read-modify-write access to driver sessions over a backend."""
+
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else InMemorySessionBackend()
+        # serializes updates made by this process; a shared backend sees
+        # last-writer-wins across processes, which only loosens debouncing
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def session(self, driver_id: str) -> Iterator[Dict]:
+        """Yield the driver's session (a new one if unknown) and store it back."""
+        with self._lock:
+            session = self.backend.get(driver_id) or new_session()
+            yield session
+            self.backend.put(driver_id, session)
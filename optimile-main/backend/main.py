@@ -1,17 +1,121 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel, StrictInt
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional, Tuple
 from datetime import datetime
+from contextlib import asynccontextmanager
+import asyncio
 import json
+import math
+import os
+import time
 from model.impact import estimate_delay
-from model.decision import should_reoptimize
-from model.traffic_provider import fetch_incidents_along_route
+from model.decision import should_reoptimize, window_slack
+from model.eta_model import default_eta_model, eta_model_path
+from model.traffic_provider import TrafficProvider
+from model.fleet import merge_polish
+from model.incidents import check_incidents
+from model.parallel import run_chain
+from model.road_network import default_network, network_path
+from model.time_profile import SpeedProfile
+from backend.driver_sessions import SessionStore, load_backend
+from backend.plan_store import PlanStore, order_from_plan, stop_key
+from backend.response_cache import ResponseCache, fingerprint, request_key
+from backend.solver_jobs import (
+    finish_decomposed,
+    solve_chains,
+    solve_decomposed,
+    solve_fleet,
+    solve_route,
+    start_decomposed,
+    stitch_decomposed,
+)
+from backend.solver_pool import SolverBusy, SolverPool, SolverUnavailable
 
-from model.alns_optimizer import optimize_route, route_cost
-import joblib
 
+# =========================
+# SOLVER POOL
+# =========================
+
+# One process pool runs every ALNS job, created once at startup; past
+# SOLVER_QUEUE waiting jobs new ones are refused with 429.
+SOLVER_WORKERS = int(os.getenv("OPTIMILE_SOLVER_WORKERS", os.cpu_count() or 1))
+SOLVER_QUEUE = int(os.getenv("OPTIMILE_SOLVER_QUEUE", 2 * SOLVER_WORKERS))
+
+solver_pool = SolverPool(SOLVER_WORKERS, SOLVER_QUEUE)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # map the road graph before the pool forks, so workers share its pages
+    if network_path() is not None:
+        default_network()
+    # same for the trained ETA pipeline (memory-mapped)
+    if eta_model_path() is not None:
+        default_eta_model()
+    solver_pool.start()
+    # pooled, tile-cached live incidents, refreshed in the background
+    app.state.traffic = TrafficProvider()
+    app.state.traffic.start()
+    try:
+        yield
+    finally:
+        solver_pool.shutdown()
+        await app.state.traffic.close()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
+
+# recently issued plans, for warm-started reroutes
+plan_store = PlanStore()
+
+# repeated /optimize and /reoptimize requests (client retries and
+# double-sends) are answered from here instead of running ALNS again
+RESPONSE_CACHE_TTL_S = float(os.getenv("OPTIMILE_RESPONSE_CACHE_TTL_S", 30))
+RESPONSE_CACHE_SIZE = int(os.getenv("OPTIMILE_RESPONSE_CACHE_SIZE", 1024))
+response_cache = ResponseCache(max_entries=RESPONSE_CACHE_SIZE, ttl_s=RESPONSE_CACHE_TTL_S)
+
+# per-driver reroute cooldown / debounce state (see backend.driver_sessions)
+driver_sessions = SessionStore(load_backend())
+
+# triggers this close to the previous one are one burst, decided on its
+# largest delay
+TRIGGER_BURST_S = 10.0
+
+# =========================
+# SEARCH BUDGET (server-side caps)
+# =========================
+
+# /optimize plans a whole shift; /reoptimize runs while the driver is
+# moving and must answer within a hard latency budget.
+OPTIMIZE_TIME_LIMIT_MS = 2000
+REOPTIMIZE_TIME_LIMIT_MS = 300
+MAX_ITERS = 400
+
+# A reroute seeded with the driver's current plan only polishes it:
+# fewer iterations, a tighter deadline and a cold annealing schedule.
+WARM_START_TIME_LIMIT_MS = 150
+WARM_START_ITERS = 150
+WARM_START_NO_IMPROVE = 40
+WARM_START_TEMPERATURE = 0.02
+
+# One deadline covers a whole /reoptimize, from the request to the new
+# route: the live incident lookup may use at most TRAFFIC_WAIT_MS of it
+# (tiles not loaded by then fall back to their last cached incidents),
+# and the search gets what is left, capped as above and never less than
+# REOPTIMIZE_MIN_SEARCH_MS.
+REOPTIMIZE_DEADLINE_MS = int(os.getenv("OPTIMILE_REOPTIMIZE_DEADLINE_MS", 800))
+TRAFFIC_WAIT_MS = int(os.getenv("OPTIMILE_TRAFFIC_WAIT_MS", 250))
+REOPTIMIZE_MIN_SEARCH_MS = 50
+
+# Past this many stops /optimize splits the day into clusters
+# (model.decompose) instead of one ALNS over every stop.
+DECOMPOSE_MIN_STOPS = 300
+DECOMPOSED_TIME_LIMIT_MS = 10000
+
+# /optimize-fleet plans a whole fleet's shift in one call
+FLEET_TIME_LIMIT_MS = 10000
+FLEET_MAX_ITERS = 5000
 
 # =========================
 # API MODELS
@@ -28,9 +132,40 @@ class Stop(BaseModel):
 
 
 class Incident(BaseModel):
-    index: StrictInt          # index in stops / remaining_stops list
+    """A stop-attached or located incident (see model.incidents)."""
+    index: Optional[StrictInt] = None   # index in stops / remaining_stops list ...
+    lat: Optional[float] = None         # ... or a location
+    lng: Optional[float] = None
     kind: str                 # traffic_jam | accident | road_closed
     severity: float = 1.0
+    radius: float = 0.0                 # reach in km (0 = its own stop only)
+    scope: Optional[Literal["stop", "leg"]] = None   # default: stop with an index, leg with a location
+
+
+class SpeedProfileSpec(BaseModel):
+    """Time-of-day travel-time multipliers (see model.time_profile)."""
+    starts: List[float]                 # bucket starts, minutes of the day from 0
+    multipliers: List[List[float]]      # one row per zone, one value per bucket
+    centres: Optional[List[Tuple[float, float]]] = None   # zone centres (lat, lng)
+
+
+# starting-route heuristic (see model.construction); "auto" picks one by
+# the windows, "best" runs all and starts from the cheapest
+Construction = Literal[
+    "auto", "best", "identity", "nearest_neighbour", "time_window", "cheapest_insertion"
+]
+
+# large-day decomposition (see model.decompose); "auto" = k-means past
+# DECOMPOSE_MIN_STOPS stops
+Decomposition = Literal["auto", "kmeans", "sweep", "none"]
+
+# leg distance model (see model.distance); "euclidean" is the original
+# straight line on raw lat/lng, "network" needs OPTIMILE_ROAD_NETWORK
+DistanceMode = Literal["euclidean", "haversine", "road", "network"]
+
+# leg travel times: distance / vehicle speed x traffic ("speed"), or the
+# trained ETA model (see model.eta_model), which needs OPTIMILE_ETA_MODEL
+TravelTimeMode = Literal["speed", "model"]
 
 
 class OptimizeRequest(BaseModel):
@@ -42,11 +177,61 @@ class OptimizeRequest(BaseModel):
     # minutes since midnight (no datetime parsing, no silent casting)
     start_time: Optional[StrictInt] = None
 
-    # optional real-time incidents affecting specific stops
+    # optional real-time incidents at stops or on the roads between them
     incidents: Optional[List[Incident]] = None
 
+    # optional search budget (capped server-side)
+    time_limit_ms: Optional[StrictInt] = None
+    max_no_improve: Optional[StrictInt] = None
+    target_gap: Optional[float] = None
+
+    # optional multi-start: independent ALNS chains on the solver pool
+    chains: Optional[StrictInt] = None
+    exchange_every: Optional[StrictInt] = None
+
+    construction: Construction = "auto"
+    decomposition: Decomposition = "auto"
+    distance: DistanceMode = "euclidean"
+    travel_time: TravelTimeMode = "speed"
+    # replaces the traffic-level multiplier with time-of-day speeds
+    speed_profile: Optional[SpeedProfileSpec] = None
+
+
+class FleetStop(Stop):
+    demand: float = 1.0       # load units the stop takes up
+
+
+class Vehicle(BaseModel):
+    id: Optional[str] = None
+    vehicle: str = "van"      # motorcycle | scooter | van
+    start_lat: float
+    start_lng: float
+    capacity: Optional[float] = None   # None = unlimited
+
+
+class FleetRequest(BaseModel):
+    stops: List[FleetStop]
+    vehicles: List[Vehicle]
+    traffic: str
+    weather: str
+
+    start_time: Optional[StrictInt] = None
+    incidents: Optional[List[Incident]] = None
+
+    # optional search budget (capped server-side)
+    time_limit_ms: Optional[StrictInt] = None
+    max_no_improve: Optional[StrictInt] = None
+
+    distance: DistanceMode = "euclidean"
+    travel_time: TravelTimeMode = "speed"
+    # replaces the traffic-level multiplier with time-of-day speeds
+    speed_profile: Optional[SpeedProfileSpec] = None
+
 
 class ReoptimizeRequest(BaseModel):
+    # enables the per-driver cooldown and trigger debouncing
+    driver_id: Optional[str] = None
+
     current_lat: float
     current_lng: float
     remaining_stops: List[Stop]
@@ -57,13 +242,170 @@ class ReoptimizeRequest(BaseModel):
     severity: Optional[float] = None
     incidents: Optional[List[Incident]] = None
 
+    # optional search budget (capped server-side)
+    time_limit_ms: Optional[StrictInt] = None
+    max_no_improve: Optional[StrictInt] = None
+    target_gap: Optional[float] = None
+
+    # optional warm start: the driver's current plan, either as indices
+    # into remaining_stops or as the plan_id of a previous response
+    previous_order: Optional[List[StrictInt]] = None
+    plan_id: Optional[str] = None
+
+    distance: DistanceMode = "euclidean"
+    travel_time: TravelTimeMode = "speed"
+    # replaces the traffic-level multiplier with time-of-day speeds
+    speed_profile: Optional[SpeedProfileSpec] = None
+
+    # starting-route heuristic when there is no plan to warm-start from
+    construction: Construction = "auto"
+
+
+def search_budget(
+    req,
+    time_cap_ms: int,
+    iters_cap: int = MAX_ITERS,
+    default_no_improve: Optional[int] = None,
+) -> dict:
+    """
+    Clamp the client's stopping criteria to the server caps.
+
+    The time limit always applies: a missing or larger value falls back
+    to `time_cap_ms`.
+    """
+    time_limit_ms = time_cap_ms
+    if req.time_limit_ms is not None:
+        time_limit_ms = max(1, min(req.time_limit_ms, time_cap_ms))
+
+    max_no_improve = default_no_improve
+    if req.max_no_improve is not None:
+        max_no_improve = max(1, min(req.max_no_improve, iters_cap))
+
+    # not every endpoint takes a target gap (no lower bound for fleets)
+    target_gap = getattr(req, "target_gap", None)
+    if target_gap is not None:
+        target_gap = max(0.0, float(target_gap))
+
+    return {
+        "iters": iters_cap,
+        "time_limit_ms": time_limit_ms,
+        "max_no_improve": max_no_improve,
+        "target_gap": target_gap,
+    }
+
+
+def check_distance(req):
+    if req.distance == "network" and network_path() is None:
+        raise HTTPException(
+            status_code=422, detail="distance 'network' needs a road network (OPTIMILE_ROAD_NETWORK)"
+        )
+    if req.travel_time == "model" and eta_model_path() is None:
+        raise HTTPException(
+            status_code=422, detail="travel_time 'model' needs a trained ETA model (OPTIMILE_ETA_MODEL)"
+        )
+
+
+def speed_profile(req) -> Optional[SpeedProfile]:
+    spec = req.speed_profile
+    if spec is None:
+        return None
+    try:
+        return SpeedProfile(spec.starts, spec.multipliers, spec.centres)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"speed_profile: {e}")
+
+
+def incident_list(req, n_stops: int, offset: int = 0) -> List[dict]:
+    """Request incidents as model dicts, stop indexes shifted by `offset`."""
+    incidents = [inc.model_dump(exclude_none=True) for inc in req.incidents or ()]
+    try:
+        check_incidents(incidents, n_stops)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"incidents: {e}")
+    for inc in incidents:
+        if "index" in inc:
+            inc["index"] += offset
+    return incidents
+
+
+async def run_solver(fn, *args, slots: int = 1, fanout: bool = False):
+    """Await a solver job on the pool; a full queue is 429, a dead pool 503."""
+    try:
+        if fanout:
+            return await solver_pool.run_fanout(fn, *args, slots=slots)
+        return await solver_pool.run(fn, *args, slots=slots)
+    except SolverBusy as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except SolverUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@asynccontextmanager
+async def solver_slots(slots: int):
+    """Hold pool slots across the phases of one job; same errors as run_solver."""
+    try:
+        async with solver_pool.slots(slots) as executor:
+            yield executor
+    except SolverBusy as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except SolverUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+async def run_decomposed(job: Dict) -> Dict:
+    """
+    A decomposed day on every pool worker: partition, stitch and seam
+    repair each run in one worker, the clusters and seams in parallel.
+    """
+    async with solver_slots(SOLVER_WORKERS) as executor:
+        start = await solver_pool.call(executor, start_decomposed, job)
+        clusters = await solver_pool.map(executor, run_chain, start["jobs"])
+        stitched = await solver_pool.call(
+            executor, stitch_decomposed, start["decomposition"], clusters
+        )
+        seams = await solver_pool.map(executor, run_chain, stitched["jobs"])
+        return await solver_pool.call(
+            executor, finish_decomposed, stitched["decomposition"], seams, start["baseline_cost"]
+        )
+
+
+async def run_fleet(job: Dict, slots: int) -> Dict:
+    """The fleet search in one pool worker, then its per-route polish in parallel."""
+    async with solver_slots(slots) as executor:
+        result = await solver_pool.call(executor, solve_fleet, dict(job, defer_polish=True))
+        jobs = result.pop("polish_jobs")
+        polished = await solver_pool.map(executor, run_chain, [j for _, j in jobs])
+    result["routes"], result["cost"] = merge_polish(
+        result["routes"], result["cost"], result["stats"], jobs, polished
+    )
+    return result
+
 
 # =========================
 # OPTIMIZE
 # =========================
 
+def remaining_ms(deadline: float) -> float:
+    """Milliseconds left until `deadline` (a time.monotonic() value)."""
+    return 1000.0 * (deadline - time.monotonic())
+
+
+def start_minute(start_time: Optional[int] = None) -> int:
+    """The request's start time, or now, in minutes since midnight."""
+    if start_time is not None:
+        return int(start_time)
+    now = datetime.now()
+    return now.hour * 60 + now.minute
+
+
 @app.post("/optimize")
-def optimize(req: OptimizeRequest):
+async def optimize(req: OptimizeRequest):
+    key = request_key("optimize", req, start_minute(req.start_time))
+    return await response_cache.get_or_compute(key, lambda: run_optimize(req))
+
+
+async def run_optimize(req: OptimizeRequest):
+    check_distance(req)
     coords = [(s.lat, s.lng) for s in req.stops]
 
     fragile_flags = [s.is_fragile for s in req.stops]
@@ -86,36 +428,58 @@ def optimize(req: OptimizeRequest):
         "weather": req.weather,
         "order_minutes": start_time,
         "day_of_week": dt.weekday(),
+        "distance": req.distance,
+        "travel_time": req.travel_time,
+        "profile": speed_profile(req),
+        # every reported incident, near a stop or on the legs around it
+        "incidents": incident_list(req, len(coords)),
     }
 
-    # optional single incident – pick the most severe if provided
-    if req.incidents:
-        most_severe = max(req.incidents, key=lambda x: x.severity)
-        context["incident"] = {
-            "index": int(most_severe.index),
-            "kind": most_severe.kind,
-            "severity": float(most_severe.severity),
-        }
+    method = req.decomposition
+    if method == "auto":
+        method = "kmeans" if len(coords) > DECOMPOSE_MIN_STOPS else "none"
 
-    # baseline identity route cost (for logging / validation)
-    baseline_route = list(range(len(coords)))
+    n_chains = min(req.chains or 1, SOLVER_WORKERS)
 
-    baseline_cost = route_cost(
-        baseline_route,
-        coords,
-        fragile_flags,
-        time_windows,
-        start_time,
-        context,
-    )
+    job = {
+        "coords": coords,
+        "fragile_flags": fragile_flags,
+        "time_windows": time_windows,
+        "context": context,
+        "start_time_min": start_time,  # ← minutes
+    }
 
-    order, cost = optimize_route(
-        coords=coords,
-        fragile_flags=fragile_flags,
-        time_windows=time_windows,
-        context=context,
-        start_time_min=start_time,  # ← minutes
-    )
+    # baseline is the identity route cost (for logging / validation)
+    if method != "none":
+        # a large day: clusters run in parallel when the pool has workers to spare
+        budget = search_budget(req, DECOMPOSED_TIME_LIMIT_MS)
+        job.update(
+            method=method,
+            iters=budget["iters"],
+            time_limit_ms=budget["time_limit_ms"],
+            workers=SOLVER_WORKERS,
+        )
+        if SOLVER_WORKERS > 1:
+            result = await run_decomposed(job)
+        else:
+            result = await run_solver(solve_decomposed, job)
+    elif n_chains > 1:
+        job.update(
+            n_chains=n_chains,
+            exchange_every=req.exchange_every,
+            construction=req.construction,
+            budget=search_budget(req, OPTIMIZE_TIME_LIMIT_MS),
+        )
+        result = await run_solver(solve_chains, job, slots=n_chains, fanout=True)
+    else:
+        job["budget"] = dict(
+            construction=req.construction, **search_budget(req, OPTIMIZE_TIME_LIMIT_MS)
+        )
+        result = await run_solver(solve_route, job)
+
+    order, cost, stats = result["order"], result["cost"], result["stats"]
+    baseline_cost = result["baseline_cost"]
+    chains = result.get("chains")
 
     improvement = baseline_cost - cost
 
@@ -126,7 +490,9 @@ def optimize(req: OptimizeRequest):
         f"n_stops={len(coords)} "
         f"baseline_cost={baseline_cost:.3f} "
         f"optimized_cost={cost:.3f} "
-        f"improvement={improvement:.3f}"
+        f"improvement={improvement:.3f} "
+        f"construction={stats['construction']}:{stats['construction_cost']:.3f} "
+        f"iterations={stats['iterations']} stop={stats['stop_reason']}"
     )
 
     return {
@@ -141,6 +507,115 @@ def optimize(req: OptimizeRequest):
             for i in order
         ],
         "cost": round(cost, 3),
+        "construction": stats["construction"],
+        "construction_cost": round(stats["construction_cost"], 3),
+        "iterations": stats["iterations"],
+        "stop_reason": stats["stop_reason"],
+        "chains": chains,
+        "clusters": stats.get("clusters"),
+        "plan_id": plan_store.save([coords[i] for i in order]),
+    }
+
+
+# =========================
+# OPTIMIZE FLEET (VRPTW)
+# =========================
+
+@app.post("/optimize-fleet")
+async def optimize_fleet_endpoint(req: FleetRequest):
+    if not req.vehicles:
+        raise HTTPException(status_code=422, detail="at least one vehicle is required")
+    check_distance(req)
+
+    coords = [(s.lat, s.lng) for s in req.stops]
+    fragile_flags = [s.is_fragile for s in req.stops]
+    time_windows = [(s.window_start, s.window_end) for s in req.stops]
+    demands = [s.demand for s in req.stops]
+
+    vehicles = [
+        {
+            "vehicle": v.vehicle.lower(),
+            "start": (v.start_lat, v.start_lng),
+            "capacity": v.capacity,
+        }
+        for v in req.vehicles
+    ]
+
+    if req.start_time is not None:
+        start_time = int(req.start_time)
+        dt = datetime.now()
+    else:
+        dt = datetime.now()
+        start_time = dt.hour * 60 + dt.minute
+
+    context = {
+        "traffic": req.traffic,
+        "weather": req.weather,
+        "order_minutes": start_time,
+        "day_of_week": dt.weekday(),
+        "distance": req.distance,
+        "travel_time": req.travel_time,
+        "profile": speed_profile(req),
+        "incidents": incident_list(req, len(coords)),
+    }
+
+    budget = search_budget(req, FLEET_TIME_LIMIT_MS, iters_cap=FLEET_MAX_ITERS)
+    del budget["target_gap"]
+
+    job = dict(
+        coords=coords,
+        fragile_flags=fragile_flags,
+        time_windows=time_windows,
+        demands=demands,
+        vehicles=vehicles,
+        context=context,
+        start_time_min=start_time,
+        workers=SOLVER_WORKERS,
+        **budget,
+    )
+    if SOLVER_WORKERS > 1:
+        result = await run_fleet(job, slots=min(SOLVER_WORKERS, len(vehicles)))
+    else:
+        result = await run_solver(solve_fleet, job)
+    routes, cost, stats = result["routes"], result["cost"], result["stats"]
+
+    print(
+        "[OPTIMIZE-FLEET] "
+        f"traffic={req.traffic} n_stops={len(coords)} "
+        f"n_vehicles={len(vehicles)} "
+        f"construction_cost={stats['construction_cost']:.3f} "
+        f"optimized_cost={cost:.3f} "
+        f"unassigned={len(stats['unassigned'])} "
+        f"iterations={stats['iterations']} stop={stats['stop_reason']}"
+    )
+
+    return {
+        "routes": [
+            {
+                "vehicle_id": v.id,
+                "vehicle": v.vehicle,
+                "stops": [
+                    {
+                        "index": i,
+                        "lat": coords[i][0],
+                        "lng": coords[i][1],
+                        "is_fragile": fragile_flags[i],
+                        "window_start": time_windows[i][0],
+                        "window_end": time_windows[i][1],
+                    }
+                    for i in route
+                ],
+                "load": stats["loads"][k],
+                "cost": round(stats["route_costs"][k], 3),
+                "plan_id": plan_store.save([coords[i] for i in route]) if route else None,
+            }
+            for k, (v, route) in enumerate(zip(req.vehicles, routes))
+        ],
+        "unassigned": stats["unassigned"],
+        "cost": round(cost, 3),
+        "construction_cost": round(stats["construction_cost"], 3),
+        "iterations": stats["iterations"],
+        "stop_reason": stats["stop_reason"],
     }
 
 
@@ -148,8 +623,117 @@ def optimize(req: OptimizeRequest):
 # REOPTIMIZE (LIVE)
 # =========================
 
+def warm_start_seed(
+    req: ReoptimizeRequest, coords, session_plan_id: Optional[str] = None
+) -> Optional[List[int]]:
+    """
+    Partial seed route (indices into `coords`, 0 = driver) from the
+    driver's plan; the solver job inserts the stops it misses greedily.
+
+    `previous_order` wins over `plan_id`, which wins over the last plan
+    of the driver's session. Invalid or repeated indices are dropped.
+    """
+    n_remaining = len(req.remaining_stops)
+    plan_id = req.plan_id if req.plan_id is not None else session_plan_id
+
+    if req.previous_order is not None:
+        order = []
+        for i in req.previous_order:
+            if 0 <= i < n_remaining and i not in order:
+                order.append(i)
+    elif plan_id is not None:
+        plan = plan_store.get(plan_id)
+        if plan is None:
+            return None
+        order = order_from_plan(plan, coords[1:])
+    else:
+        return None
+
+    if not order:
+        return None
+
+    return [0] + [i + 1 for i in order]
+
+
+def reroute_decision(
+    req: ReoptimizeRequest, delay: float, coords, time_windows, start_time
+) -> Tuple[bool, Optional[str], Optional[Dict]]:
+    """
+    `should_reoptimize` on the real window slack of the driver's current
+    order and, with a `driver_id`, the driver's session: the cooldown
+    since the last reroute (void once stops or conditions change) and
+    the largest delay of the current burst of triggers.
+
+    Returns (reroute?, last plan_id of the session, session fields that
+    record the reroute). Those fields are only stored by `remember_plan`
+    once a plan exists: a reroute shed by the solver pool or failing must
+    not start the cooldown nor count its delay as handled.
+    """
+    context = {
+        "vehicle": req.vehicle,
+        "traffic": req.traffic,
+        "weather": req.weather,
+        "order_minutes": start_time,
+        "day_of_week": datetime.now().weekday(),
+        "distance": req.distance,
+        "travel_time": req.travel_time,
+        "profile": speed_profile(req),
+    }
+    slack = window_slack(list(range(len(coords))), coords, time_windows, start_time, context)
+    next_fragile = req.remaining_stops[0].is_fragile
+
+    if req.driver_id is None:
+        return should_reoptimize(delay, next_fragile, slack, math.inf), None, None
+
+    stops = [list(stop_key(s.lat, s.lng)) for s in req.remaining_stops]
+    conditions = fingerprint(
+        req.model_dump(
+            mode="json",
+            include={"vehicle", "traffic", "incidents", "distance", "travel_time", "speed_profile"},
+        )
+    )
+    now = time.time()
+
+    with driver_sessions.session(req.driver_id) as session:
+        if now - session["last_trigger_at"] <= TRIGGER_BURST_S:
+            delay = max(delay, session["pending_delay"])
+        session["last_trigger_at"] = now
+        session["pending_delay"] = delay
+
+        # new stops or new conditions are new information: no cooldown
+        changed = conditions != session["last_conditions"] or not (
+            set(map(tuple, stops)) <= set(map(tuple, session["last_stops"]))
+        )
+        since = math.inf if changed else now - session["last_reopt_at"]
+
+        if not should_reoptimize(delay, next_fragile, slack, since, session["handled_delay"]):
+            return False, session["last_plan_id"], None
+
+        reroute = {
+            "last_reopt_at": now,
+            "handled_delay": delay,
+            "last_stops": stops,
+            "last_conditions": conditions,
+            "pending_delay": 0.0,
+        }
+        return True, session["last_plan_id"], reroute
+
+
+def remember_plan(driver_id: str, plan_id: str, reroute: Dict):
+    """Record a reroute that produced `plan_id` (see `reroute_decision`)."""
+    with driver_sessions.session(driver_id) as session:
+        session.update(reroute, last_plan_id=plan_id)
+
+
 @app.post("/reoptimize")
-def reoptimize(req: ReoptimizeRequest):
+async def reoptimize(req: ReoptimizeRequest):
+    key = request_key("reoptimize", req, start_minute())
+    return await response_cache.get_or_compute(key, lambda: run_reoptimize(req))
+
+
+async def run_reoptimize(req: ReoptimizeRequest):
+    deadline = time.monotonic() + REOPTIMIZE_DEADLINE_MS / 1000.0
+    check_distance(req)
     event_delay = estimate_delay(
         event=req.reason,
         baseline_eta=20,  # nominal remaining ETA in minutes
@@ -158,16 +742,6 @@ def reoptimize(req: ReoptimizeRequest):
     if req.severity and req.severity > 0:
         event_delay = max(event_delay, req.severity * 15)  # severity 0.5 -> 7.5 min
 
-    should = should_reoptimize(
-        delay_minutes=event_delay,
-        next_stop_fragile=req.remaining_stops[0].is_fragile,
-        time_window_slack=15,
-        last_reopt_seconds=120,
-    )
-
-    if not should:
-        return {"rerouted": False}
-
     # ONLY remaining route (driver position + remaining stops)
     coords = [(req.current_lat, req.current_lng)] + [
         (s.lat, s.lng) for s in req.remaining_stops
@@ -181,25 +755,30 @@ def reoptimize(req: ReoptimizeRequest):
     now = datetime.now()
     start_time = now.hour * 60 + now.minute
 
+    # off the event loop: the session backend may be remote
+    should, session_plan_id, reroute = await asyncio.to_thread(
+        reroute_decision, req, event_delay, coords, time_windows, start_time
+    )
+
+    if not should:
+        response = {"rerouted": False}
+        if session_plan_id is not None:
+            response["plan_id"] = session_plan_id
+        return response
+
     # build real-time incident context from:
     #  - explicit incidents (mobile reports)
     #  - live provider API (TomTom example)
     #  - high-level reason / severity
     incident_ctx = None
 
-    live_incidents = fetch_incidents_along_route(coords)
+    traffic_wait_ms = min(TRAFFIC_WAIT_MS, remaining_ms(deadline) - REOPTIMIZE_MIN_SEARCH_MS)
+    live_incidents = await app.state.traffic.incidents_along_route(
+        coords, timeout=max(0.0, traffic_wait_ms) / 1000.0
+    )
 
-    candidate_incidents = []
-    if req.incidents:
-        # shift indices by +1 because 0 is current driver location
-        for inc in req.incidents:
-            candidate_incidents.append(
-                {
-                    "index": int(inc.index) + 1,
-                    "kind": inc.kind,
-                    "severity": float(inc.severity),
-                }
-            )
+    # shift indices by +1 because 0 is current driver location
+    candidate_incidents = incident_list(req, len(req.remaining_stops), offset=1)
     candidate_incidents.extend(live_incidents)
 
     if not candidate_incidents and req.reason in ("traffic_jam", "accident", "road_closed"):
@@ -212,8 +791,8 @@ def reoptimize(req: ReoptimizeRequest):
         )
 
     if candidate_incidents:
-        most_severe = max(candidate_incidents, key=lambda x: x["severity"])
-        incident_ctx = most_severe
+        # all of them are costed; the most severe one names the reroute
+        incident_ctx = max(candidate_incidents, key=lambda x: x.get("severity", 1.0))
 
     context = {
         "vehicle": req.vehicle,
@@ -221,28 +800,51 @@ def reoptimize(req: ReoptimizeRequest):
         "weather": req.weather,
         "order_minutes": start_time,
         "day_of_week": now.weekday(),
+        "distance": req.distance,
+        "travel_time": req.travel_time,
+        "profile": speed_profile(req),
     }
 
-    if incident_ctx:
-        context["incident"] = incident_ctx
-
-    baseline_route = list(range(len(coords)))
-    baseline_cost = route_cost(
-        baseline_route,
-        coords,
-        fragile_flags,
-        time_windows,
-        start_time,
-        context,
+    if candidate_incidents:
+        context["incidents"] = candidate_incidents
+
+    seed = warm_start_seed(req, coords, session_plan_id)
+
+    if seed is not None:
+        # polish the driver's current plan instead of starting over
+        budget = search_budget(
+            req,
+            WARM_START_TIME_LIMIT_MS,
+            iters_cap=WARM_START_ITERS,
+            default_no_improve=WARM_START_NO_IMPROVE,
+        )
+        budget["temperature"] = WARM_START_TEMPERATURE
+    else:
+        budget = search_budget(req, REOPTIMIZE_TIME_LIMIT_MS)
+        budget["construction"] = req.construction
+
+    # the search runs on whatever the incident lookup left of the deadline
+    budget["time_limit_ms"] = int(
+        min(budget["time_limit_ms"], max(REOPTIMIZE_MIN_SEARCH_MS, remaining_ms(deadline)))
     )
 
-    order, cost = optimize_route(
-        coords=coords,
-        fragile_flags=fragile_flags,
-        time_windows=time_windows,
-        context=context,
-        start_time_min=start_time,
+    result = await run_solver(
+        solve_route,
+        {
+            "coords": coords,
+            "fragile_flags": fragile_flags,
+            "time_windows": time_windows,
+            "context": context,
+            "start_time_min": start_time,
+            # the remaining stops repeat between calls; only the driver (row 0) moves
+            "anchors": 1,
+            "seed": seed,
+            "budget": budget,
+        },
     )
+    order, cost, stats = result["order"], result["cost"], result["stats"]
+    baseline_cost = result["baseline_cost"]
+    seed_route = result["seed_route"]
 
     order = [i - 1 for i in order if i != 0]
 
@@ -257,11 +859,18 @@ def reoptimize(req: ReoptimizeRequest):
         f"reason={req.reason} delay={event_delay:.2f} "
         f"n_remaining={len(req.remaining_stops)} "
         f"live_incidents={live_incidents_found} "
+        f"warm_start={seed_route is not None} "
         f"baseline_cost={baseline_cost:.3f} "
         f"optimized_cost={cost:.3f} "
-        f"improvement={improvement:.3f}"
+        f"improvement={improvement:.3f} "
+        f"construction={stats['construction']}:{stats['construction_cost']:.3f} "
+        f"iterations={stats['iterations']} stop={stats['stop_reason']}"
     )
 
+    plan_id = plan_store.save([coords[i + 1] for i in order])
+    if req.driver_id is not None:
+        await asyncio.to_thread(remember_plan, req.driver_id, plan_id, reroute)
+
     return {
         "rerouted": True,
         "optimized_route": [
@@ -278,8 +887,50 @@ def reoptimize(req: ReoptimizeRequest):
         "reason": req.reason,
         "live_incidents_found": live_incidents_found,
         "incident_kind": incident_kind,
+        "construction": stats["construction"],
+        "construction_cost": round(stats["construction_cost"], 2),
+        "iterations": stats["iterations"],
+        "stop_reason": stats["stop_reason"],
+        "warm_start": seed_route is not None,
+        "plan_id": plan_id,
     }
 
+# =========================
+# RESPONSE CACHE STATS
+# =========================
+
+@app.get("/cache-stats")
+async def cache_stats():
+    return {
+        **response_cache.stats(),
+        "solver": solver_pool.stats(),
+        "traffic": app.state.traffic.stats(),
+    }
+
+
+def prometheus_text(prefix: str, stats: dict) -> List[str]:
+    """Numeric entries of a stats dict as Prometheus text lines (nested dicts get a sub-prefix)."""
+    lines = []
+    for key, value in stats.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            lines += prometheus_text(name, value)
+        elif isinstance(value, (bool, int, float)):
+            lines.append(f"{name} {float(value):g}")
+        elif isinstance(value, str):
+            # a state as a labelled gauge, e.g. breaker{state="open"} 1
+            lines.append(f'{name}{{state="{value}"}} 1')
+    return lines
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    lines = prometheus_text("optimile_response_cache", response_cache.stats())
+    lines += prometheus_text("optimile_solver", solver_pool.stats())
+    lines += prometheus_text("optimile_traffic", app.state.traffic.stats())
+    return "\n".join(lines) + "\n"
+
+
 # =========================
 # ANOMALY LOG (RESTORED)
 # =========================
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+"""
+In-memory store of issued route plans.
+
+Every /optimize and /reoptimize response carries a `plan_id`. A later
+/reoptimize can send that id back instead of the full previous order,
+and the optimizer warm-starts from the stored sequence.
+"""
+
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+Coord = Tuple[float, float]
+
+
+def stop_key(lat: float, lng: float) -> Coord:
+    """Stops are matched across requests by rounded position (~0.1 m)."""
+    return round(float(lat), 6), round(float(lng), 6)
+
+
+class PlanStore:
+    """Bounded LRU map plan_id -> ordered stop positions (thread-safe)."""
+
+    def __init__(self, max_plans: int = 10_000):
+        self.max_plans = max_plans
+        self._plans: "OrderedDict[str, List[Coord]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def save(self, stops: List[Coord]) -> str:
+        plan_id = uuid.uuid4().hex
+        with self._lock:
+            self._plans[plan_id] = [stop_key(lat, lng) for lat, lng in stops]
+            while len(self._plans) > self.max_plans:
+                self._plans.popitem(last=False)
+        return plan_id
+
+    def get(self, plan_id: str) -> Optional[List[Coord]]:
+        with self._lock:
+            plan = self._plans.get(plan_id)
+            if plan is not None:
+                self._plans.move_to_end(plan_id)
+            return plan
+
+
+def order_from_plan(plan: List[Coord], stops: List[Coord]) -> List[int]:
+    """
+    Indices into `stops` in the order they appear in `plan`.
+
+    Stops that are not in the plan (added since) are left out; the caller
+    inserts them. Duplicate positions are matched first come, first served.
+    """
+    slots: Dict[Coord, List[int]] = {}
+    for idx, (lat, lng) in enumerate(stops):
+        slots.setdefault(stop_key(lat, lng), []).append(idx)
+
+    order = []
+    for key in plan:
+        free = slots.get(key)
+        if free:
+            order.append(free.pop(0))
+    return order
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+"""
+Response cache for the optimize endpoints.
+
+Mobile clients retry and double-send: the same event arrives twice
+within a few ms, then again every few seconds. Each request is reduced
+to a fingerprint of its canonical JSON (stop positions rounded as in
+plan_store, every other field as sent) plus the minute-of-day bucket
+its schedule starts in. The first request with a fingerprint runs the
+optimizer. Identical requests arriving while it runs wait for its
+result (single flight), and later ones get the stored response until
+it expires (TTL) or is pushed out by newer entries (LRU).
+
+Errors are never stored: every waiter sees the exception, and the next
+request runs again. The cache lives in one API process and is used from
+its event loop only, so it needs no locks.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from backend.plan_store import stop_key
+
+
+def _canonical(value):
+    """JSON-ready copy with every (lat, lng) pair rounded like plan_store.stop_key."""
+    if isinstance(value, dict):
+        out = {k: _canonical(v) for k, v in value.items()}
+        for lat, lng in (("lat", "lng"), ("current_lat", "current_lng"), ("start_lat", "start_lng")):
+            if isinstance(out.get(lat), float) and isinstance(out.get(lng), float):
+                out[lat], out[lng] = stop_key(out[lat], out[lng])
+        return out
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+
+def fingerprint(payload) -> str:
+    """Hash of the canonical JSON of `payload`."""
+    blob = json.dumps(_canonical(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(blob.encode(), digest_size=16).hexdigest()
+
+
+def request_key(endpoint: str, req, start_minute: int, bucket_min: int = 1) -> str:
+    """Fingerprint of a request model for `endpoint`, scheduled from `start_minute`."""
+    return fingerprint(
+        {
+            "endpoint": endpoint,
+            "request": req.model_dump(mode="json"),
+            "bucket": int(start_minute) // bucket_min,
+        }
+    )
+
+
+class ResponseCache:
+    """LRU + TTL map fingerprint -> response, with single-flight misses."""
+
+    def __init__(self, max_entries: int = 1024, ttl_s: float = 30.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._flights: Dict[str, asyncio.Future] = {}
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires, value = entry
+            if expires > self.clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            # a waiter that goes away must not cancel the leader's run
+            return await asyncio.shield(flight)
+
+        flight = self._flights[key] = asyncio.get_running_loop().create_future()
+        self.misses += 1
+        try:
+            value = await compute()
+        except BaseException as exc:
+            del self._flights[key]
+            if isinstance(exc, asyncio.CancelledError):
+                flight.cancel()
+            else:
+                flight.set_exception(exc)
+                # retrieved here, so a flight nobody waited on logs no warning
+                flight.exception()
+            raise
+
+        self._entries[key] = (self.clock() + self.ttl_s, value)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        del self._flights[key]
+        flight.set_result(value)
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "entries": len(self._entries),
+            "in_flight": len(self._flights),
+        }
+
+    def clear(self):
+        self._entries.clear()
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+"""
+Solver jobs run on the backend's solver pool (see backend.solver_pool).
+
+Each job takes one plain dict of picklable arguments built by a handler
+and returns a plain dict, so it can cross the process boundary; plan
+ids, sessions and caches stay in the API process. `solve_chains` also
+takes the pool executor: it runs in an API thread and submits its
+chains to it. The searches that do real work between their parallel
+parts run in phases instead, each phase a job of its own: a decomposed
+day (`start_decomposed`, `stitch_decomposed`, `finish_decomposed`) and
+a fleet, whose search runs in one worker and hands back its per-route
+polish (`solve_fleet` with job["defer_polish"]). The handler maps the
+sub-problems of each phase over the pool with `run_chain`.
+"""
+
+from concurrent.futures import Executor
+from typing import Dict, Optional
+
+from model.alns_optimizer import (
+    RouteState,
+    build_travel_matrix,
+    optimize_route,
+    repair_greedy,
+    route_cost,
+)
+from model.decompose import Decomposition, optimize_decomposed, path_cost
+from model.fleet import optimize_fleet
+from model.parallel import multi_start_optimize
+
+
+def solve_route(job: Dict) -> Dict:
+    """
+    One ALNS run over job["coords"]. A job["seed"] (a partial order
+    starting at 0) is completed greedily and polished instead of
+    constructing a route; it is also the baseline, else the identity.
+    """
+    coords = job["coords"]
+    fragile_flags = job["fragile_flags"]
+    time_windows = job["time_windows"]
+    context = job["context"]
+    start_time = job["start_time_min"]
+    budget = dict(job["budget"])
+
+    # the stops repeat between calls; only the first `anchors` points move
+    matrix = build_travel_matrix(coords, context, cached=True, anchors=job.get("anchors", 0))
+
+    seed_route = None
+    if job.get("seed"):
+        missing = sorted(set(range(1, len(coords))) - set(job["seed"]))
+        state = RouteState(
+            job["seed"], coords, fragile_flags, time_windows, start_time, context, matrix=matrix
+        )
+        seed_route = repair_greedy(state, missing).tolist()
+        budget["initial_route"] = seed_route
+
+    baseline_route = seed_route or list(range(len(coords)))
+    baseline_cost = route_cost(
+        baseline_route, coords, fragile_flags, time_windows, start_time, context, matrix=matrix
+    )
+
+    order, cost, stats = optimize_route(
+        coords=coords,
+        fragile_flags=fragile_flags,
+        time_windows=time_windows,
+        context=context,
+        start_time_min=start_time,
+        matrix=matrix,
+        return_stats=True,
+        **budget,
+    )
+    return {
+        "order": order,
+        "cost": cost,
+        "stats": stats,
+        "baseline_cost": baseline_cost,
+        "seed_route": seed_route,
+    }
+
+
+def solve_chains(job: Dict, executor: Executor) -> Dict:
+    """Multi-start ALNS: job["n_chains"] chains on the pool."""
+    coords = job["coords"]
+    baseline_cost = route_cost(
+        list(range(len(coords))),
+        coords,
+        job["fragile_flags"],
+        job["time_windows"],
+        job["start_time_min"],
+        job["context"],
+        matrix=build_travel_matrix(coords, job["context"], cached=True),
+    )
+
+    order, cost, chains = multi_start_optimize(
+        coords=coords,
+        fragile_flags=job["fragile_flags"],
+        time_windows=job["time_windows"],
+        context=job["context"],
+        start_time_min=job["start_time_min"],
+        executor=executor,
+        n_chains=job["n_chains"],
+        exchange_every=job["exchange_every"],
+        construction=job["construction"],
+        **job["budget"],
+    )
+    elite = min(chains, key=lambda c: c["cost"])
+    stats = {
+        "iterations": sum(c["iterations"] for c in chains),
+        "stop_reason": elite["stop_reason"],
+        "construction": elite["construction"],
+        "construction_cost": elite["construction_cost"],
+    }
+    return {
+        "order": order,
+        "cost": cost,
+        "stats": stats,
+        "baseline_cost": baseline_cost,
+        "chains": chains,
+    }
+
+
+def decomposed_baseline(job: Dict) -> float:
+    """Cost of the identity route; no dense n x n matrix, clusters build their own."""
+    coords = job["coords"]
+    return path_cost(
+        list(range(len(coords))),
+        coords,
+        job["fragile_flags"],
+        job["time_windows"],
+        job["start_time_min"],
+        job["context"],
+    )
+
+
+def solve_decomposed(job: Dict) -> Dict:
+    """A large day split into clusters, all solved in this process."""
+    order, cost, stats = optimize_decomposed(
+        coords=job["coords"],
+        fragile_flags=job["fragile_flags"],
+        time_windows=job["time_windows"],
+        context=job["context"],
+        start_time_min=job["start_time_min"],
+        method=job["method"],
+        iters=job["iters"],
+        time_limit_ms=job["time_limit_ms"],
+        return_stats=True,
+    )
+    return {"order": order, "cost": cost, "stats": stats, "baseline_cost": decomposed_baseline(job)}
+
+
+def start_decomposed(job: Dict) -> Dict:
+    """Partition a large day; returns the Decomposition and its cluster jobs."""
+    dec = Decomposition(
+        job["coords"],
+        job["fragile_flags"],
+        job["time_windows"],
+        job["context"],
+        job["start_time_min"],
+        method=job["method"],
+        iters=job["iters"],
+        time_limit_ms=job["time_limit_ms"],
+        workers=job["workers"],
+    )
+    return {"decomposition": dec, "jobs": dec.cluster_jobs(), "baseline_cost": decomposed_baseline(job)}
+
+
+def stitch_decomposed(dec: Decomposition, results) -> Dict:
+    """Stitch the cluster results; returns the Decomposition and its seam jobs."""
+    jobs = dec.stitch(results)
+    return {"decomposition": dec, "jobs": jobs}
+
+
+def finish_decomposed(dec: Decomposition, results, baseline_cost: float) -> Dict:
+    """Apply the seam repairs; same result as `solve_decomposed`."""
+    order, cost, stats = dec.finish(results)
+    return {"order": order, "cost": cost, "stats": stats, "baseline_cost": baseline_cost}
+
+
+def solve_fleet(job: Dict, executor: Optional[Executor] = None) -> Dict:
+    """
+    Fleet VRPTW; the per-route polish runs on `executor` when given.
+    With job["defer_polish"] it is not run: its (vehicle, job) pairs come
+    back in result["polish_jobs"], for `merge_polish`.
+    """
+    job = dict(job)
+    workers = job.pop("workers", 1)
+    if executor is None and not job.get("defer_polish"):
+        workers = 1
+    routes, cost, stats = optimize_fleet(executor=executor, workers=workers, **job)
+    polish = stats.pop("polish_jobs", [])
+    return {"routes": routes, "cost": cost, "stats": stats, "polish_jobs": polish}
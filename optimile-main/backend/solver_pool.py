@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+"""
+Bounded solver pool with admission control.
+
+Every ALNS run leaves the API process: the async handlers await jobs on
+one ProcessPoolExecutor created at startup, so the event loop (and the
+GIL of the API process) stays free for I/O and cheap requests. A job
+that fans out itself (multi-start chains)
+orchestrates from a thread and submits its parts to the same pool; a
+job that does real work between its parallel parts runs in phases, the
+handler holding its slots and awaiting each phase with `call` and `map`.
+
+Admission is counted in pool slots: a job takes one slot per pool
+worker it can keep busy. At most `workers + max_queue` slots are held
+at once; past that a request is refused at once (SolverBusy, HTTP 429)
+instead of queueing until the client times out. A pool that is not
+running or has lost a worker process raises SolverUnavailable (HTTP 503).
+"""
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, List, Optional
+
+
+class SolverBusy(RuntimeError):
+    """All solver slots are taken; the caller should retry later."""
+
+
+class SolverUnavailable(RuntimeError):
+    """The solver pool is not running."""
+
+
+class SolverPool:
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = max(1, workers)
+        self.capacity = self.workers + max(0, max_queue)
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.in_use = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def start(self):
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    @asynccontextmanager
+    async def slots(self, n: int = 1):
+        """Hold `n` slots (clamped to the worker count) for the body, or refuse."""
+        if self.executor is None:
+            raise SolverUnavailable("solver pool is not running")
+        n = max(1, min(n, self.workers))
+        # handlers run on the event loop thread, so this check-and-take is atomic
+        if self.in_use + n > self.capacity:
+            self.rejected += 1
+            raise SolverBusy("solver queue is full")
+        self.in_use += n
+        self.admitted += 1
+        try:
+            yield self.executor
+        finally:
+            self.in_use -= n
+
+    async def call(self, executor, fn: Callable, *args):
+        """Run `fn(*args)` on `executor`, taken from `slots`."""
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        except BrokenProcessPool as exc:
+            raise SolverUnavailable(f"solver pool is broken: {exc}") from exc
+
+    async def map(self, executor, fn: Callable, items) -> List:
+        """`fn` over `items` on `executor`, all at once; results in order."""
+        return list(await asyncio.gather(*(self.call(executor, fn, item) for item in items)))
+
+    async def run(self, fn: Callable, *args, slots: int = 1):
+        """Run `fn(*args)` in a pool worker (fn must be module-level to pickle)."""
+        async with self.slots(slots) as executor:
+            return await self.call(executor, fn, *args)
+
+    async def run_fanout(self, fn: Callable, *args, slots: int):
+        """Run `fn(*args, executor)` in a thread; fn submits its parts to the pool."""
+        async with self.slots(slots) as executor:
+            try:
+                return await asyncio.to_thread(fn, *args, executor)
+            except BrokenProcessPool as exc:
+                raise SolverUnavailable(f"solver pool is broken: {exc}") from exc
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "in_use": self.in_use,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,115 @@
+import random
+
+import numpy as np
+import pytest
+
+from model.alns_optimizer import build_travel_matrix, optimize_route, route_cost
+from model.construction import (
+    CONSTRUCTIONS,
+    candidate_routes,
+    cheapest_insertion,
+    nearest_neighbour,
+    time_window_insertion,
+)
+
+
+def problem(n=20, seed=0):
+    rng = random.Random(seed)
+    coords = [(12.9 + rng.random() * 0.1, 77.5 + rng.random() * 0.1) for _ in range(n)]
+    windows = [(None, None)] + [
+        (s, s + 30) if rng.random() < 0.5 else (None, None)
+        for s in (rng.randint(480, 700) for _ in range(n - 1))
+    ]
+    context = {"vehicle": "van", "traffic": "Normal"}
+    return coords, windows, context
+
+
+@pytest.mark.parametrize("name", list(CONSTRUCTIONS))
+@pytest.mark.parametrize("seed", range(3))
+def test_every_heuristic_builds_a_route_from_the_driver(name, seed):
+    coords, windows, context = problem(seed=seed)
+    time = build_travel_matrix(coords, context).time
+    route = CONSTRUCTIONS[name](time, windows)
+    assert route[0] == 0
+    assert sorted(route) == list(range(len(coords)))
+
+
+def test_empty_problem():
+    empty = np.zeros((0, 0))
+    for heuristic in (nearest_neighbour, time_window_insertion, cheapest_insertion):
+        assert heuristic(empty, []) == []
+
+
+def test_nearest_neighbour_on_a_line():
+    x = np.array([0.0, 5.0, 1.0, 3.0, 2.0])
+    time = np.abs(x[:, None] - x[None, :])
+    assert nearest_neighbour(time) == [0, 2, 4, 3, 1]
+
+
+def test_cheapest_insertion_matches_brute_force_steps():
+    coords, windows, context = problem(n=12, seed=4)
+    time = build_travel_matrix(coords, context).time
+    # the same greedy choice, recomputed from scratch every step
+    route, pending = [0], list(range(1, len(coords)))
+    while pending:
+        best = None
+        for stop in pending:
+            for pos in range(1, len(route) + 1):
+                prev = route[pos - 1]
+                delta = time[prev, stop]
+                if pos < len(route):
+                    delta += time[stop, route[pos]] - time[prev, route[pos]]
+                if best is None or delta < best[0] - 1e-12:
+                    best = (delta, stop, pos)
+        _, stop, pos = best
+        route.insert(pos, stop)
+        pending.remove(stop)
+    assert cheapest_insertion(time) == route
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_time_window_insertion_keeps_window_precedence(seed):
+    coords, windows, context = problem(seed=seed)
+    time = build_travel_matrix(coords, context).time
+    route = time_window_insertion(time, windows)
+    seen = {}
+    for pos, stop in enumerate(route):
+        seen[stop] = pos
+    for a in route[1:]:
+        for b in route[1:]:
+            end_a, start_b = windows[a][1], windows[b][0]
+            if end_a is not None and start_b is not None and end_a < start_b:
+                assert seen[a] < seen[b]
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        candidate_routes(np.zeros((2, 2)), [(None, None)] * 2, "random")
+
+
+def test_best_starts_from_the_cheapest_candidate():
+    coords, windows, context = problem(seed=2)
+    fragile = [False] * len(coords)
+    time = build_travel_matrix(coords, context).time
+    _, routes = candidate_routes(time, windows, "best")
+    costs = [route_cost(r, coords, fragile, windows, 480, context) for r in routes]
+
+    _, _, stats = optimize_route(
+        coords, fragile, windows, context, 480, iters=1, seed=0, return_stats=True, construction="best"
+    )
+    assert stats["construction_cost"] == pytest.approx(min(costs))
+    assert stats["construction"] == list(CONSTRUCTIONS)[int(np.argmin(costs))]
+
+
+def test_auto_builds_one_route_suited_to_the_windows():
+    coords, windows, context = problem(seed=1)
+    fragile = [False] * len(coords)
+    time = build_travel_matrix(coords, context).time
+
+    assert candidate_routes(time, windows, "auto") == (["time_window"], [time_window_insertion(time, windows)])
+    open_day = [(None, None)] * len(coords)
+    assert candidate_routes(time, open_day, "auto") == (["nearest_neighbour"], [nearest_neighbour(time)])
+
+    # the default
+    _, _, stats = optimize_route(coords, fragile, open_day, context, 480, iters=1, seed=0, return_stats=True)
+    assert stats["construction"] == "nearest_neighbour"
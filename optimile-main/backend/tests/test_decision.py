@@ -0,0 +1,93 @@
+import math
+
+import pytest
+
+from backend.driver_sessions import InMemorySessionBackend, SessionStore, load_backend, new_session
+from model.alns_optimizer import build_travel_matrix
+from model.decision import (
+    FRAGILE_MIN_DELAY_MIN,
+    MIN_DELAY_MIN,
+    REOPT_COOLDOWN_S,
+    should_reoptimize,
+    window_slack,
+)
+
+CONTEXT = {"vehicle": "van", "traffic": "Normal"}
+COORDS = [(12.90, 77.50), (12.91, 77.50), (12.92, 77.51), (12.93, 77.50)]
+
+
+def test_no_delay_never_reroutes():
+    assert not should_reoptimize(0.0, True, -5.0, math.inf)
+
+
+def test_outside_the_cooldown_the_delay_threshold_decides():
+    assert should_reoptimize(MIN_DELAY_MIN, False, math.inf, math.inf)
+    assert not should_reoptimize(0.9 * MIN_DELAY_MIN, False, math.inf, math.inf)
+    # a fragile next stop reroutes earlier
+    assert should_reoptimize(FRAGILE_MIN_DELAY_MIN, True, math.inf, math.inf)
+    assert not should_reoptimize(0.9 * FRAGILE_MIN_DELAY_MIN, True, math.inf, math.inf)
+
+
+def test_a_delay_that_eats_the_slack_reroutes_through_the_cooldown():
+    for since in (0.0, REOPT_COOLDOWN_S / 2, math.inf):
+        assert should_reoptimize(5.0, False, 3.0, since, handled_delay_minutes=1.0)
+        # already late: any new delay past the threshold
+        assert should_reoptimize(MIN_DELAY_MIN, False, -2.0, since)
+    # too small to be worth a run, even with the windows at stake
+    assert not should_reoptimize(0.9 * MIN_DELAY_MIN, True, -2.0, REOPT_COOLDOWN_S / 2)
+
+
+def test_cooldown_keeps_a_fresh_plan_while_the_windows_have_room():
+    recent = REOPT_COOLDOWN_S / 2
+    # the last reroute already planned around most of this delay
+    assert not should_reoptimize(5.0, False, 3.0, recent, handled_delay_minutes=4.5)
+    # new delay, but the windows still have room for it
+    assert not should_reoptimize(5.0, False, 10.0, recent, handled_delay_minutes=1.0)
+    assert not should_reoptimize(5.0, True, math.inf, recent)
+    # past the cooldown the plain rule applies again
+    assert should_reoptimize(5.0, False, 10.0, REOPT_COOLDOWN_S, handled_delay_minutes=4.5)
+
+
+def test_window_slack_is_the_tightest_window():
+    matrix = build_travel_matrix(COORDS, CONTEXT)
+    route = [0, 1, 2, 3]
+    arrive = [480.0]
+    for a, b in zip(route, route[1:]):
+        arrive.append(arrive[-1] + matrix.time[a, b])
+
+    windows = [(None, None), (None, arrive[1] + 20), (None, arrive[2] + 5), (None, None)]
+    assert window_slack(route, COORDS, windows, 480, CONTEXT) == pytest.approx(5.0)
+
+    # waiting for an opening resets the clock before later windows
+    windows = [(None, None), (arrive[1] + 30, None), (None, arrive[2] + 40), (None, None)]
+    assert window_slack(route, COORDS, windows, 480, CONTEXT) == pytest.approx(10.0)
+
+    open_windows = [(None, None)] * 4
+    assert window_slack(route, COORDS, open_windows, 480, CONTEXT) == math.inf
+    assert window_slack([0], COORDS, open_windows, 480, CONTEXT) == math.inf
+
+
+def test_sessions_are_stored_back_and_bounded():
+    store = SessionStore(InMemorySessionBackend(max_sessions=2))
+    with store.session("a") as s:
+        assert s == new_session()
+        s["handled_delay"] = 3.0
+    with store.session("a") as s:
+        assert s["handled_delay"] == 3.0
+    for driver in ("b", "c"):
+        with store.session(driver):
+            pass
+    # "a" was the least recently used
+    assert store.backend.get("a") is None
+    assert store.backend.get("c") == new_session()
+
+
+class CustomBackend(InMemorySessionBackend):
+    pass
+
+
+def test_backend_from_a_spec():
+    assert type(load_backend("")) is InMemorySessionBackend
+    assert isinstance(load_backend(f"{__name__}:CustomBackend"), CustomBackend)
+    with pytest.raises(ValueError):
+        load_backend("backend.driver_sessions")
@@ -0,0 +1,117 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from model.alns_optimizer import build_travel_matrix, route_cost, window_arrays
+from model.decompose import (
+    kmeans_clusters,
+    optimize_decomposed,
+    path_cost,
+    route_schedule,
+    sweep_clusters,
+)
+
+CONTEXT = {"vehicle": "van", "traffic": "Normal"}
+
+
+def problem(n=200, seed=0, windows=True):
+    rng = random.Random(seed)
+    coords = [(12.95, 77.55)] + [
+        (12.9 + rng.random() * 0.1, 77.5 + rng.random() * 0.1) for _ in range(n - 1)
+    ]
+    time_windows = [(None, None)] + [
+        (s, s + 90) if windows and rng.random() < 0.3 else (None, None)
+        for s in (rng.randint(480, 900) for _ in range(n - 1))
+    ]
+    fragile = [i > 0 and rng.random() < 0.1 for i in range(n)]
+    return coords, fragile, time_windows
+
+
+def check_partition(clusters, n):
+    assert sorted(s for c in clusters for s in c) == list(range(n))
+    assert all(clusters)
+
+
+@pytest.mark.parametrize("k", [1, 3, 7])
+def test_kmeans_covers_every_stop_once(k):
+    coords, _, windows = problem(seed=k)
+    clusters = kmeans_clusters(coords, windows, k)
+    check_partition(clusters, len(coords))
+    assert len(clusters) <= k
+
+
+def test_kmeans_finds_separate_groups():
+    rng = random.Random(1)
+    centres = [(12.9, 77.5), (13.1, 77.5), (13.0, 77.8)]
+    coords = [(c[0] + rng.random() * 0.01, c[1] + rng.random() * 0.01) for c in centres for _ in range(20)]
+    clusters = kmeans_clusters(coords, [(None, None)] * 60, 3)
+    assert sorted(sorted(c) for c in clusters) == [list(range(g * 20, g * 20 + 20)) for g in range(3)]
+
+
+def test_kmeans_splits_by_window_when_positions_coincide():
+    coords = [(12.97, 77.59)] * 20
+    windows = [(480, 500)] * 10 + [(900, 920)] * 10
+    clusters = kmeans_clusters(coords, windows, 2)
+    assert sorted(sorted(c) for c in clusters) == [list(range(10)), list(range(10, 20))]
+
+
+def test_sweep_cuts_equal_runs_by_angle():
+    angles = np.linspace(0, 2 * np.pi, 24, endpoint=False)
+    coords = [(np.cos(a), np.sin(a)) for a in angles]
+    clusters = sweep_clusters(coords, (0.0, 0.0), 4)
+    check_partition(clusters, 24)
+    assert [len(c) for c in clusters] == [6] * 4
+    # every run is a contiguous arc
+    for c in clusters:
+        steps = {(b - a) % 24 for a, b in zip(c, c[1:])}
+        assert steps == {1}
+
+
+def test_path_cost_and_schedule_match_the_route_walk():
+    coords, fragile, windows = problem(n=40, seed=2)
+    route = list(range(40))
+    assert path_cost(route, coords, fragile, windows, 480, CONTEXT) == pytest.approx(
+        route_cost(route, coords, fragile, windows, 480, CONTEXT)
+    )
+
+    matrix = build_travel_matrix(coords, CONTEXT)
+    clock = [480.0]
+    for a, b in zip(route, route[1:]):
+        t = clock[-1] + matrix.time[a, b]
+        start = windows[b][0]
+        clock.append(max(t, start) if start is not None else t)
+    got = route_schedule(route, matrix, window_arrays(windows), 480)
+    assert got.tolist() == pytest.approx(clock)
+
+
+@pytest.mark.parametrize("method", ["kmeans", "sweep"])
+def test_decomposed_route_is_a_permutation_at_its_cost(method):
+    coords, fragile, windows = problem(n=120, seed=3)
+    route, cost, stats = optimize_decomposed(
+        coords, fragile, windows, CONTEXT, 480,
+        cluster_size=25, method=method, iters=30, seed=0, return_stats=True,
+    )
+    assert route[0] == 0 and sorted(route) == list(range(120))
+    assert cost == pytest.approx(path_cost(route, coords, fragile, windows, 480, CONTEXT))
+    # seam repairs only ever lower the stitched cost
+    assert cost <= stats["construction_cost"] + 1e-9
+    assert stats["clusters"] >= 5
+
+
+def test_pool_gives_the_same_route():
+    coords, fragile, windows = problem(n=120, seed=4)
+    args = (coords, fragile, windows, CONTEXT, 480)
+    alone = optimize_decomposed(*args, cluster_size=30, iters=20, seed=1)
+    with ThreadPoolExecutor(2) as executor:
+        pooled = optimize_decomposed(*args, cluster_size=30, iters=20, seed=1, executor=executor, workers=2)
+    assert pooled == alone
+
+
+def test_tiny_days_and_unknown_methods():
+    coords, fragile, windows = problem(n=2)
+    assert optimize_decomposed(coords, fragile, windows, CONTEXT, 480)[0] == [0, 1]
+    coords, fragile, windows = problem(n=10)
+    with pytest.raises(ValueError):
+        optimize_decomposed(coords, fragile, windows, CONTEXT, 480, method="grid")
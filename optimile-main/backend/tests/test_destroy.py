@@ -0,0 +1,132 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from model.alns_optimizer import (
+    RouteState,
+    destroy_radius,
+    destroy_shaw,
+    destroy_worst,
+    relatedness_matrix,
+    removal_size,
+    route_cost,
+)
+from model.route import Route
+from model.spatial import GridIndex
+
+CONTEXT = {"vehicle": "van", "traffic": "Normal"}
+
+
+def state_for(route, coords, windows=None):
+    n = len(coords)
+    windows = windows or [(None, None)] * n
+    return RouteState(route, coords, [False] * n, windows, 480, CONTEXT)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_savings_are_exact_without_knock_on_effects(seed):
+    # no windows and only two legs (no turn term): the estimate is exact,
+    # and for the last stop it always is
+    rng = random.Random(seed)
+    coords = [(12.9 + rng.random() * 0.1, 77.5 + rng.random() * 0.1) for _ in range(6)]
+    flat = ([False] * 6, [(None, None)] * 6, 480, CONTEXT)
+    for route, positions in (([0, 4, 2], (1, 2)), ([0, 3, 1, 5, 2, 4], (5,))):
+        state = state_for(route, coords)
+        savings = state.removal_savings()
+        assert savings[0] == float("-inf")
+        for i in positions:
+            rest = route[:i] + route[i + 1:]
+            assert savings[i] == pytest.approx(state.total - route_cost(rest, coords, *flat))
+
+
+def test_detour_stop_saves_the_most():
+    coords = [(12.90, 77.5), (12.91, 77.5), (12.92, 77.6), (12.93, 77.5), (12.94, 77.5)]
+    state = state_for(list(range(5)), coords)
+    savings = state.removal_savings()
+    assert max(range(1, 5), key=lambda i: savings[i]) == 2
+    # p high enough is greedy
+    remaining, removed = destroy_worst(state, 1, random.Random(0), p=50.0)
+    assert removed == [2]
+    assert remaining == [0, 1, 3, 4]
+
+
+@pytest.mark.parametrize("k", [0, 1, 3, 10])
+def test_destroy_worst_removes_k_distinct_stops(k):
+    rng = random.Random(k)
+    coords = [(12.9 + rng.random() * 0.1, 77.5 + rng.random() * 0.1) for _ in range(8)]
+    route = [0] + rng.sample(range(1, 8), 7)
+    remaining, removed = destroy_worst(state_for(route, coords), k, rng)
+    assert len(removed) == min(k, 7) == len(set(removed))
+    assert 0 not in removed
+    assert remaining == [s for s in route if s not in removed]
+
+
+def test_one_stop_route():
+    coords = [(12.9, 77.5), (12.91, 77.5)]
+    assert destroy_worst(state_for([0, 1], coords), 2, random.Random(0)) == ([0], [1])
+    assert destroy_worst(state_for([0], coords[:1]), 2, random.Random(0)) == ([0], [])
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 10, 30, 100])
+def test_removal_size_scales_with_the_route(n):
+    rng = random.Random(n)
+    sizes = {removal_size(n, rng) for _ in range(200)}
+    movable = n - 1
+    if movable == 0:
+        assert sizes == {0}
+        return
+    assert min(sizes) >= min(2, movable)
+    assert max(sizes) <= max(min(2, movable), int(movable * 0.1), min(12, int(movable * 0.3)))
+
+
+def test_relatedness_mixes_travel_time_and_window_starts():
+    time = np.array([[0.0, 1.0, 4.0], [3.0, 0.0, 2.0], [4.0, 2.0, 0.0]])
+    windows = [(None, None), (500, 530), (560, None)]
+    related = relatedness_matrix(time, windows)
+    # min over both directions, over the largest; starts over their span,
+    # the open start counting as the earliest (500)
+    assert related[0, 1] == pytest.approx(1 / 4 + 0.0)
+    assert related[1, 2] == pytest.approx(2 / 4 + 1.0)
+    assert related.tolist() == related.T.tolist()
+    # no windows at all: travel time only
+    assert relatedness_matrix(time, [(None, None)] * 3)[1, 2] == pytest.approx(0.5)
+
+
+def test_shaw_removes_a_related_cluster():
+    # two far-apart groups; greedy draws stay inside the seed's group
+    coords = [(12.9, 77.5)] + [(12.9 + 0.001 * i, 77.6) for i in range(5)]
+    coords += [(13.2 + 0.001 * i, 77.9) for i in range(5)]
+    time = np.array([[math.dist(a, b) for b in coords] for a in coords])
+    related = relatedness_matrix(time, [(None, None)] * len(coords))
+    route = list(range(len(coords)))
+    for seed in range(10):
+        remaining, removed = destroy_shaw(Route(route), related, 4, random.Random(seed), p=50.0)
+        groups = {1 if s <= 5 else 2 for s in removed}
+        assert len(removed) == 4 and len(groups) == 1
+        assert remaining == [s for s in route if s not in removed]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_radius_removal_takes_the_stops_around_a_seed(seed):
+    rng = random.Random(seed)
+    coords = [(12.9 + rng.random() * 0.1, 77.5 + rng.random() * 0.1) for _ in range(20)]
+    route = [0] + rng.sample(range(1, 20), 19)
+    index = GridIndex(coords)
+    remaining, removed = destroy_radius(Route(route), index, coords, 5, rng)
+    assert 1 <= len(removed) <= 5 and 0 not in removed
+    assert len(set(removed)) == len(removed)
+    assert remaining == [s for s in route if s not in removed]
+    # a disc around the first removed stop: nothing outside it was taken
+    # while something inside it was left
+    centre = coords[removed[0]]
+    reach = max(math.dist(centre, coords[s]) for s in removed)
+    inside = [s for s in route[1:] if math.dist(centre, coords[s]) < reach]
+    assert set(inside) <= set(removed)
+
+
+def test_empty_routes_remove_nothing():
+    related = np.zeros((1, 1))
+    assert destroy_shaw(Route([0]), related, 3, random.Random(0)) == ([0], [])
+    assert destroy_radius(Route([0]), GridIndex([(0.0, 0.0)]), [(0.0, 0.0)], 3, random.Random(0)) == ([0], [])
@@ -0,0 +1,107 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from model.alns_optimizer import build_travel_matrix, dist
+from model.distance import (
+    ROAD_FACTOR,
+    MatrixCache,
+    distance_matrix,
+    haversine,
+    pairwise,
+    planar,
+)
+
+
+def points(n=15, seed=0):
+    rng = random.Random(seed)
+    return [(12.9 + rng.random() * 0.2, 77.5 + rng.random() * 0.2) for _ in range(n)]
+
+
+def test_haversine_known_distances():
+    # one degree of latitude, and a quarter of the equator
+    assert haversine(0.0, 0.0, 1.0, 0.0) == pytest.approx(111.195, abs=1e-3)
+    assert haversine(0.0, 0.0, 0.0, 90.0) == pytest.approx(math.pi * 6371.0 / 2)
+    assert haversine(12.97, 77.59, 12.97, 77.59) == 0.0
+    lat = np.array([0.0, 1.0])
+    assert haversine(lat, 0.0, 0.0, 0.0).tolist() == pytest.approx([0.0, 111.195], abs=1e-3)
+
+
+def test_modes_build_the_same_table_as_scalar_calls():
+    pts = points()
+    for mode, scalar in (
+        ("euclidean", lambda a, b: dist(a, b)),
+        ("haversine", lambda a, b: haversine(a[0], a[1], b[0], b[1])),
+        ("road", lambda a, b: haversine(a[0], a[1], b[0], b[1]) * ROAD_FACTOR),
+    ):
+        table = distance_matrix(pts, mode)
+        want = [[scalar(a, b) for b in pts] for a in pts]
+        assert table.ravel().tolist() == pytest.approx(np.ravel(want))
+    with pytest.raises(ValueError):
+        pairwise(pts, pts, "manhattan")
+
+
+def test_euclidean_is_the_default_travel_matrix():
+    pts = points()
+    context = {"vehicle": "van", "traffic": "Normal"}
+    default = build_travel_matrix(pts, context)
+    explicit = build_travel_matrix(pts, dict(context, distance="euclidean"))
+    assert np.array_equal(default.dist, explicit.dist)
+    km = build_travel_matrix(pts, dict(context, distance="haversine"))
+    assert np.array_equal(km.dist, distance_matrix(pts, "haversine"))
+
+
+def test_planar_distances_approximate_the_mode():
+    pts = points(seed=1)
+    for mode in ("haversine", "road"):
+        flat = planar(pts, mode)
+        d = np.hypot(*(flat[:, None, :] - flat[None, :, :]).transpose(2, 0, 1))
+        want = distance_matrix(pts, mode)
+        assert d.ravel().tolist() == pytest.approx(want.ravel().tolist(), rel=1e-3, abs=1e-6)
+    assert planar(pts).tolist() == [list(p) for p in pts]
+
+
+def test_cache_hits_for_the_same_stops_in_any_order():
+    cache = MatrixCache()
+    pts = points()
+    first = distance_matrix(pts, "haversine", cache=cache)
+    shuffled = pts[:]
+    random.Random(2).shuffle(shuffled)
+    again = distance_matrix(shuffled, "haversine", cache=cache)
+    assert (cache.misses, cache.hits) == (1, 1)
+    assert again.tolist() == distance_matrix(shuffled, "haversine").tolist()
+    assert first.tolist() == distance_matrix(pts, "haversine").tolist()
+    # another mode is another table
+    distance_matrix(pts, "road", cache=cache)
+    assert cache.misses == 2
+
+
+def test_anchor_rows_are_recomputed():
+    cache = MatrixCache()
+    stops = points()
+    for driver in [(12.95, 77.55), (13.0, 77.6)]:
+        table = distance_matrix([driver] + stops, "road", anchors=1, cache=cache)
+        assert table.tolist() == distance_matrix([driver] + stops, "road").tolist()
+    assert (cache.misses, cache.hits) == (1, 1)
+
+
+def test_cache_is_bounded_in_bytes():
+    table_bytes = 10 * 10 * 8
+    cache = MatrixCache(max_bytes=2 * table_bytes)
+    for seed in range(3):
+        distance_matrix(points(10, seed), cache=cache)
+    # the oldest table was evicted
+    distance_matrix(points(10, 0), cache=cache)
+    distance_matrix(points(10, 2), cache=cache)
+    assert (cache.misses, cache.hits) == (4, 1)
+
+
+def test_cached_tables_are_read_only():
+    cache = MatrixCache()
+    pts = sorted(points())
+    distance_matrix(pts, cache=cache)
+    # already in key order: the cached table itself comes back
+    table = distance_matrix(pts, cache=cache)
+    assert not table.flags.writeable
@@ -0,0 +1,119 @@
+import joblib
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import backend.main as main
+import model.eta_model as eta_model
+from model.alns_optimizer import LazyTravelMatrix, build_travel_matrix
+from model.eta_model import DIST_STEP_KM, ETAModel, default_eta_model, model_time_matrix
+
+COORDS = [(12.95 + 0.01 * i, 77.55 + 0.007 * (i % 4)) for i in range(8)]
+CONTEXT = {"vehicle": "scooter", "traffic": "Heavy", "weather": "Sunny", "order_minutes": 545, "day_of_week": 2}
+
+
+class Forest:
+    """Stands in for the pipeline: 5 min handling plus `per_km` minutes a km."""
+
+    def __init__(self, per_km=3.0):
+        self.per_km = per_km
+        self.frames = []
+        self.weights = np.arange(1000, dtype=np.float64)
+
+    def predict(self, frame):
+        self.frames.append(frame)
+        return 5.0 + self.per_km * frame["distance_km"].to_numpy()
+
+
+class Shrinking(Forest):
+    def predict(self, frame):
+        self.frames.append(frame)
+        return 5.0 - frame["distance_km"].to_numpy()
+
+
+@pytest.fixture
+def with_model(monkeypatch):
+    pytest.importorskip("pandas")
+    model = ETAModel(Forest())
+    monkeypatch.setattr(eta_model, "_default", model)
+    return model
+
+
+def test_conditions_use_the_training_spelling():
+    assert ETAModel.conditions(CONTEXT) == ("scooter ", "High ", "Sunny", 540, 2)
+    assert ETAModel.conditions({}) == ("van", "Medium ", "Sunny", 720, 0)
+    # a speed profile carries the traffic: the table holds free-flow minutes
+    assert ETAModel.conditions({**CONTEXT, "profile": object()})[1] == "Low "
+
+
+def test_the_pipeline_loads_memory_mapped(tmp_path):
+    path = tmp_path / "eta.joblib"
+    joblib.dump(Forest(), path)
+    model = ETAModel.load(str(path))
+    assert isinstance(model.pipeline.weights, np.memmap)
+    assert np.array_equal(model.pipeline.weights, np.arange(1000))
+
+
+def test_default_model_needs_a_path(monkeypatch):
+    monkeypatch.setattr(eta_model, "_default", None)
+    monkeypatch.delenv(eta_model.ETA_MODEL_ENV, raising=False)
+    with pytest.raises(ValueError):
+        default_eta_model()
+
+
+def test_model_travel_time_without_a_model_is_422(monkeypatch):
+    monkeypatch.delenv(eta_model.ETA_MODEL_ENV, raising=False)
+    body = {"stops": [{"lat": 12.95, "lng": 77.55}, {"lat": 12.96, "lng": 77.56}], "travel_time": "model"}
+    with TestClient(main.app) as client:
+        r = client.post("/optimize", json=body)
+    assert r.status_code == 422
+
+
+def test_legs_take_the_length_dependent_part(with_model):
+    km = np.array([[0.0, 1.0], [2.5, 0.04]])
+    minutes = with_model.leg_minutes(km, CONTEXT)
+    # f(d) - f(0) at 50 m buckets
+    assert minutes == pytest.approx(np.array([[0.0, 3.0], [7.5, 0.15]]))
+
+    (frame,) = with_model.pipeline.frames
+    assert list(frame.columns) == eta_model.FEATURE_COLUMNS
+    assert set(frame["vehicle"]) == {"scooter "} and set(frame["traffic"]) == {"High "}
+    assert sorted(frame["distance_km"]) == pytest.approx([0.0, DIST_STEP_KM, 1.0, 2.5])
+
+    # never below zero
+    shrinking = ETAModel(Shrinking())
+    assert (shrinking.leg_minutes(km, CONTEXT) == 0.0).all()
+
+
+def test_predictions_are_cached_per_conditions(with_model):
+    km = np.linspace(0.0, 3.0, 25).reshape(5, 5)
+    first = with_model.leg_minutes(km, CONTEXT)
+    calls = len(with_model.pipeline.frames)
+    assert calls == 1
+
+    assert np.array_equal(with_model.leg_minutes(km, CONTEXT), first)
+    assert np.array_equal(with_model.leg_minutes(km[:2, :2], CONTEXT), first[:2, :2])
+    assert len(with_model.pipeline.frames) == calls
+
+    # only the new buckets are predicted
+    with_model.leg_minutes(np.array([4.0]), CONTEXT)
+    assert len(with_model.pipeline.frames[-1]) == 1
+    with_model.leg_minutes(km, {**CONTEXT, "traffic": "Low"})
+    assert with_model.stats()["conditions"] == 2
+
+    small = ETAModel(Forest(), max_conditions=1)
+    small.leg_minutes(km, CONTEXT)
+    small.leg_minutes(km, {**CONTEXT, "weather": "Stormy"})
+    assert small.stats()["conditions"] == 1
+
+
+def test_model_time_tables_agree(with_model):
+    context = {**CONTEXT, "travel_time": "model"}
+    tm = build_travel_matrix(COORDS, context)
+    assert np.array_equal(tm.time, model_time_matrix(COORDS, context))
+    assert not np.array_equal(tm.time, build_travel_matrix(COORDS, CONTEXT).time)
+
+    lazy = LazyTravelMatrix(COORDS, context)
+    src = np.array([0, 3, 7, 2])
+    dst = np.array([5, 1, 0, 2])
+    assert lazy.time[src, dst] == pytest.approx(tm.time[src, dst])
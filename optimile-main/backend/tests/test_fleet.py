@@ -0,0 +1,105 @@
+import random
+
+import pytest
+
+from model.alns_optimizer import route_cost
+from model.fleet import UNASSIGNED_PENALTY, optimize_fleet
+
+
+def fleet(n=30, capacities=(20, 20, 20), kinds=("van", "scooter", "motorcycle"), seed=0):
+    rng = random.Random(seed)
+    coords = [(12.9 + rng.random() * 0.1, 77.5 + rng.random() * 0.1) for _ in range(n)]
+    windows = [
+        (s, s + 60) if rng.random() < 0.3 else (None, None)
+        for s in (rng.randint(480, 600) for _ in range(n))
+    ]
+    return dict(
+        coords=coords,
+        fragile_flags=[rng.random() < 0.2 for _ in range(n)],
+        time_windows=windows,
+        demands=[rng.choice([1, 2]) for _ in range(n)],
+        vehicles=[
+            {"vehicle": kind, "start": (12.95, 77.55), "capacity": cap}
+            for kind, cap in zip(kinds, capacities)
+        ],
+        context={"traffic": "Normal"},
+        start_time_min=480,
+    )
+
+
+def check_solution(p, routes, cost, stats):
+    served = [s for route in routes for s in route]
+    # every stop exactly once, on a route or unassigned
+    assert sorted(served + stats["unassigned"]) == list(range(len(p["coords"])))
+    for v, route in enumerate(routes):
+        vehicle = p["vehicles"][v]
+        load = sum(p["demands"][s] for s in route)
+        assert load <= vehicle["capacity"]
+        assert stats["loads"][v] == pytest.approx(load)
+        # each route costs what route_cost gives from the vehicle's start
+        coords = [vehicle["start"]] + [p["coords"][s] for s in route]
+        fragile = [False] + [p["fragile_flags"][s] for s in route]
+        windows = [(None, None)] + [p["time_windows"][s] for s in route]
+        context = dict(p["context"], vehicle=vehicle["vehicle"])
+        want = route_cost(list(range(len(coords))), coords, fragile, windows, 480, context)
+        assert stats["route_costs"][v] == pytest.approx(want)
+    assert cost == pytest.approx(
+        sum(stats["route_costs"]) + UNASSIGNED_PENALTY * len(stats["unassigned"])
+    )
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_every_stop_is_served_once_within_capacity(seed):
+    p = fleet(seed=seed)
+    routes, cost, stats = optimize_fleet(**p, iters=150, seed=seed)
+    check_solution(p, routes, cost, stats)
+    assert stats["unassigned"] == []
+    assert cost <= stats["construction_cost"] + 1e-9
+
+
+def test_stops_beyond_the_fleet_capacity_are_unassigned():
+    p = fleet(n=20, capacities=(5, 5), kinds=("van", "van"), seed=3)
+    p["demands"] = [1] * 20
+    routes, cost, stats = optimize_fleet(**p, iters=100, seed=0)
+    check_solution(p, routes, cost, stats)
+    assert len(stats["unassigned"]) == 10
+
+
+def test_time_limit_and_same_seed():
+    p = fleet(n=40, seed=1)
+    routes, cost, stats = optimize_fleet(**p, iters=100_000, time_limit_ms=300, seed=7)
+    assert stats["stop_reason"] == "time_limit"
+    check_solution(p, routes, cost, stats)
+
+    first = optimize_fleet(**p, iters=80, seed=7)
+    again = optimize_fleet(**p, iters=80, seed=7)
+    assert first[:2] == again[:2]
+
+
+def test_idle_vehicles_are_put_to_use():
+    # a 1 km cluster with one early deadline, 2 km from the depot: every
+    # stop's nearest nodes are other stops, so an idle vehicle is only
+    # ever offered as the nearest empty route
+    rng = random.Random(5)
+    n = 24
+    p = dict(
+        coords=[(12.95 + rng.random() * 0.01, 77.55 + rng.random() * 0.01) for _ in range(n)],
+        fragile_flags=[False] * n,
+        time_windows=[(480, 484)] * n,
+        demands=[1] * n,
+        vehicles=[{"vehicle": "van", "start": (12.97, 77.57), "capacity": 30} for _ in range(4)],
+        context={"traffic": "Normal", "distance": "haversine"},
+        start_time_min=480,
+    )
+    routes, cost, stats = optimize_fleet(**p, iters=200, seed=0, polish=False)
+    check_solution(p, routes, cost, stats)
+    # one van would be late at most stops
+    assert all(routes)
+
+
+def test_no_stops():
+    p = fleet(n=0)
+    routes, cost, stats = optimize_fleet(**p, iters=50, seed=0)
+    assert routes == [[], [], []]
+    assert cost == 0.0
+    assert stats["unassigned"] == [] and stats["iterations"] == 0
@@ -0,0 +1,152 @@
+import numpy as np
+import pytest
+
+from model.alns_optimizer import LazyTravelMatrix, build_travel_matrix, route_cost, route_cost_batch
+from model.incident_match import match_incidents
+from model.incidents import incident_penalties, incident_penalty, remap_incidents
+from model.traffic_provider import STOP_RADIUS_KM, _map_incidents
+
+# driver, then three stops on a square ~2.2 km a side
+COORDS = [(12.90, 77.50), (12.90, 77.52), (12.92, 77.52), (12.92, 77.50)]
+CONTEXT = {"vehicle": "van", "traffic": "Normal"}
+
+
+def raw(geometry, magnitude=5, category="Jam", id="x"):
+    return {
+        "id": id,
+        "properties": {"magnitudeOfDelay": magnitude, "incidentCategory": category},
+        "geometry": geometry,
+    }
+
+
+def line(*lnglat):
+    return {"type": "LineString", "coordinates": [list(p) for p in lnglat]}
+
+
+def point(lng, lat):
+    return {"type": "Point", "coordinates": [lng, lat]}
+
+
+def test_match_fractions_and_nearest_stop():
+    incidents = [
+        # covers about half of leg 0
+        raw(line((77.505, 12.90), (77.515, 12.90)), id="half"),
+        # a point on the middle of leg 1
+        raw(point(77.52, 12.91), id="mid"),
+        # nowhere near the route
+        raw(point(77.60, 13.10), id="far"),
+        # off the legs, ~0.2 km from stop 2
+        raw(point(77.5218, 12.9201), id="near"),
+    ]
+    match = match_incidents(incidents, COORDS)
+
+    assert match.leg_fraction.shape == (4, 3)
+    assert match.leg_fraction[0] == pytest.approx([0.5, 0.0, 0.0], abs=0.06)
+    assert 0.0 < match.leg_fraction[1, 1] < 0.1
+    assert match.leg_fraction[1, [0, 2]].tolist() == [0.0, 0.0]
+    assert not match.leg_fraction[2].any() and not match.leg_fraction[3].any()
+    assert match.stop[3] == 2 and match.stop_km[3] < 0.3
+    assert match.stop_km[2] > 10
+
+
+def test_match_without_geometry():
+    match = match_incidents([{"id": "x", "properties": {}}], COORDS)
+    assert match.stop.tolist() == [-1]
+    assert not match.leg_fraction.any()
+
+
+def test_incidents_past_the_stop_radius_are_dropped():
+    # ~1 km north of stop 3, away from every leg
+    far = raw(point(77.50, 12.93), id="north")
+    assert match_incidents([far], COORDS).stop_km[0] > STOP_RADIUS_KM
+    assert _map_incidents([far], COORDS) == []
+
+
+def test_mapped_leg_incidents_are_costed_on_their_legs():
+    mapped = _map_incidents(
+        [
+            raw(line((77.505, 12.90), (77.515, 12.90)), magnitude=5, id="half"),
+            raw(point(77.5218, 12.9201), magnitude=5, id="near"),
+            raw(point(77.60, 13.10), id="far"),
+        ],
+        COORDS,
+    )
+    assert len(mapped) == 2
+    on_leg, near_stop = mapped
+    assert "index" not in on_leg
+    [[src, dst, fraction]] = on_leg["legs"]
+    assert (src, dst) == (0, 1)
+    assert near_stop["index"] == 2 and "legs" not in near_stop
+
+    context = dict(CONTEXT, incidents=mapped)
+    penalty = incident_penalty(on_leg)
+    for lazy in (False, True):
+        pen = incident_penalties(COORDS, context, lazy=lazy)
+        # only arriving at stop 2 costs a stop penalty
+        assert pen.stop.tolist() == [0.0, 0.0, incident_penalty(near_stop), 0.0]
+        legs = pen.leg[np.array([0, 1, 0, 2]), np.array([1, 0, 2, 3])]
+        # the road is the same both ways
+        assert legs.tolist() == pytest.approx([penalty * fraction, penalty * fraction, 0.0, 0.0])
+
+    # driving the matched leg costs its share of the incident
+    args = ([False] * 4, [(None, None)] * 4, 480)
+    clean = route_cost([0, 1, 2, 3], COORDS, *args, CONTEXT)
+    expected = clean + penalty * fraction + incident_penalty(near_stop)
+    assert route_cost([0, 1, 2, 3], COORDS, *args, context) == pytest.approx(expected)
+    batch = route_cost_batch(
+        np.array([[0, 1, 2, 3]]), COORDS, *args, context, matrix=LazyTravelMatrix(COORDS, context)
+    )
+    assert batch.tolist() == pytest.approx([expected])
+
+
+def test_a_matched_leg_costs_the_same_driven_backwards():
+    on_road = {"kind": "accident", "severity": 1.0, "legs": [[2, 3, 0.5]]}
+    penalty = 0.5 * incident_penalty(on_road)
+    args = ([False] * 4, [(None, None)] * 4, 480)
+
+    for legs in ([[2, 3, 0.5]], [[3, 2, 0.5]], [[2, 3, 0.5], [3, 2, 0.25]]):
+        # listed either way, or both: one stretch of road, penalized once
+        context = dict(CONTEXT, incidents=[dict(on_road, legs=legs)])
+        for route in ([0, 1, 2, 3], [0, 1, 3, 2]):
+            clean = route_cost(route, COORDS, *args, CONTEXT)
+            assert route_cost(route, COORDS, *args, context) == pytest.approx(clean + penalty)
+            for matrix in (build_travel_matrix(COORDS, context), LazyTravelMatrix(COORDS, context)):
+                batch = route_cost_batch(np.array([route]), COORDS, *args, context, matrix=matrix)
+                assert batch.tolist() == pytest.approx([clean + penalty])
+
+
+def test_remap_keeps_legs_inside_the_subproblem():
+    context = dict(
+        CONTEXT,
+        incidents=[
+            {"kind": "accident", "severity": 1.0, "legs": [[0, 1, 0.5], [1, 2, 0.25]]},
+            {"kind": "accident", "severity": 1.0, "legs": [[2, 3, 1.0]]},
+        ],
+    )
+    local = remap_incidents(context, {0: 0, 1: 2, 2: 1}, COORDS)
+    assert local["incidents"] == [
+        {"kind": "accident", "severity": 1.0, "legs": [[0, 2, 0.5], [2, 1, 0.25]]}
+    ]
+
+
+def test_severity_defaults_to_one():
+    assert incident_penalty({"kind": "accident"}) == incident_penalty({"kind": "accident", "severity": 1.0})
+    pen = incident_penalties(COORDS, dict(CONTEXT, incidents=[{"kind": "traffic_jam", "index": 2}]))
+    assert pen.stop.tolist() == [0.0, 0.0, 35.0, 0.0]
+
+
+def test_lazy_leg_penalties_match_the_dense_table():
+    context = dict(
+        CONTEXT,
+        incidents=[
+            # a located leg incident on the driver: every leg out of it is hit
+            {"kind": "accident", "lat": 12.90, "lng": 77.50, "radius": 0.5, "scope": "leg"},
+            {"kind": "traffic_jam", "legs": [[1, 2, 0.5], [2, 2, 1.0]]},
+        ],
+    )
+    dense = incident_penalties(COORDS, context).leg
+    lazy = incident_penalties(COORDS, context, lazy=True).leg
+    src, dst = np.meshgrid(np.arange(4), np.arange(4), indexing="ij")
+    assert lazy[src, dst].tolist() == dense.tolist()
+    assert not np.diag(dense).any()
+    assert dense[0, 1] > 0 and dense[1, 2] == pytest.approx(17.5)
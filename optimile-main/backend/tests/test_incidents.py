@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from model.alns_optimizer import route_cost
+from model.incidents import (
+    check_incidents,
+    context_incidents,
+    incident_penalties,
+    incident_penalty,
+    remap_incidents,
+)
+
+# driver, then stops along a road heading east, ~1.1 km apart
+COORDS = [(12.95, 77.50), (12.95, 77.51), (12.95, 77.52), (12.95, 77.53), (12.97, 77.51)]
+CONTEXT = {"vehicle": "van", "traffic": "Normal"}
+
+
+def test_penalty_by_kind():
+    assert incident_penalty({"kind": "traffic_jam", "severity": 0.5}) == 17.5
+    assert incident_penalty({"kind": "accident", "severity": 0.5}) == 30.0
+    assert incident_penalty({"kind": "road_closed", "severity": 0.1}) == 200
+    assert incident_penalty({"kind": "parade", "severity": 1.0}) == 0.0
+
+
+def test_legacy_incident_joins_the_list():
+    one = {"kind": "accident", "index": 1, "severity": 1.0}
+    two = {"kind": "traffic_jam", "index": 2, "severity": 1.0}
+    assert context_incidents({"incidents": [one], "incident": two}) == [one, two]
+    assert context_incidents({}) == []
+
+
+@pytest.mark.parametrize(
+    "incident",
+    [
+        {"kind": "accident", "index": 9},
+        {"kind": "accident", "index": -1},
+        {"kind": "accident", "lat": 12.9},
+        {"kind": "accident", "index": 1, "radius": -1.0},
+        {"kind": "accident", "index": 1, "scope": "area"},
+    ],
+)
+def test_invalid_incidents_are_rejected(incident):
+    with pytest.raises(ValueError):
+        check_incidents([incident], len(COORDS))
+
+
+def test_stop_incidents_fold_into_arrival_penalties():
+    context = dict(
+        CONTEXT,
+        incidents=[
+            {"kind": "accident", "index": 1, "severity": 1.0},
+            # reaches stops 1 and 2 (~0.5 km away), not 3
+            {"kind": "traffic_jam", "lat": 12.95, "lng": 77.515, "radius": 0.6, "severity": 1.0, "scope": "stop"},
+        ],
+        incident={"kind": "road_closed", "index": 4, "severity": 1.0},
+    )
+    pen = incident_penalties(COORDS, context)
+    assert pen.stop.tolist() == [0.0, 60.0 + 35.0, 35.0, 0.0, 200.0]
+    assert pen.leg is None
+
+    # every incident is paid on arrival
+    args = ([False] * 5, [(None, None)] * 5, 480)
+    route = [0, 1, 2, 3, 4]
+    clean = route_cost(route, COORDS, *args, CONTEXT)
+    assert route_cost(route, COORDS, *args, context) == pytest.approx(clean + 60 + 35 + 35 + 200)
+
+
+def test_leg_incidents_hit_the_legs_passing_by():
+    # a closure between stops 2 and 3, on the road
+    context = dict(CONTEXT, incidents=[{"kind": "road_closed", "lat": 12.95, "lng": 77.525, "radius": 0.1}])
+    dense = incident_penalties(COORDS, context)
+    hit = {(a, b) for a, b in zip(*np.nonzero(dense.leg))}
+    # every leg along the road that spans the closure, both ways
+    assert hit == {(a, b) for a in (0, 1, 2) for b in (3,)} | {(3, a) for a in (0, 1, 2)}
+    assert dense.stop.tolist() == [0.0] * 5
+
+    lazy = incident_penalties(COORDS, context, lazy=True)
+    src, dst = np.nonzero(~np.eye(5, dtype=bool))
+    assert lazy.leg[src, dst].tolist() == dense.leg[src, dst].tolist()
+
+
+def test_remap_follows_stops_into_a_subproblem():
+    context = dict(
+        CONTEXT,
+        incidents=[
+            {"kind": "accident", "index": 3, "severity": 1.0},
+            {"kind": "accident", "index": 2, "severity": 1.0},
+            {"kind": "accident", "index": 1, "severity": 1.0, "radius": 0.5},
+            {"kind": "traffic_jam", "lat": 12.9, "lng": 77.5},
+        ],
+    )
+    local = remap_incidents(context, {0: 0, 3: 1}, COORDS)
+    assert local["incidents"] == [
+        {"kind": "accident", "index": 1, "severity": 1.0},
+        # outside the sub-problem but reaching further: kept at its place
+        {"kind": "accident", "index": None, "severity": 1.0, "radius": 0.5,
+         "lat": 12.95, "lng": 77.51, "scope": "stop"},
+        {"kind": "traffic_jam", "lat": 12.9, "lng": 77.5},
+    ]
+    assert "incident" not in local
+    assert "incidents" not in remap_incidents(CONTEXT, {0: 0}, COORDS)
@@ -0,0 +1,81 @@
+import random
+
+import numpy as np
+import pytest
+
+from model.alns_optimizer import RouteState, build_travel_matrix, route_cost
+from model.local_search import improve, neighbour_lists, or_opt, relocate, two_opt
+
+
+def problem(n=25, seed=0):
+    rng = random.Random(seed)
+    coords = [(12.9 + rng.random() * 0.1, 77.5 + rng.random() * 0.1) for _ in range(n)]
+    fragile = [i > 0 and rng.random() < 0.2 for i in range(n)]
+    windows = [(None, None)] + [
+        (s, s + 40) if rng.random() < 0.4 else (None, None)
+        for s in (rng.randint(480, 620) for _ in range(n - 1))
+    ]
+    context = {"vehicle": "van", "traffic": "Normal"}
+    return coords, fragile, windows, context
+
+
+def state_for(route, coords, fragile, windows, context):
+    matrix = build_travel_matrix(coords, context)
+    return RouteState(route, coords, fragile, windows, 480, context, matrix=matrix), matrix
+
+
+def test_neighbour_lists_are_the_k_nearest_in_order():
+    rng = np.random.default_rng(0)
+    time = rng.random((10, 10))
+    lists = neighbour_lists(time, k=4)
+    for i, row in enumerate(lists):
+        others = [j for j in np.argsort(time[i]) if j != i]
+        assert row == others[:4]
+    assert neighbour_lists(np.zeros((1, 1))) == [[]]
+
+
+@pytest.mark.parametrize("op", [relocate, or_opt, two_opt])
+@pytest.mark.parametrize("seed", range(3))
+def test_each_move_lowers_the_route_cost(op, seed):
+    coords, fragile, windows, context = problem(seed=seed)
+    rng = random.Random(seed)
+    route = [0] + rng.sample(range(1, len(coords)), len(coords) - 1)
+    state, matrix = state_for(route, coords, fragile, windows, context)
+    neighbours = neighbour_lists(matrix.time)
+
+    before = state.total
+    moved = op(state, neighbours)
+    after = route_cost(state.route, coords, fragile, windows, 480, context)
+    assert sorted(state.route) == list(range(len(coords))) and state.route[0] == 0
+    assert state.total == pytest.approx(after)
+    if moved:
+        assert after < before
+    else:
+        assert state.route == route
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_improve_reaches_a_local_optimum(seed):
+    coords, fragile, windows, context = problem(seed=seed)
+    route = list(range(len(coords)))
+    state, matrix = state_for(route, coords, fragile, windows, context)
+    neighbours = neighbour_lists(matrix.time)
+
+    start = state.total
+    moves = improve(state, neighbours)
+    assert moves > 0
+    assert state.total < start
+    assert state.total == pytest.approx(route_cost(state.route, coords, fragile, windows, 480, context))
+    # nothing left to improve
+    assert improve(state, neighbours) == 0
+
+
+def test_improve_stops_at_the_move_limit_and_deadline():
+    coords, fragile, windows, context = problem(seed=1)
+    state, matrix = state_for(list(range(len(coords))), coords, fragile, windows, context)
+    neighbours = neighbour_lists(matrix.time)
+    assert improve(state, neighbours, max_moves=2) == 2
+    # a deadline in the past: no move is tried
+    route = list(state.route)
+    assert improve(state, neighbours, deadline=0.0) == 0
+    assert state.route == route
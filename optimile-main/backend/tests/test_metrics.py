@@ -0,0 +1,27 @@
+from fastapi.testclient import TestClient
+
+import backend.main as main
+from backend.main import prometheus_text
+
+
+def test_prometheus_text():
+    stats = {"hits": 3, "enabled": True, "ratio": 0.25, "breaker": "open", "pool": {"busy": 2}, "note": None}
+    assert prometheus_text("x", stats) == [
+        "x_hits 3",
+        "x_enabled 1",
+        "x_ratio 0.25",
+        'x_breaker{state="open"} 1',
+        "x_pool_busy 2",
+    ]
+
+
+def test_metrics_endpoint(monkeypatch):
+    monkeypatch.delenv("OPTIMILE_TRAFFIC_SOURCE", raising=False)
+    monkeypatch.delenv("TOMTOM_API_KEY", raising=False)
+    with TestClient(main.app) as client:
+        r = client.get("/metrics")
+    assert r.status_code == 200
+    lines = r.text.splitlines()
+    assert any(line.startswith("optimile_response_cache_") for line in lines)
+    assert any(line.startswith("optimile_solver_") for line in lines)
+    assert 'optimile_traffic_breaker{state="closed"} 1' in lines
@@ -0,0 +1,84 @@
+import itertools
+import random
+
+import pytest
+
+from model.alns_optimizer import optimize_route, route_cost, route_lower_bound
+
+
+def problem(n=15, seed=0):
+    rng = random.Random(seed)
+    coords = [(12.9 + rng.random() * 0.1, 77.5 + rng.random() * 0.1) for _ in range(n)]
+    fragile = [i > 0 and rng.random() < 0.2 for i in range(n)]
+    windows = [(None, None)] + [
+        (s, s + 60) if rng.random() < 0.5 else (None, None)
+        for s in (rng.randint(480, 600) for _ in range(n - 1))
+    ]
+    context = {"vehicle": "van", "traffic": "Normal"}
+    return dict(
+        coords=coords,
+        fragile_flags=fragile,
+        time_windows=windows,
+        context=context,
+        start_time_min=480,
+    )
+
+
+def cost_of(route, p):
+    return route_cost(
+        route, p["coords"], p["fragile_flags"], p["time_windows"], p["start_time_min"], p["context"]
+    )
+
+
+def check_route(route, n):
+    assert route[0] == 0
+    assert sorted(route) == list(range(n))
+
+
+def test_best_route_is_returned_with_its_cost():
+    p = problem()
+    route, cost, stats = optimize_route(**p, iters=200, seed=1, return_stats=True)
+    check_route(route, 15)
+    assert cost == pytest.approx(cost_of(route, p))
+    assert cost <= cost_of(list(range(15)), p)
+    assert stats["iterations"] == 200 and stats["stop_reason"] == "iterations"
+
+
+def test_time_limit_stops_the_search():
+    p = problem(n=40)
+    route, cost, stats = optimize_route(
+        **p, iters=10**7, time_limit_ms=200, seed=1, return_stats=True
+    )
+    check_route(route, 40)
+    assert stats["stop_reason"] == "time_limit"
+    # one iteration may finish past the deadline
+    assert stats["elapsed_ms"] < 1500
+
+
+def test_no_improvement_stops_the_search():
+    p = problem()
+    _, _, stats = optimize_route(**p, iters=10**6, max_no_improve=30, seed=1, return_stats=True)
+    assert stats["stop_reason"] == "no_improve"
+    assert stats["iterations"] < 10**6
+
+
+def test_target_gap_stops_the_search():
+    p = problem()
+    _, cost, stats = optimize_route(**p, iters=10**6, target_gap=100.0, seed=1, return_stats=True)
+    assert stats["stop_reason"] == "target_gap"
+    assert stats["lower_bound"] <= cost
+    assert stats["gap"] <= 100.0
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_lower_bound_is_below_every_route(seed):
+    p = problem(n=6, seed=seed)
+    p["context"] = dict(p["context"], incident={"kind": "accident", "index": 2, "severity": 1.0})
+    bound = route_lower_bound(p["coords"], p["fragile_flags"], p["context"])
+    best = min(cost_of([0, *perm], p) for perm in itertools.permutations(range(1, 6)))
+    assert 0 < bound <= best
+
+
+def test_same_seed_same_result():
+    p = problem()
+    assert optimize_route(**p, iters=100, seed=3) == optimize_route(**p, iters=100, seed=3)
@@ -0,0 +1,60 @@
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from model.alns_optimizer import optimize_route, route_cost
+from model.parallel import multi_start_optimize
+
+
+def problem(n=14, seed=0):
+    rng = random.Random(seed)
+    return dict(
+        coords=[(12.9 + rng.random() * 0.1, 77.5 + rng.random() * 0.1) for _ in range(n)],
+        fragile_flags=[False] + [rng.random() < 0.2 for _ in range(n - 1)],
+        time_windows=[(None, None)] * n,
+        context={"vehicle": "van", "traffic": "Normal"},
+        start_time_min=480,
+    )
+
+
+def test_best_chain_wins():
+    p = problem()
+    route, cost, chains = multi_start_optimize(**p, n_chains=3, iters=60, seed=5)
+    assert len(chains) == 3
+    assert cost == min(chain["cost"] for chain in chains)
+    assert sorted(route) == list(range(14)) and route[0] == 0
+    assert cost == pytest.approx(route_cost(route, **p))
+    assert all(chain["iterations"] == 60 for chain in chains)
+
+
+def test_one_chain_is_one_alns_run():
+    p = problem()
+    route, cost, _ = multi_start_optimize(**p, n_chains=1, iters=80, seed=5)
+    assert (route, cost) == optimize_route(**p, iters=80, seed=5)
+
+
+def test_pool_matches_in_process():
+    p = problem()
+    local = multi_start_optimize(**p, n_chains=2, iters=50, seed=9, exchange_every=20)
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        pooled = multi_start_optimize(
+            **p, executor=executor, n_chains=2, iters=50, seed=9, exchange_every=20
+        )
+    assert pooled[:2] == local[:2]
+    assert [c["cost"] for c in pooled[2]] == [c["cost"] for c in local[2]]
+
+
+def test_exchange_splits_the_budget_into_epochs():
+    p = problem()
+    _, _, chains = multi_start_optimize(**p, n_chains=4, iters=50, seed=1, exchange_every=20)
+    assert all(chain["iterations"] == 50 for chain in chains)
+    # three epochs, each won by one chain
+    assert sum(chain["epochs_won"] for chain in chains) == 3
+
+
+def test_initial_route_is_never_lost():
+    p = problem()
+    start = [0] + list(range(13, 0, -1))
+    route, cost = optimize_route(**p, iters=5, seed=2, initial_route=start)
+    assert cost <= route_cost(start, **p)
@@ -0,0 +1,49 @@
+import threading
+
+from backend.plan_store import PlanStore, order_from_plan, stop_key
+
+
+def test_saved_plans_come_back_rounded():
+    store = PlanStore()
+    plan_id = store.save([(12.97160004, 77.5946), (12.98, 77.6)])
+    assert store.get(plan_id) == [(12.9716, 77.5946), (12.98, 77.6)]
+    assert store.get("unknown") is None
+
+
+def test_least_recently_used_plan_is_dropped():
+    store = PlanStore(max_plans=2)
+    a = store.save([(1.0, 1.0)])
+    b = store.save([(2.0, 2.0)])
+    store.get(a)
+    c = store.save([(3.0, 3.0)])
+    assert store.get(b) is None
+    assert store.get(a) is not None and store.get(c) is not None
+
+
+def test_concurrent_saves_are_all_kept():
+    store = PlanStore()
+    ids = []
+
+    def save(k):
+        ids.append(store.save([(float(k), 0.0)]))
+
+    threads = [threading.Thread(target=save, args=(k,)) for k in range(50)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(set(ids)) == 50
+    assert all(store.get(i) is not None for i in ids)
+
+
+def test_order_follows_the_plan():
+    stops = [(1.0, 1.0), (2.0, 2.0), (3.0, 3.0), (4.0, 4.0)]
+    # stop 3 is new since the plan, and the plan's (9, 9) was delivered
+    plan = [stop_key(3.0, 3.0), stop_key(9.0, 9.0), stop_key(1.0000000001, 1.0), stop_key(2.0, 2.0)]
+    assert order_from_plan(plan, stops) == [2, 0, 1]
+
+
+def test_duplicate_positions_are_matched_in_turn():
+    stops = [(1.0, 1.0), (1.0, 1.0), (2.0, 2.0)]
+    plan = [stop_key(2.0, 2.0), stop_key(1.0, 1.0), stop_key(1.0, 1.0), stop_key(1.0, 1.0)]
+    assert order_from_plan(plan, stops) == [2, 0, 1]
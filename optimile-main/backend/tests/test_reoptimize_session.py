@@ -0,0 +1,82 @@
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import backend.main as main
+from backend.driver_sessions import InMemorySessionBackend, SessionStore
+
+STOPS = [{"lat": 0.01 * i, "lng": 0.003 * (i % 3)} for i in range(1, 7)]
+
+
+def request(**overrides):
+    body = {
+        "driver_id": "driver-1",
+        "current_lat": 0.0,
+        "current_lng": 0.0,
+        "remaining_stops": STOPS,
+        "vehicle": "van",
+        "traffic": "Heavy",
+        "weather": "Sunny",
+        "reason": "deviation",
+        # a delay well above the reroute threshold
+        "severity": 1.0,
+        "time_limit_ms": 50,
+    }
+    body.update(overrides)
+    return body
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "driver_sessions", SessionStore(InMemorySessionBackend()))
+    monkeypatch.delenv("OPTIMILE_TRAFFIC_SOURCE", raising=False)
+    monkeypatch.delenv("TOMTOM_API_KEY", raising=False)
+    main.response_cache.clear()
+    with TestClient(main.app) as c:
+        yield c
+    main.response_cache.clear()
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_shed_reroute_does_not_start_the_cooldown(client, monkeypatch, status):
+    solve = main.run_solver
+
+    async def shed(*args, **kwargs):
+        raise HTTPException(status_code=status, detail="shed")
+
+    monkeypatch.setattr(main, "run_solver", shed)
+    assert client.post("/reoptimize", json=request()).status_code == status
+
+    session = main.driver_sessions.backend.get("driver-1")
+    assert session["last_reopt_at"] == 0.0
+    assert session["handled_delay"] == 0.0
+    assert session["last_plan_id"] is None
+
+    # the driver's retry reroutes instead of being held by the cooldown
+    monkeypatch.setattr(main, "run_solver", solve)
+    r = client.post("/reoptimize", json=request(current_lat=0.0001))
+    assert r.status_code == 200
+    assert r.json()["rerouted"] is True
+
+    session = main.driver_sessions.backend.get("driver-1")
+    assert session["last_plan_id"] == r.json()["plan_id"]
+    assert session["last_reopt_at"] > 0.0
+
+    # after a plan was produced, the same trigger is in cooldown
+    r = client.post("/reoptimize", json=request(current_lat=0.0002))
+    assert r.status_code == 200
+    assert r.json()["rerouted"] is False
+
+
+def test_failed_solve_does_not_start_the_cooldown(client, monkeypatch):
+    async def crash(*args, **kwargs):
+        raise RuntimeError("solver crashed")
+
+    monkeypatch.setattr(main, "run_solver", crash)
+    with pytest.raises(RuntimeError):
+        client.post("/reoptimize", json=request())
+
+    session = main.driver_sessions.backend.get("driver-1")
+    assert session["last_reopt_at"] == 0.0
+    # the burst's delay is still pending for the retry
+    assert session["pending_delay"] > 0.0
@@ -0,0 +1,163 @@
+import asyncio
+
+import pytest
+
+from backend.response_cache import ResponseCache, fingerprint, request_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def counting(value, delay=0.0):
+    calls = []
+
+    async def compute():
+        calls.append(value)
+        await asyncio.sleep(delay)
+        return value
+
+    return compute, calls
+
+
+def test_concurrent_misses_share_one_run():
+    async def scenario():
+        cache = ResponseCache()
+        compute, calls = counting("plan", delay=0.05)
+        results = await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(5)))
+        assert results == ["plan"] * 5
+        assert calls == ["plan"]
+        assert cache.stats() == {"hits": 0, "misses": 1, "coalesced": 4, "entries": 1, "in_flight": 0}
+
+    asyncio.run(scenario())
+
+
+def test_errors_reach_every_waiter_and_are_not_stored():
+    async def scenario():
+        cache = ResponseCache()
+        runs = []
+
+        async def fail():
+            runs.append(1)
+            await asyncio.sleep(0.05)
+            raise ValueError("solver failed")
+
+        results = await asyncio.gather(
+            *(cache.get_or_compute("k", fail) for _ in range(3)), return_exceptions=True
+        )
+        assert all(isinstance(r, ValueError) for r in results)
+        assert len(runs) == 1
+
+        # the next request runs again
+        compute, calls = counting("plan")
+        assert await cache.get_or_compute("k", compute) == "plan"
+        assert calls == ["plan"]
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_cancel_the_leader():
+    async def scenario():
+        cache = ResponseCache()
+        compute, calls = counting("plan", delay=0.05)
+        leader = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        assert await leader == "plan"
+        assert calls == ["plan"]
+
+    asyncio.run(scenario())
+
+
+def test_entries_expire_after_ttl():
+    async def scenario():
+        clock = FakeClock()
+        cache = ResponseCache(ttl_s=30.0, clock=clock)
+        compute, calls = counting("plan")
+
+        await cache.get_or_compute("k", compute)
+        clock.now = 29.9
+        await cache.get_or_compute("k", compute)
+        assert calls == ["plan"] and cache.hits == 1
+
+        clock.now = 30.0
+        await cache.get_or_compute("k", compute)
+        assert calls == ["plan", "plan"] and cache.misses == 2
+
+    asyncio.run(scenario())
+
+
+def test_least_recently_used_entry_is_evicted():
+    async def scenario():
+        cache = ResponseCache(max_entries=2)
+        computes = {key: counting(key) for key in "abc"}
+        for key in "ab":
+            await cache.get_or_compute(key, computes[key][0])
+        # touch a, so b is the oldest
+        await cache.get_or_compute("a", computes["a"][0])
+        await cache.get_or_compute("c", computes["c"][0])
+        await cache.get_or_compute("a", computes["a"][0])
+        await cache.get_or_compute("b", computes["b"][0])
+        assert computes["a"][1] == ["a"]
+        assert computes["b"][1] == ["b", "b"]
+
+    asyncio.run(scenario())
+
+
+def test_fingerprint_rounds_positions_only():
+    base = {"stops": [{"lat": 12.9716001, "lng": 77.5946001}], "traffic": "Heavy"}
+    jitter = {"stops": [{"lat": 12.9716002, "lng": 77.5946002}], "traffic": "Heavy"}
+    assert fingerprint(base) == fingerprint(jitter)
+    assert fingerprint(base) != fingerprint(dict(base, traffic="Low"))
+    assert fingerprint({"a": 1, "b": 2}) == fingerprint({"b": 2, "a": 1})
+
+
+@pytest.mark.parametrize("moved", [0.01, 1.0])
+def test_fingerprint_tells_moved_stops_apart(moved):
+    base = {"stops": [{"lat": 12.97, "lng": 77.59}]}
+    other = {"stops": [{"lat": 12.97 + moved, "lng": 77.59}]}
+    assert fingerprint(base) != fingerprint(other)
+
+
+class Request:
+    """Stands in for a pydantic request model."""
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def model_dump(self, mode="python"):
+        return self.payload
+
+
+def key(payload, endpoint="optimize", start=480):
+    return request_key(endpoint, Request(payload), start)
+
+
+def test_key_rounds_positions_only():
+    base = {"stops": [{"lat": 12.9716001, "lng": 77.5946001}], "traffic": "Heavy"}
+    jitter = {"stops": [{"lat": 12.9716002, "lng": 77.5946002}], "traffic": "Heavy"}
+    assert key(base) == key(jitter)
+    assert key(base) != key(dict(base, traffic="Low"))
+    assert key({"a": 1, "b": 2}) == key({"b": 2, "a": 1})
+
+
+@pytest.mark.parametrize("moved", [0.01, 1.0])
+def test_key_tells_moved_stops_apart(moved):
+    base = {"stops": [{"lat": 12.97, "lng": 77.59}]}
+    other = {"stops": [{"lat": 12.97 + moved, "lng": 77.59}]}
+    assert key(base) != key(other)
+
+
+def test_key_covers_endpoint_and_start_minute():
+    base = {"stops": [{"lat": 12.97, "lng": 77.59}]}
+    assert key(base) != key(base, endpoint="reoptimize")
+    assert key(base, start=480) != key(base, start=481)
+    assert request_key("optimize", Request(base), 480, bucket_min=5) == request_key(
+        "optimize", Request(base), 484, bucket_min=5
+    )
@@ -0,0 +1,135 @@
+import random
+
+import numpy as np
+import pytest
+
+import model.road_network as road_network
+from model.distance import ROAD_FACTOR, distance_matrix, haversine
+from model.road_network import RoadNetwork
+
+
+def grid(size=6, seed=0, oneway_share=0.3):
+    """A jittered street grid with some one-way edges."""
+    rng = random.Random(seed)
+    nodes = [
+        (12.9 + 0.01 * i + rng.random() * 0.002, 77.5 + 0.01 * j + rng.random() * 0.002)
+        for i in range(size)
+        for j in range(size)
+    ]
+    src, dst = [], []
+    for i in range(size):
+        for j in range(size):
+            here = i * size + j
+            if j + 1 < size:
+                src.append(here), dst.append(here + 1)
+            if i + 1 < size:
+                src.append(here), dst.append(here + size)
+    oneway = [rng.random() < oneway_share for _ in src]
+    return nodes, src, dst, oneway
+
+
+def floyd_warshall(network):
+    n = len(network)
+    d = np.full((n, n), np.inf)
+    np.fill_diagonal(d, 0.0)
+    g = network.graph.tocoo()
+    for a, b, w in zip(g.row, g.col, g.data):
+        d[a, b] = min(d[a, b], w)
+    for k in range(n):
+        d = np.minimum(d, d[:, k, None] + d[None, k, :])
+    return d
+
+
+def brute_table(network, a, b):
+    paths = floyd_warshall(network)
+    out = np.empty((len(a), len(b)))
+    for i, p in enumerate(a):
+        for j, q in enumerate(b):
+            if p == q:
+                out[i, j] = 0.0
+                continue
+            na = min(range(len(network)), key=lambda k: haversine(*p, *network.nodes[k]))
+            nb = min(range(len(network)), key=lambda k: haversine(*q, *network.nodes[k]))
+            path = paths[na, nb]
+            if np.isfinite(path):
+                out[i, j] = haversine(*p, *network.nodes[na]) + path + haversine(*q, *network.nodes[nb])
+            else:
+                out[i, j] = ROAD_FACTOR * haversine(*p, *q)
+    return out
+
+
+def mapped_file(array):
+    while array is not None and not isinstance(array, np.memmap):
+        array = array.base
+    return array is not None
+
+
+def stops(n, seed):
+    rng = random.Random(seed)
+    return [(12.9 + rng.random() * 0.05, 77.5 + rng.random() * 0.05) for _ in range(n)]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_table_matches_brute_force(seed):
+    network = RoadNetwork.from_edges(*grid(seed=seed)[:3], oneway=grid(seed=seed)[3])
+    a, b = stops(8, seed), stops(3, seed + 10)
+    # more sources than targets: the search runs on the reversed graph
+    assert network.table(a, b).ravel().tolist() == pytest.approx(brute_table(network, a, b).ravel())
+    assert network.table(b, a).ravel().tolist() == pytest.approx(brute_table(network, b, a).ravel())
+    full = network.table(a, a)
+    assert not np.diag(full).any()
+
+
+def test_one_way_edges_and_disconnected_pairs():
+    nodes = [(12.90, 77.50), (12.91, 77.50), (13.50, 78.00)]
+    network = RoadNetwork.from_edges(nodes, [0], [1], oneway=[True])
+    table = network.table(nodes, nodes)
+    leg = haversine(*nodes[0], *nodes[1])
+    assert table[0, 1] == pytest.approx(leg)
+    # no way back, and no way to the isolated node: road estimates
+    assert table[1, 0] == pytest.approx(ROAD_FACTOR * leg)
+    assert table[0, 2] == pytest.approx(ROAD_FACTOR * haversine(*nodes[0], *nodes[2]))
+
+
+def test_duplicate_edges_keep_the_shortest():
+    nodes = [(12.90, 77.50), (12.91, 77.50)]
+    network = RoadNetwork.from_edges(nodes, [0, 0], [1, 1], length=[5.0, 2.0])
+    assert network.table(nodes, nodes)[0, 1] == 2.0
+    assert network.graph.nnz == 2
+
+
+def test_npz_round_trip_and_mmap(tmp_path):
+    network = RoadNetwork.from_edges(*grid()[:3], oneway=grid()[3])
+    path = tmp_path / "city.npz"
+    network.save(path)
+    a = stops(6, 1)
+    want = network.table(a, a)
+
+    plain = RoadNetwork.load(path, mmap=False)
+    assert plain.table(a, a).tolist() == want.tolist()
+
+    mapped = RoadNetwork.load(path)
+    assert (tmp_path / "city.npz.cache" / "indices.npy").exists()
+    for array in (mapped.nodes, mapped.graph.indptr, mapped.graph.indices, mapped.graph.data):
+        assert not array.flags.owndata and mapped_file(array)
+    assert mapped.table(a, a).tolist() == want.tolist()
+    # a second load maps the same cache files
+    stamp = (tmp_path / "city.npz.cache" / "length.npy").stat().st_mtime_ns
+    assert RoadNetwork.load(path).table(a, a).tolist() == want.tolist()
+    assert (tmp_path / "city.npz.cache" / "length.npy").stat().st_mtime_ns == stamp
+
+
+def test_network_distance_mode(tmp_path, monkeypatch):
+    network = RoadNetwork.from_edges(*grid()[:3])
+    path = tmp_path / "city.npz"
+    network.save(path)
+    monkeypatch.setenv(road_network.NETWORK_ENV, str(path))
+    monkeypatch.setattr(road_network, "_default", None)
+
+    a = stops(5, 2)
+    assert distance_matrix(a, "network").tolist() == network.table(a, a).tolist()
+
+    monkeypatch.delenv(road_network.NETWORK_ENV)
+    monkeypatch.setattr(road_network, "_default", None)
+    with pytest.raises(ValueError):
+        distance_matrix(a, "network")
@@ -0,0 +1,89 @@
+import random
+
+import numpy as np
+import pytest
+
+from model.route import Route
+
+N = 30
+
+
+def check(route, expected):
+    assert route.tolist() == expected
+    for stop in range(N):
+        if stop in expected:
+            assert stop in route and route.index(stop) == expected.index(stop)
+        else:
+            assert stop not in route
+            with pytest.raises(ValueError):
+                route.index(stop)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_edits_match_a_list(seed):
+    rng = random.Random(seed)
+    expected = [0] + rng.sample(range(1, N), 15)
+    route = Route(expected, n_stops=N)
+    check(route, expected)
+
+    for _ in range(200):
+        op = rng.choice(["insert", "pop", "remove", "remove_many", "splice", "reverse"])
+        missing = [s for s in range(N) if s not in expected]
+        n = len(expected)
+        if op == "insert" and missing:
+            i, stop = rng.randint(-n, n), rng.choice(missing)
+            route.insert(i, stop)
+            expected.insert(i, stop)
+        elif op == "pop" and n > 1:
+            i = rng.randrange(1, n)
+            assert route.pop(i) == expected.pop(i)
+        elif op == "remove" and n > 1:
+            stop = rng.choice(expected[1:])
+            route.remove(stop)
+            expected.remove(stop)
+        elif op == "remove_many":
+            gone = rng.sample(expected[1:], min(3, n - 1))
+            route.remove_many(gone)
+            expected = [s for s in expected if s not in gone]
+        elif op == "splice":
+            p = rng.randrange(1, n + 1)
+            q = rng.randrange(p, n + 1)
+            # the removed part, reshuffled, plus some stops from outside
+            head = expected[p:q] + rng.sample(missing, min(len(missing), rng.randint(0, 2)))
+            rng.shuffle(head)
+            route.splice(p, head, q)
+            expected[p:q] = head
+        elif op == "reverse" and n > 1:
+            i = rng.randrange(1, n)
+            j = rng.randrange(i, n + 1)
+            route.reverse(i, j)
+            expected[i:j] = expected[i:j][::-1]
+        check(route, expected)
+
+
+def test_sequence_protocol():
+    route = Route([0, 3, 1, 2])
+    assert len(route) == 4 and list(route) == [0, 3, 1, 2] and route[1] == 3
+    assert route == [0, 3, 1, 2] and route == Route([0, 3, 1, 2])
+    assert route[1:3] + route[:1] == Route([3, 1, 0]).stops
+    assert np.asarray(route).tolist() == [0, 3, 1, 2]
+    # outside the stop universe is simply not on the route
+    assert 7 not in route and -1 not in route
+
+
+def test_assign_and_copy_are_independent():
+    a = Route([0, 1, 2, 3], n_stops=6)
+    b = Route([0, 5], n_stops=6)
+    b.assign(a)
+    assert b == a and b.index(3) == 3 and 5 not in b
+    a.pop(1)
+    assert b.tolist() == [0, 1, 2, 3]
+
+    c = b.copy()
+    c.reverse(1, 4)
+    assert c.tolist() == [0, 3, 2, 1] and b.tolist() == [0, 1, 2, 3]
+
+    # a differently sized stop universe is copied over too
+    d = Route([0], n_stops=2)
+    d.assign(b)
+    assert d == b and d.index(2) == 2
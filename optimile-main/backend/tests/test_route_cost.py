@@ -0,0 +1,165 @@
+import random
+
+import numpy as np
+import pytest
+
+from model.alns_optimizer import (
+    LazyTravelMatrix,
+    RouteState,
+    build_travel_matrix,
+    insertion_neighbourhood,
+    route_cost,
+    route_cost_batch,
+    two_opt_neighbourhood,
+)
+from model.time_profile import SpeedProfile
+
+N = 12
+
+
+def problem(seed=0, profile=False):
+    rng = random.Random(seed)
+    coords = [(12.9 + rng.random() * 0.1, 77.5 + rng.random() * 0.1) for _ in range(N)]
+    fragile = [i > 0 and rng.random() < 0.3 for i in range(N)]
+    windows = [(None, None)]
+    for _ in range(N - 1):
+        if rng.random() < 0.6:
+            start = rng.randint(480, 560)
+            windows.append((start, start + rng.randint(10, 60)))
+        else:
+            windows.append((None, None))
+    context = {
+        "vehicle": "van",
+        "traffic": "Heavy",
+        "incidents": [
+            {"kind": "accident", "index": 3, "severity": 0.5},
+            {"kind": "traffic_jam", "lat": coords[5][0], "lng": coords[5][1], "radius": 1.0, "scope": "leg"},
+            {"kind": "road_closed", "legs": [[2, 7, 0.4], [7, 2, 1.0]]},
+        ],
+    }
+    if profile:
+        context["profile"] = SpeedProfile([0, 510, 540], [1.0, 0.5, 1.5])
+    return coords, fragile, windows, context
+
+
+def expected(route, coords, fragile, windows, context):
+    return route_cost(route, coords, fragile, windows, 480, context)
+
+
+@pytest.mark.parametrize("profile", [False, True])
+@pytest.mark.parametrize("seed", range(3))
+def test_state_total_matches_route_cost(seed, profile):
+    coords, fragile, windows, context = problem(seed, profile)
+    matrix = build_travel_matrix(coords, context)
+    rng = random.Random(seed)
+    for _ in range(10):
+        route = [0] + rng.sample(range(1, N), N - 1)
+        state = RouteState(route, coords, fragile, windows, 480, context, matrix=matrix)
+        assert state.total == pytest.approx(expected(route, coords, fragile, windows, context))
+
+
+@pytest.mark.parametrize("profile", [False, True])
+@pytest.mark.parametrize("seed", range(3))
+def test_state_moves_match_route_cost(seed, profile):
+    coords, fragile, windows, context = problem(seed, profile)
+    matrix = build_travel_matrix(coords, context)
+    rng = random.Random(100 + seed)
+    route = [0] + rng.sample(range(1, N), N - 1)
+    state = RouteState(list(route), coords, fragile, windows, 480, context, matrix=matrix)
+
+    for _ in range(30):
+        n = len(state.route)
+        route = list(state.route)
+        # remove a stop
+        pos = rng.randrange(1, n)
+        assert state.removal_cost(pos) == pytest.approx(
+            expected(route[:pos] + route[pos + 1:], coords, fragile, windows, context)
+        )
+        # move a segment elsewhere (Or-opt style splice)
+        p = rng.randrange(1, n)
+        q = rng.randrange(p, n + 1)
+        head = rng.sample(route[1:], min(3, n - 1))
+        head = [s for s in head if s not in route[1:p] and s not in route[q:]]
+        assert state.splice_cost(p, head, q) == pytest.approx(
+            expected(route[:p] + head + route[q:], coords, fragile, windows, context)
+        )
+        # apply a removal then re-insert the stop at its cheapest place
+        stop = state.remove(pos)
+        assert state.total == pytest.approx(expected(list(state.route), coords, fragile, windows, context))
+        costs = state.insertion_costs(stop)
+        for i, cost in enumerate(costs, start=1):
+            route = list(state.route)
+            assert cost == pytest.approx(
+                expected(route[:i] + [stop] + route[i:], coords, fragile, windows, context)
+            )
+        best, cost = state.best_insertion(stop)
+        state.insert(best, stop)
+        assert state.total == pytest.approx(cost)
+
+
+CACHES = ("times", "cum", "legs", "fixed", "wait_slack", "late_slack", "depart_lo", "depart_hi")
+
+
+@pytest.mark.parametrize("profile", [False, True])
+@pytest.mark.parametrize("seed", range(3))
+def test_edited_state_equals_a_fresh_one(seed, profile):
+    coords, fragile, windows, context = problem(seed, profile)
+    matrix = build_travel_matrix(coords, context)
+    rng = random.Random(200 + seed)
+    state = RouteState([0] + rng.sample(range(1, N), N - 1), coords, fragile, windows, 480, context, matrix=matrix)
+
+    for _ in range(40):
+        n = len(state.route)
+        move = rng.random()
+        if move < 0.3 and n > 2:
+            state.remove(rng.randrange(1, n))
+        elif move < 0.6 and n < N:
+            missing = sorted(set(range(N)) - set(state.route))
+            state.insert(rng.randrange(1, n + 1), rng.choice(missing))
+        else:
+            # reverse a segment, 2-opt style
+            p = rng.randrange(1, n)
+            q = rng.randrange(p, n + 1)
+            state.splice(p, list(state.route)[p:q][::-1], q)
+
+        fresh = RouteState(list(state.route), coords, fragile, windows, 480, context, matrix=matrix)
+        # only the edited suffix is recomputed, in the same order: bit for bit
+        for name in CACHES:
+            assert getattr(state, name) == getattr(fresh, name), name
+        assert state.total == fresh.total
+        if profile:
+            assert state._early_min == fresh._early_min
+            assert state._late_min == fresh._late_min
+
+
+@pytest.mark.parametrize("profile", [False, True])
+@pytest.mark.parametrize("seed", range(3))
+def test_batch_matches_route_cost(seed, profile):
+    coords, fragile, windows, context = problem(seed, profile)
+    rng = random.Random(200 + seed)
+    routes = np.array([[0] + rng.sample(range(1, N), N - 1) for _ in range(16)])
+    want = [expected(list(row), coords, fragile, windows, context) for row in routes]
+
+    for matrix in (None, build_travel_matrix(coords, context), LazyTravelMatrix(coords, context)):
+        got = route_cost_batch(routes, coords, fragile, windows, 480, context, matrix=matrix)
+        assert got.tolist() == pytest.approx(want)
+
+    # shorter (partial) routes score the same way
+    partial = routes[:, : N // 2]
+    got = route_cost_batch(partial, coords, fragile, windows, 480, context)
+    assert got.tolist() == pytest.approx(
+        [expected(list(row), coords, fragile, windows, context) for row in partial]
+    )
+
+
+def test_neighbourhoods():
+    route = [0, 3, 1, 2]
+    assert insertion_neighbourhood(route, 4).tolist() == [
+        [0, 4, 3, 1, 2],
+        [0, 3, 4, 1, 2],
+        [0, 3, 1, 4, 2],
+        [0, 3, 1, 2, 4],
+    ]
+    moves, routes = two_opt_neighbourhood(route)
+    assert moves.tolist() == [[1, 2], [1, 3], [2, 3]]
+    assert routes.tolist() == [[0, 1, 3, 2], [0, 2, 1, 3], [0, 3, 2, 1]]
@@ -0,0 +1,210 @@
+import asyncio
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+
+import backend.main as main
+import backend.solver_jobs as solver_jobs
+from backend.solver_jobs import solve_fleet
+from backend.solver_pool import SolverBusy, SolverPool, SolverUnavailable
+from model.fleet import merge_polish
+from model.parallel import run_chain
+
+
+def test_slots_are_refused_past_capacity():
+    async def scenario():
+        pool = SolverPool(workers=2, max_queue=1)
+        pool.start()
+        try:
+            # a fan-out job asking for more slots than workers is clamped
+            async with pool.slots(5):
+                assert pool.in_use == 2
+                async with pool.slots(1):
+                    assert pool.in_use == 3
+                    with pytest.raises(SolverBusy):
+                        async with pool.slots(1):
+                            pass
+                # one slot freed: admitted again
+                async with pool.slots(1):
+                    assert pool.in_use == 3
+            assert pool.in_use == 0
+            assert (pool.admitted, pool.rejected) == (3, 1)
+        finally:
+            pool.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_stopped_or_broken_pool_is_unavailable():
+    async def scenario():
+        pool = SolverPool(workers=1, max_queue=0)
+        with pytest.raises(SolverUnavailable):
+            await pool.run(abs, -1)
+        pool.start()
+        try:
+            assert await pool.run(abs, -1) == 1
+            # the worker process dies mid-job
+            with pytest.raises(SolverUnavailable):
+                await pool.run(os._exit, 1)
+            assert pool.in_use == 0
+        finally:
+            pool.shutdown()
+
+    asyncio.run(scenario())
+
+
+OPTIMIZE = {
+    "stops": [{"lat": 0.01 * i, "lng": 0.003 * (i % 3)} for i in range(1, 8)],
+    "vehicle": "van",
+    "traffic": "Normal",
+    "weather": "Sunny",
+    "start_time": 480,
+    "time_limit_ms": 50,
+}
+
+
+@pytest.fixture
+def client():
+    main.response_cache.clear()
+    with TestClient(main.app) as c:
+        yield c
+    main.response_cache.clear()
+
+
+def test_full_queue_is_429(client, monkeypatch):
+    monkeypatch.setattr(main.solver_pool, "in_use", main.solver_pool.capacity)
+    r = client.post("/optimize", json=OPTIMIZE)
+    assert r.status_code == 429
+    assert r.headers["Retry-After"] == "1"
+
+    monkeypatch.setattr(main.solver_pool, "in_use", 0)
+    assert client.post("/optimize", json=OPTIMIZE).status_code == 200
+
+
+def test_stopped_pool_is_503(client):
+    main.solver_pool.shutdown()
+    assert client.post("/optimize", json=dict(OPTIMIZE, start_time=481)).status_code == 503
+
+
+def fleet_job(n=24, n_vehicles=3, seed=5):
+    rng = random.Random(seed)
+    return dict(
+        coords=[(rng.random() * 0.1, rng.random() * 0.1) for _ in range(n)],
+        fragile_flags=[False] * n,
+        time_windows=[(None, None)] * n,
+        demands=[1] * n,
+        vehicles=[
+            {"vehicle": "van", "start": (rng.random() * 0.1, rng.random() * 0.1), "capacity": n}
+            for _ in range(n_vehicles)
+        ],
+        context={"traffic": "Normal"},
+        start_time_min=480,
+        iters=200,
+        seed=0,
+        workers=2,
+    )
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=2)
+        self.mapped = 0
+
+    def map(self, fn, *iterables, **kwargs):
+        self.mapped += 1
+        return super().map(fn, *iterables, **kwargs)
+
+
+def test_fleet_polish_runs_on_the_executor():
+    with CountingExecutor() as executor:
+        pooled = solve_fleet(fleet_job(), executor)
+    assert executor.mapped == 1
+    # the same search as in one process
+    alone = solve_fleet(fleet_job())
+    assert pooled["routes"] == alone["routes"]
+    assert pooled["cost"] == alone["cost"]
+
+
+def in_a_worker(real):
+    """`real`, refusing to run in the test (API) process."""
+    api = os.getpid()
+
+    def spy(*args, **kwargs):
+        assert os.getpid() != api, f"{real.__name__} ran in the API process"
+        return real(*args, **kwargs)
+
+    return spy
+
+
+@pytest.fixture
+def mapped(monkeypatch):
+    calls = []
+    pool_map = main.solver_pool.map
+
+    async def spy(executor, fn, items):
+        calls.append((fn, len(items)))
+        return await pool_map(executor, fn, items)
+
+    monkeypatch.setattr(main, "SOLVER_WORKERS", 2)
+    monkeypatch.setattr(main.solver_pool, "map", spy)
+    return calls
+
+
+def test_fleet_search_runs_in_a_worker(monkeypatch, mapped):
+    # worker processes fork on first use, after the patch
+    monkeypatch.setattr(solver_jobs, "optimize_fleet", in_a_worker(solver_jobs.optimize_fleet))
+    body = {
+        "stops": [{"lat": 0.004 * i, "lng": 0.003 * (i % 5), "demand": 1} for i in range(1, 16)],
+        "vehicles": [
+            {"start_lat": 0.0, "start_lng": 0.0},
+            {"start_lat": 0.05, "start_lng": 0.01},
+        ],
+        "traffic": "Normal",
+        "weather": "Sunny",
+        "start_time": 480,
+        "time_limit_ms": 300,
+    }
+    with TestClient(main.app) as client:
+        r = client.post("/optimize-fleet", json=body)
+    assert r.status_code == 200
+    # only the per-route polish is fanned out
+    assert [fn for fn, _ in mapped] == [run_chain]
+    served = [stop["index"] for route in r.json()["routes"] for stop in route["stops"]]
+    assert sorted(served + r.json()["unassigned"]) == list(range(15))
+    assert r.json()["cost"] == pytest.approx(sum(route["cost"] for route in r.json()["routes"]), abs=1e-2)
+
+
+def test_decomposed_day_runs_in_workers(monkeypatch, mapped):
+    monkeypatch.setattr(solver_jobs, "Decomposition", in_a_worker(solver_jobs.Decomposition))
+    rng = random.Random(2)
+    body = dict(
+        OPTIMIZE,
+        stops=[{"lat": rng.random() * 0.1, "lng": rng.random() * 0.1} for _ in range(170)],
+        decomposition="kmeans",
+        time_limit_ms=1000,
+    )
+    main.response_cache.clear()
+    with TestClient(main.app) as client:
+        r = client.post("/optimize", json=body)
+    assert r.status_code == 200
+    # the clusters, then the seams between them (none if time ran out)
+    assert [fn for fn, _ in mapped] == [run_chain, run_chain]
+    assert mapped[0][1] == 3
+    served = {(stop["lat"], stop["lng"]) for stop in r.json()["optimized_route"]}
+    assert served == {(stop["lat"], stop["lng"]) for stop in body["stops"]}
+
+
+def test_deferred_polish_matches_the_in_process_one():
+    job = fleet_job()
+    alone = solve_fleet(job)
+    deferred = solve_fleet(dict(job, defer_polish=True))
+    results = [run_chain(j) for _, j in deferred["polish_jobs"]]
+    routes, cost = merge_polish(
+        deferred["routes"], deferred["cost"], deferred["stats"], deferred["polish_jobs"], results
+    )
+    assert routes == alone["routes"]
+    assert cost == pytest.approx(alone["cost"])
+    assert deferred["stats"]["polished_routes"] == alone["stats"]["polished_routes"]
@@ -0,0 +1,92 @@
+import math
+import random
+import time
+
+import numpy as np
+import pytest
+
+from model.alns_optimizer import optimize_route
+from model.spatial import GridIndex
+
+
+def brute_within(points, point, radius):
+    d = [math.dist(p, point) for p in points]
+    return sorted((i for i in range(len(points)) if d[i] <= radius), key=lambda i: d[i])
+
+
+def brute_nearest_dists(points, point, k):
+    return sorted(math.dist(p, point) for p in points)[:k]
+
+
+POINT_SETS = {
+    "random": [(random.Random(1).random(), random.Random(2 + i).random()) for i in range(200)],
+    "same_latitude": [(12.97, 77.5 + 0.01 * i) for i in range(50)],
+    "same_longitude": [(12.9 + 0.003 * i, 77.6) for i in range(50)],
+    "coincident": [(12.97, 77.59)] * 20,
+    "coincident_pairs": [(12.97, 77.59)] * 10 + [(12.98, 77.59)] * 10,
+    "single": [(12.97, 77.59)],
+}
+
+
+@pytest.mark.parametrize("name", sorted(POINT_SETS))
+def test_queries_match_brute_force(name):
+    points = POINT_SETS[name]
+    index = GridIndex(points)
+    rng = random.Random(0)
+
+    for _ in range(20):
+        point = points[rng.randrange(len(points))]
+        k = rng.randint(1, len(points))
+        got = index.nearest(point, k)
+        assert len(got) == k
+        assert [math.dist(points[i], point) for i in got] == pytest.approx(
+            brute_nearest_dists(points, point, k)
+        )
+
+        radius = rng.uniform(0.0, 0.2)
+        got = index.within(point, radius)
+        assert sorted(got) == sorted(brute_within(points, point, radius))
+
+
+def test_degenerate_queries_are_fast():
+    points = [(12.97, 77.5 + 1e-4 * i) for i in range(2000)]
+    index = GridIndex(points)
+
+    started = time.perf_counter()
+    assert len(index.nearest(points[0], 2000)) == 2000
+    assert len(index.within((12.97, 77.5), 1.0)) == 2000
+    # far outside the points
+    assert index.nearest((40.0, -70.0), 1) == [0]
+    assert time.perf_counter() - started < 2.0
+
+
+def test_empty_index():
+    index = GridIndex([])
+    assert index.nearest((0.0, 0.0), 3) == []
+    assert index.within((0.0, 0.0), 1.0) == []
+
+
+@pytest.mark.parametrize(
+    "coords",
+    [
+        [(12.97, 77.50 + 0.01 * i) for i in range(6)],
+        [(12.90 + 0.01 * i, 77.59) for i in range(6)],
+        [(12.97, 77.59)] * 6,
+    ],
+)
+def test_optimize_route_honours_time_limit_on_collinear_stops(coords):
+    n = len(coords)
+    started = time.perf_counter()
+    order, cost = optimize_route(
+        coords=coords,
+        fragile_flags=[False] * n,
+        time_windows=[(None, None)] * n,
+        context={"vehicle": "van", "traffic": "Normal"},
+        start_time_min=480,
+        iters=10_000,
+        time_limit_ms=500,
+        seed=0,
+    )
+    assert time.perf_counter() - started < 5.0
+    assert sorted(order) == list(range(n)) and order[0] == 0
+    assert np.isfinite(cost)
@@ -0,0 +1,85 @@
+import random
+
+import numpy as np
+import pytest
+
+from model.time_profile import DAY_MIN, SpeedProfile
+
+# quiet night, slow morning peak, normal day, slow evening peak
+PROFILE = SpeedProfile([0, 420, 600, 1020, 1200], [0.8, 1.6, 1.0, 1.5, 0.9])
+ZONED = SpeedProfile(
+    [0, 480, 720],
+    [[1.0, 2.0, 1.0], [0.5, 1.0, 3.0]],
+    centres=[(12.9, 77.5), (13.1, 77.7)],
+)
+
+
+@pytest.mark.parametrize(
+    "starts, multipliers, centres",
+    [
+        ([], [], None),
+        ([10, 600], [1.0, 1.0], None),
+        ([0, 600, 600], [1.0, 1.0, 1.0], None),
+        ([0, 1440], [1.0, 1.0], None),
+        ([0, 600], [1.0], None),
+        ([0, 600], [1.0, 0.0], None),
+        ([0, 600], [[1.0, 1.0], [1.0, 1.0]], None),
+        ([0, 600], [[1.0, 1.0], [1.0, 1.0]], [(12.9, 77.5)]),
+    ],
+)
+def test_invalid_profiles_are_rejected(starts, multipliers, centres):
+    with pytest.raises(ValueError):
+        SpeedProfile(starts, multipliers, centres)
+
+
+def test_leg_inside_one_bucket_uses_its_multiplier():
+    assert PROFILE.travel(0, 700.0, 30.0) == pytest.approx(30.0)
+    assert PROFILE.travel(0, 430.0, 30.0) == pytest.approx(48.0)
+    # the next day repeats the profile
+    assert PROFILE.travel(0, DAY_MIN + 430.0, 30.0) == pytest.approx(48.0)
+
+
+def test_leg_across_a_boundary_changes_speed_there():
+    # 10 min at 1.6 covers 6.25 free-flow min; the other 13.75 run at 1.0
+    assert PROFILE.travel(0, 590.0, 20.0) == pytest.approx(10.0 + 13.75)
+    # across midnight: 20 min at 0.9 covers 22.2; the rest at 0.8
+    base = 30.0
+    covered = 20.0 / 0.9
+    assert PROFILE.travel(0, 1420.0, base) == pytest.approx(20.0 + (base - covered) * 0.8)
+    # longer than a whole day
+    assert PROFILE.travel(0, 0.0, PROFILE.day[0] * 2) == pytest.approx(2 * DAY_MIN)
+
+
+@pytest.mark.parametrize("profile, zone", [(PROFILE, 0), (ZONED, 0), (ZONED, 1)])
+def test_fifo(profile, zone):
+    departs = np.arange(0.0, 2 * DAY_MIN, 0.5)
+    for base in (1.0, 17.0, 95.0, 700.0):
+        arrivals = [d + profile.travel(zone, d, base) for d in departs]
+        assert np.all(np.diff(arrivals) >= -1e-9)
+
+
+def test_travel_array_matches_scalar_lookups():
+    rng = random.Random(0)
+    zones = [rng.randrange(2) for _ in range(500)]
+    departs = [rng.uniform(0, 3 * DAY_MIN) for _ in range(500)]
+    bases = [rng.uniform(0, 400) for _ in range(500)]
+    got = ZONED.travel_array(zones, departs, bases)
+    want = [ZONED.travel(z, d, b) for z, d, b in zip(zones, departs, bases)]
+    assert got.tolist() == pytest.approx(want)
+
+
+def test_bucket_room():
+    assert PROFILE.bucket_room(450.0, 30.0) == (30.0, 120.0)
+    assert PROFILE.bucket_room(590.0, 30.0) == (-np.inf, -np.inf)
+    # a departure shifted within its room keeps the leg's duration
+    lo, hi = PROFILE.bucket_room(450.0, PROFILE.travel(0, 450.0, 10.0))
+    for depart in (450.0 - lo, 450.0 + hi):
+        assert PROFILE.travel(0, depart, 10.0) == pytest.approx(16.0)
+
+
+def test_zones_are_the_nearest_centre():
+    assert ZONED.zones_for([(12.91, 77.5), (13.0, 77.65), (13.2, 77.7)]).tolist() == [0, 1, 1]
+    assert PROFILE.zones_for([(12.9, 77.5), (13.0, 77.6)]).tolist() == [0, 0]
+    assert len(PROFILE) == 5
+    hourly = SpeedProfile.hourly([1.0] * 24)
+    assert len(hourly) == 24 and hourly.travel(0, 100.0, 10.0) == 10.0
@@ -0,0 +1,348 @@
+import asyncio
+import random
+
+import httpx
+import numpy as np
+import pytest
+
+from model.traffic_provider import CircuitBreaker, TomTomSource, TrafficProvider, load_source, tile_bbox, tile_of, tiles_for
+
+TILE = 0.05
+# two stops in the same tile, and a third in the next tile east
+ROUTE = [(12.975, 77.525), (12.976, 77.526), (12.977, 77.576)]
+
+
+class FakeTomTom:
+    """One incident per requested tile at its centre, plus one shared id."""
+
+    def __init__(self, fail=False, delay=0.0):
+        self.requests = []
+        self.fail = fail
+        self.delay = delay
+
+    async def __call__(self, request):
+        self.requests.append(request.url.params["bbox"])
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail:
+            return httpx.Response(503)
+        west, south, east, north = map(float, request.url.params["bbox"].split(","))
+        lat, lng = (south + north) / 2, (west + east) / 2
+        geometry = {"type": "LineString", "coordinates": [[lng, lat], [lng + 0.001, lat]]}
+        return httpx.Response(
+            200,
+            json={
+                "incidents": [
+                    {"id": f"{lat:.4f},{lng:.4f}", "geometry": geometry, "properties": {"magnitudeOfDelay": 4}},
+                    # spans tile borders: every tile returns it
+                    {"id": "bridge", "geometry": geometry, "properties": {"magnitudeOfDelay": 1}},
+                ]
+            },
+        )
+
+
+def provider(api, **kwargs):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(api))
+    return TrafficProvider(source=TomTomSource(api_key="test", client=client), tile_deg=TILE, **kwargs)
+
+
+def test_tiles():
+    assert tile_of(12.975, 77.525, TILE) == (259, 1550)
+    assert tiles_for(ROUTE, TILE) == {(259, 1550), (259, 1551)}
+    south, west, north, east = tile_bbox((259, 1550), TILE)
+    assert south <= 12.975 < north and west <= 77.525 < east
+
+
+def sampled_tiles(coords, tile_deg=TILE, samples=20_000):
+    """Tiles under a dense sampling of the route's legs."""
+    tiles = set()
+    for a, b in zip(coords, coords[1:]):
+        for t in np.linspace(0.0, 1.0, samples):
+            tiles.add(tile_of(a[0] + t * (b[0] - a[0]), a[1] + t * (b[1] - a[1]), tile_deg))
+    return tiles
+
+
+def test_tiles_cover_the_tiles_between_stops():
+    # two stops three tiles apart on the same latitude
+    coords = [(12.975, 77.525), (12.975, 77.675)]
+    assert tiles_for(coords, TILE) == {(259, 1550), (259, 1551), (259, 1552), (259, 1553)}
+
+
+def test_tiles_through_a_corner_keep_both_sides():
+    coords = [(0.025, 0.025), (0.075, 0.075)]
+    assert tiles_for(coords, TILE) == {(0, 0), (0, 1), (1, 0), (1, 1)}
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_tiles_match_dense_sampling(seed):
+    rng = random.Random(seed)
+    coords = [(12.8 + rng.random() * 0.4, 77.4 + rng.random() * 0.4) for _ in range(8)]
+    tiles = tiles_for(coords, TILE)
+    assert sampled_tiles(coords) <= tiles
+    # no tile the legs do not come near
+    assert len(tiles - sampled_tiles(coords)) <= 2 * len(coords)
+
+
+def test_disabled_without_a_key(monkeypatch):
+    monkeypatch.delenv("TOMTOM_API_KEY", raising=False)
+    api = FakeTomTom()
+    source = TomTomSource(client=httpx.AsyncClient(transport=httpx.MockTransport(api)))
+    disabled = TrafficProvider(source=source)
+    assert asyncio.run(disabled.incidents_along_route(ROUTE)) == []
+    assert api.requests == []
+
+
+def test_load_source(monkeypatch):
+    monkeypatch.delenv("OPTIMILE_TRAFFIC_SOURCE", raising=False)
+    assert isinstance(load_source(), TomTomSource)
+    monkeypatch.setenv("OPTIMILE_TRAFFIC_SOURCE", "model.traffic_sim:simulated_from_env")
+    assert type(load_source()).__name__ == "SimulatedSource"
+    with pytest.raises(ValueError):
+        load_source("model.traffic_sim")
+
+
+def test_tiles_are_fetched_once_and_deduplicated():
+    api = FakeTomTom()
+    traffic = provider(api)
+
+    async def scenario():
+        first = await traffic.incidents_along_route(ROUTE)
+        again = await traffic.incidents_along_route(ROUTE)
+        return first, again
+
+    first, again = asyncio.run(scenario())
+    # two tile incidents plus the shared one, once
+    assert len(first) == 3 and len(again) == 3
+    assert len(api.requests) == 2
+    assert traffic.stats()["misses"] == 2 and traffic.stats()["hits"] == 2
+
+
+def test_concurrent_routes_share_a_fetch():
+    api = FakeTomTom(delay=0.05)
+    traffic = provider(api)
+
+    async def scenario():
+        return await asyncio.gather(*(traffic.incidents_along_route(ROUTE) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert all(len(r) == 3 for r in results)
+    assert len(api.requests) == 2
+
+
+def test_expired_tiles_are_served_stale_while_refreshing():
+    api = FakeTomTom()
+    traffic = provider(api, ttl_s=0.0)
+
+    async def scenario():
+        await traffic.incidents_along_route(ROUTE)
+        stale = await traffic.incidents_along_route(ROUTE)
+        # the background refresh runs after the stale answer
+        assert len(api.requests) == 2
+        await asyncio.sleep(0.05)
+        return stale
+
+    assert len(asyncio.run(scenario())) == 3
+    assert len(api.requests) == 4
+    assert traffic.stats()["stale_hits"] == 2
+
+
+def test_errors_keep_the_cached_incidents():
+    api = FakeTomTom()
+    traffic = provider(api, ttl_s=0.0, max_stale_s=0.0)
+
+    async def scenario():
+        await traffic.incidents_along_route(ROUTE)
+        api.fail = True
+        return await traffic.incidents_along_route(ROUTE)
+
+    assert len(asyncio.run(scenario())) == 3
+    assert traffic.stats()["errors"] == 2
+
+    # nothing cached: no incidents, no exception
+    assert asyncio.run(provider(FakeTomTom(fail=True)).incidents_along_route(ROUTE)) == []
+
+
+def test_refresh_fetches_only_active_tiles_due_to_expire():
+    api = FakeTomTom()
+    traffic = provider(api, ttl_s=120.0, refresh_every_s=30.0)
+
+    async def scenario():
+        await traffic.incidents_along_route(ROUTE)
+        await traffic.refresh_active()
+        assert len(api.requests) == 2
+        traffic.ttl_s = 10.0
+        await traffic.refresh_active()
+
+    asyncio.run(scenario())
+    assert len(api.requests) == 4
+
+
+class FakeSource:
+    """One incident per tile at its centre; records the tiles fetched."""
+
+    enabled = True
+
+    def __init__(self):
+        self.fetched = []
+
+    def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def fetch(self, bbox):
+        self.fetched.append(bbox)
+        south, west, north, east = bbox
+        lat, lng = (south + north) / 2, (west + east) / 2
+        return {
+            "incidents": [
+                {
+                    "geometry": {"type": "Point", "coordinates": [lng, lat]},
+                    "properties": {"id": f"{lat:.4f},{lng:.4f}", "magnitudeOfDelay": 4},
+                }
+            ]
+        }
+
+
+def test_route_sees_an_incident_in_a_tile_it_only_crosses():
+    # the middle tile holds no stop; its centre lies on the leg
+    coords = [(12.975, 77.525), (12.975, 77.625)]
+    source = FakeSource()
+    provider = TrafficProvider(source=source, tile_deg=TILE)
+
+    incidents = asyncio.run(provider.incidents_along_route(coords))
+
+    middle = tile_bbox(tile_of(12.975, 77.575, TILE), TILE)
+    assert middle in source.fetched
+    # one incident per tile, all on the single leg
+    assert [inc["legs"][0][:2] for inc in incidents] == [[0, 1]] * 3
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_after_repeated_failures():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failures=3, reset_s=30.0, clock=clock)
+    for _ in range(2):
+        breaker.failure()
+    assert breaker.state == "closed" and breaker.allow()
+
+    # a success resets the count
+    breaker.success()
+    breaker.failure()
+    breaker.failure()
+    assert breaker.state == "closed"
+
+    breaker.failure()
+    assert breaker.state == "open" and breaker.opens == 1
+    assert not breaker.allow()
+    clock.now = 29.9
+    assert breaker.state == "open" and not breaker.allow()
+
+
+def test_half_open_breaker_lets_one_probe_through():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failures=1, reset_s=30.0, clock=clock)
+    breaker.failure()
+    clock.now = 30.0
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    # only one probe at a time
+    assert not breaker.allow()
+
+    # a failed probe opens it again for another reset_s
+    breaker.failure()
+    assert breaker.state == "open" and breaker.opens == 2
+    clock.now = 59.9
+    assert not breaker.allow()
+
+    clock.now = 60.0
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+class FailingSource(FakeSource):
+    def __init__(self):
+        super().__init__()
+        self.fail = True
+
+    async def fetch(self, bbox):
+        if self.fail:
+            self.fetched.append(bbox)
+            raise RuntimeError("503")
+        return await super().fetch(bbox)
+
+
+def test_open_breaker_serves_from_cache_without_fetching():
+    clock = FakeClock()
+    source = FailingSource()
+    provider = TrafficProvider(
+        source=source, tile_deg=TILE, breaker=CircuitBreaker(failures=1, reset_s=30.0, clock=clock)
+    )
+    coords = [(12.975, 77.525), (12.976, 77.526)]
+
+    async def scenario():
+        assert await provider.incidents_along_route(coords) == []
+        assert provider.breaker.state == "open"
+        fetched = len(source.fetched)
+        # short-circuited: no fetch while open
+        assert await provider.incidents_along_route(coords) == []
+        assert len(source.fetched) == fetched
+        assert provider.short_circuits >= 1
+
+        # the probe after reset_s succeeds and closes it
+        source.fail = False
+        clock.now = 30.0
+        incidents = await provider.incidents_along_route(coords)
+        assert provider.breaker.state == "closed"
+        assert len(incidents) == 1
+
+    asyncio.run(scenario())
+
+
+class SlowSource(FakeSource):
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+
+    async def fetch(self, bbox):
+        await asyncio.sleep(self.delay)
+        return await super().fetch(bbox)
+
+
+def test_a_bounded_wait_falls_back_and_the_fetch_still_fills_the_cache():
+    source = SlowSource(delay=0.1)
+    traffic = TrafficProvider(source=source, tile_deg=TILE)
+    coords = [(12.975, 77.525), (12.976, 77.526)]
+
+    async def scenario():
+        assert await traffic.incidents_along_route(coords, timeout=0.01) == []
+        assert traffic.stats()["fallbacks"] == 1
+        await asyncio.sleep(0.15)
+        return await traffic.incidents_along_route(coords, timeout=0.01)
+
+    assert len(asyncio.run(scenario())) == 1
+    assert len(source.fetched) == 1
+
+
+def test_fetch_timeouts_count_against_the_breaker():
+    source = SlowSource(delay=1.0)
+    traffic = TrafficProvider(
+        source=source, tile_deg=TILE, timeout_s=0.01, breaker=CircuitBreaker(failures=1, reset_s=30.0)
+    )
+    coords = [(12.975, 77.525), (12.976, 77.526)]
+
+    assert asyncio.run(traffic.incidents_along_route(coords)) == []
+    stats = traffic.stats()
+    assert stats["timeouts"] == 1 and stats["errors"] == 1
+    assert stats["breaker"] == "open" and stats["breaker_opens"] == 1
+    assert stats["latency_max_ms"] >= 10.0
@@ -0,0 +1,149 @@
+import asyncio
+
+import httpx
+import pytest
+
+from model.traffic_provider import TrafficProvider, tile_bbox, tile_of
+from model.traffic_sim import FaultProfile, RecordingSource, ReplaySource, SimulatedSource, replay_from_env
+
+# about 5.5 km x 5.4 km
+BBOX = (12.95, 77.55, 13.0, 77.6)
+OTHER = (13.0, 77.55, 13.05, 77.6)
+
+
+class Clock:
+    def __init__(self, t=0.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+def ids(payload):
+    return [inc["properties"]["id"] for inc in payload["incidents"]]
+
+
+def test_simulated_incidents_are_a_function_of_seed_bbox_and_time():
+    clock = Clock(1000.0)
+    sim = SimulatedSource(density=2.0, period_s=60.0, lifetime=3, seed=7, clock=clock)
+    first = sim.payload(BBOX)
+    assert first["incidents"]
+    assert SimulatedSource(density=2.0, period_s=60.0, lifetime=3, seed=7, clock=clock).payload(BBOX) == first
+    assert ids(SimulatedSource(density=2.0, period_s=60.0, lifetime=3, seed=8, clock=clock).payload(BBOX)) != ids(first)
+    assert ids(sim.payload(OTHER)) != ids(first)
+
+    for inc in first["incidents"]:
+        assert inc["geometry"]["type"] in ("Point", "LineString")
+        assert 1 <= inc["properties"]["magnitudeOfDelay"] <= 4
+
+    # one period later the oldest generation is gone and a new one is born
+    clock.t += 60.0
+    later = ids(sim.payload(BBOX))
+    assert later != ids(first) and set(later) & set(ids(first))
+
+    # period 0 freezes them
+    frozen = SimulatedSource(density=2.0, period_s=0.0, seed=7, clock=clock)
+    clock.t += 3600.0
+    assert frozen.payload(BBOX) == SimulatedSource(density=2.0, period_s=0.0, seed=7).payload(BBOX)
+
+
+def test_simulated_density():
+    counts = [
+        len(SimulatedSource(density=1.0, period_s=0.0, seed=seed).payload(BBOX)["incidents"])
+        for seed in range(20)
+    ]
+    # 5.5 km * 5.4 km at one incident per km2
+    assert 25 < sum(counts) / len(counts) < 35
+
+
+def test_record_and_replay(tmp_path):
+    recording = RecordingSource(SimulatedSource(density=2.0, period_s=60.0, seed=1, clock=Clock(0.0)))
+    sim = recording.source
+
+    async def record():
+        payloads = [await recording.fetch(BBOX)]
+        sim.clock.t = 600.0
+        payloads.append(await recording.fetch(BBOX))
+        return payloads
+
+    recorded = asyncio.run(record())
+    assert recorded[0] != recorded[1]
+    path = tmp_path / "traffic.json"
+    recording.save(str(path))
+
+    replay = ReplaySource(str(path))
+
+    async def play():
+        return [await replay.fetch(BBOX) for _ in range(3)] + [await replay.fetch(OTHER)]
+
+    # in recording order, starting over after the last
+    assert asyncio.run(play()) == recorded + [recorded[0], {"incidents": []}]
+
+
+def test_replay_through_the_provider(tmp_path):
+    stops = [(12.975, 77.575), (12.985, 77.585)]
+    recording = RecordingSource(SimulatedSource(density=20.0, period_s=0.0, seed=3))
+    asyncio.run(recording.fetch(tile_bbox(tile_of(*stops[0], 0.05), 0.05)))
+    path = tmp_path / "traffic.json"
+    recording.save(str(path))
+
+    replay = ReplaySource(str(path))
+    traffic = TrafficProvider(source=replay, tile_deg=0.05)
+    assert asyncio.run(traffic.incidents_along_route(stops))
+    assert list(replay._next.values()) == [0]
+
+
+def test_fault_profile():
+    with pytest.raises(ValueError):
+        FaultProfile(error_rate=1.5)
+    with pytest.raises(ValueError):
+        FaultProfile(error_rate=0.6, hang_rate=0.6)
+
+    failing = SimulatedSource(faults=FaultProfile(latency_s=0.0, error_rate=1.0))
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(failing.fetch(BBOX))
+
+    hanging = SimulatedSource(faults=FaultProfile(latency_s=0.0, hang_rate=1.0, hang_s=0.0))
+    with pytest.raises(httpx.TimeoutException):
+        asyncio.run(hanging.fetch(BBOX))
+
+
+def test_replay_needs_a_path(monkeypatch):
+    monkeypatch.delenv("OPTIMILE_REPLAY_PATH", raising=False)
+    with pytest.raises(ValueError):
+        replay_from_env()
+
+
+def test_sources_are_picked_by_name_from_the_env(monkeypatch, tmp_path):
+    stops = [(12.975, 77.575), (12.985, 77.585)]
+    path = tmp_path / "recorded.json"
+    monkeypatch.setenv("OPTIMILE_SIM_LATENCY_MS", "0")
+    monkeypatch.setenv("OPTIMILE_SIM_DENSITY", "20")
+    monkeypatch.setenv("OPTIMILE_SIM_PERIOD_S", "0")
+
+    async def run():
+        traffic = TrafficProvider(tile_deg=0.05)
+        traffic.start()
+        try:
+            return traffic.source, await traffic.incidents_along_route(stops)
+        finally:
+            await traffic.close()
+
+    # record the simulator, then replay the recording
+    monkeypatch.setenv("OPTIMILE_TRAFFIC_SOURCE", "record")
+    monkeypatch.setenv("OPTIMILE_RECORD_SOURCE", "simulated")
+    monkeypatch.setenv("OPTIMILE_RECORD_PATH", str(path))
+    recorder, live = asyncio.run(run())
+    assert isinstance(recorder, RecordingSource) and isinstance(recorder.source, SimulatedSource)
+    assert live and path.exists()
+
+    monkeypatch.setenv("OPTIMILE_TRAFFIC_SOURCE", "replay")
+    monkeypatch.setenv("OPTIMILE_REPLAY_PATH", str(path))
+    replay, replayed = asyncio.run(run())
+    assert isinstance(replay, ReplaySource)
+    assert replayed == live
+
+    monkeypatch.setenv("OPTIMILE_TRAFFIC_SOURCE", "record")
+    monkeypatch.delenv("OPTIMILE_RECORD_PATH")
+    with pytest.raises(ValueError):
+        TrafficProvider()
@@ -0,0 +1,46 @@
+import random
+
+import pytest
+
+from model.alns_optimizer import (
+    RouteState,
+    build_travel_matrix,
+    dist,
+    route_cost,
+    traffic_multiplier,
+    vehicle_speed,
+)
+
+COORDS = [(12.9 + 0.013 * i, 77.5 + 0.007 * ((i * 5) % 9)) for i in range(10)]
+
+
+@pytest.mark.parametrize("vehicle", ["van", "scooter", "motorcycle"])
+@pytest.mark.parametrize("traffic", ["Low", "Normal", "Heavy"])
+def test_matrix_matches_scalar_legs(vehicle, traffic):
+    matrix = build_travel_matrix(COORDS, {"vehicle": vehicle, "traffic": traffic})
+    assert len(matrix) == len(COORDS)
+    speed = vehicle_speed(vehicle)
+    multiplier = traffic_multiplier(traffic)
+    for a in range(len(COORDS)):
+        for b in range(len(COORDS)):
+            leg = dist(COORDS[a], COORDS[b])
+            # bit for bit, so scalar and matrix costs agree exactly
+            assert matrix.dist[a, b] == leg
+            assert matrix.time[a, b] == (leg / speed) * multiplier
+    assert matrix.dist_rows == matrix.dist.tolist()
+    assert matrix.time_rows == matrix.time.tolist()
+
+
+def test_shared_matrix_gives_the_same_costs():
+    context = {"vehicle": "van", "traffic": "Heavy"}
+    matrix = build_travel_matrix(COORDS, context)
+    n = len(COORDS)
+    fragile = [i % 4 == 1 for i in range(n)]
+    windows = [(None, None)] + [(480 + 10 * i, 520 + 10 * i) for i in range(1, n)]
+    rng = random.Random(0)
+    for _ in range(5):
+        route = [0] + rng.sample(range(1, n), n - 1)
+        cost = route_cost(route, COORDS, fragile, windows, 480, context)
+        assert route_cost(route, COORDS, fragile, windows, 480, context, matrix=matrix) == cost
+        state = RouteState(route, COORDS, fragile, windows, 480, context, matrix=matrix)
+        assert state.total == pytest.approx(cost)
@@ -1,14 +1,26 @@
 import random
 import math
-from functools import lru_cache
+from time import perf_counter
+
+import numpy as np
+
+from .construction import candidate_routes
+from .distance import ROAD_FACTOR, distance_matrix, matrix_cache, pairwise
+from .eta_model import default_eta_model, model_time_matrix
+from .incidents import IncidentPenalties, incident_penalties
+from .local_search import improve, neighbour_lists
+from .route import Route
+from .spatial import GridIndex
 
 # =====================================================
 # GEOMETRY
 # =====================================================
 
-@lru_cache(maxsize=100_000)
 def dist(a, b):
-    return math.hypot(a[0] - b[0], a[1] - b[1])
+    # Same arithmetic as build_travel_matrix so both agree bit for bit.
+    dx = a[0] - b[0]
+    dy = a[1] - b[1]
+    return math.sqrt(dx * dx + dy * dy)
 
 
 # =====================================================
@@ -24,6 +36,198 @@ def vehicle_speed(vehicle: str) -> float:
     }.get(vehicle, 0.7)
 
 
+def traffic_multiplier(traffic_level: str) -> float:
+    return {
+        "Low": 0.9,
+        "Normal": 1.0,
+        "Medium": 1.15,
+        "Heavy": 1.35,
+    }.get(traffic_level, 1.0)
+
+
+def leg_multiplier(context) -> float:
+    """
+    Multiplier baked into the time table. A time-of-day profile
+    (context["profile"], model.time_profile) replaces the global traffic
+    level: the table then holds free-flow minutes and the profile is
+    applied per leg at its departure time.
+    """
+    if context.get("profile") is not None:
+        return 1.0
+    return traffic_multiplier(context.get("traffic", "Normal"))
+
+
+def time_table(coords, leg_dist, context, anchors: int = 0, cache=None) -> np.ndarray:
+    """
+    Travel minutes of the legs of `leg_dist`: length / vehicle speed x
+    leg_multiplier, or the trained ETA model's prediction with
+    context["travel_time"] == "model" (see model.eta_model).
+    """
+    if context.get("travel_time") == "model":
+        return model_time_matrix(coords, context, anchors=anchors, cache=cache)
+    return (leg_dist / vehicle_speed(context.get("vehicle", "van"))) * leg_multiplier(context)
+
+
+# =====================================================
+# TRAVEL-TIME MATRIX
+# =====================================================
+
+class TravelMatrix:
+    """
+    Dense leg tables for one optimization call, indexed by stop id.
+
+      - dist[a, b]: leg length under the context's distance mode
+                    (see model.distance)
+      - time[a, b]: travel time in minutes (vehicle speed and
+                    traffic multiplier already applied, or the learned
+                    ETA model's); free-flow minutes when `profile` is set
+      - profile / zones: optional time-of-day SpeedProfile and the zone
+                    of every stop; a leg a -> b departing at t then takes
+                    profile.travel(zones[a], t, time[a, b])
+      - penalties: incident penalties folded per stop / per leg
+                    (model.incidents); none by default
+
+    The scalar cost loops read `dist_rows` / `time_rows` (plain nested
+    lists, built on first use) because list indexing is much cheaper than
+    NumPy scalar access; vectorized code uses the arrays directly.
+
+    `turns` memoizes the smoothness penalty per (pre, a, b) triple; move
+    evaluation revisits the same turns many thousands of times per call.
+    """
+
+    def __init__(self, dist, time, profile=None, zones=None, penalties=None):
+        self.dist = dist
+        self.time = time
+        self.profile = profile
+        self.zones = zones
+        if penalties is None:
+            penalties = IncidentPenalties(np.zeros(time.shape[0]))
+        self.penalties = penalties
+        self.turns = {}
+        self._dist_rows = None
+        self._time_rows = None
+        self._zone_list = None
+
+    def __len__(self):
+        return self.time.shape[0]
+
+    @property
+    def dist_rows(self):
+        if self._dist_rows is None:
+            self._dist_rows = self.dist.tolist()
+        return self._dist_rows
+
+    @property
+    def time_rows(self):
+        if self._time_rows is None:
+            self._time_rows = self.time.tolist()
+        return self._time_rows
+
+    @property
+    def zone_list(self):
+        if self._zone_list is None and self.zones is not None:
+            self._zone_list = self.zones.tolist()
+        return self._zone_list
+
+
+def profile_zones(coords, context):
+    """(profile, zone of each stop) of `context`, or (None, None)."""
+    profile = context.get("profile")
+    if profile is None:
+        return None, None
+    return profile, profile.zones_for(coords)
+
+
+def build_travel_matrix(coords, context, cached: bool = False, anchors: int = 0) -> TravelMatrix:
+    """
+    Build the (n x n) leg tables for `coords` under `context`.
+
+    context["distance"] picks the distance mode (default "euclidean"),
+    context["travel_time"] the time model (see `time_table`). With
+    `cached`, the distance table of coords[anchors:] comes from the
+    shared matrix cache; the first `anchors` points (a driver's live
+    position) are measured fresh every call.
+    """
+    cache = matrix_cache if cached else None
+    leg_dist = distance_matrix(
+        coords,
+        context.get("distance", "euclidean"),
+        context.get("road_factor", ROAD_FACTOR),
+        anchors=anchors,
+        cache=cache,
+    )
+
+    return TravelMatrix(
+        leg_dist,
+        time_table(coords, leg_dist, context, anchors=anchors, cache=cache),
+        *profile_zones(coords, context),
+        incident_penalties(coords, context),
+    )
+
+
+class _PairTable:
+    """Leg table computed on demand for fancy-indexed (src, dst) pairs."""
+
+    def __init__(self, pts, mode, road_factor, speed=None, multiplier=None):
+        self.pts = pts
+        self.mode = mode
+        self.road_factor = road_factor
+        self.speed = speed
+        self.multiplier = multiplier
+
+    def __getitem__(self, key):
+        src, dst = key
+        leg_dist = pairwise(self.pts[src], self.pts[dst], self.mode, self.road_factor)
+        if self.speed is None:
+            return leg_dist
+        return (leg_dist / self.speed) * self.multiplier
+
+
+class _ModelPairTable:
+    """Learned minutes (model.eta_model) for fancy-indexed (src, dst) pairs."""
+
+    def __init__(self, pts, context):
+        self.pts = pts
+        self.context = context
+
+    def __getitem__(self, key):
+        src, dst = key
+        km = pairwise(self.pts[src], self.pts[dst], "haversine")
+        return default_eta_model().leg_minutes(km, self.context)
+
+
+class LazyTravelMatrix:
+    """
+    Stand-in for TravelMatrix in `route_cost_batch` when n is too large
+    for dense n x n tables: `dist[src, dst]` / `time[src, dst]` compute
+    only the requested legs, with the same arithmetic as
+    build_travel_matrix. Scalar code (route_cost, RouteState) still needs
+    a real TravelMatrix.
+    """
+
+    def __init__(self, coords, context):
+        pts = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        mode = context.get("distance", "euclidean")
+        road_factor = context.get("road_factor", ROAD_FACTOR)
+        self.dist = _PairTable(pts, mode, road_factor)
+        if context.get("travel_time") == "model":
+            self.time = _ModelPairTable(pts, context)
+        else:
+            self.time = _PairTable(
+                pts,
+                mode,
+                road_factor,
+                vehicle_speed(context.get("vehicle", "van")),
+                leg_multiplier(context),
+            )
+        self.profile, self.zones = profile_zones(pts, context)
+        self.penalties = incident_penalties(pts, context, lazy=True)
+        self.n = len(pts)
+
+    def __len__(self):
+        return self.n
+
+
 def route_cost(
     route,
     coords,
@@ -31,6 +235,7 @@ def route_cost(
     time_windows,
     start_time_min,
     context,
+    matrix=None,
 ):
     """
     Real-time adaptive route cost function.
@@ -38,32 +243,29 @@ def route_cost(
     This function returns a *time-based* cost in minutes
     plus explicit penalties. The SAME route will have
     DIFFERENT cost depending on:
-      - traffic level (multipliers)
+      - traffic level (multipliers), or the time of day when the
+        context carries a speed profile
       - vehicle type (speed model)
       - time windows (wait / late penalties)
       - fragile deliveries (extra penalties)
       - route shape (zig-zag smoothness penalties)
       - incidents (traffic jams, accidents, closures)
+
+    Leg lengths and travel times are read from `matrix`; pass the
+    TravelMatrix of the current optimization call to avoid rebuilding it.
     """
 
     time = start_time_min
     cost = 0.0
 
-    vehicle = context.get("vehicle", "van")
-    speed = vehicle_speed(vehicle)
-
-    traffic_level = context.get("traffic", "Normal")
-    incident = context.get("incident")
-
-    # -------------------------------------------------
-    # Traffic multipliers (soft global effect)
-    # -------------------------------------------------
-    traffic_multiplier = {
-        "Low": 0.9,
-        "Normal": 1.0,
-        "Medium": 1.15,
-        "Heavy": 1.35,
-    }.get(traffic_level, 1.0)
+    if matrix is None:
+        matrix = build_travel_matrix(coords, context)
+    dist_rows = matrix.dist_rows
+    time_rows = matrix.time_rows
+    profile = matrix.profile
+    zones = matrix.zone_list
+    stop_pen = matrix.penalties.stop_list
+    leg_pen = matrix.penalties.leg_rows
 
     for i in range(len(route) - 1):
         a = coords[route[i]]
@@ -75,8 +277,11 @@ def route_cost(
         # NOTE: distance here is an intermediate quantity.
         # The *proof* of optimization quality is based on
         # ETA (minutes), not on geometric distance.
-        leg_dist = dist(a, b)
-        travel_time = (leg_dist / speed) * traffic_multiplier
+        leg_dist = dist_rows[route[i]][route[i + 1]]
+        travel_time = time_rows[route[i]][route[i + 1]]
+        if profile is not None:
+            # time-of-day speed at the departure time
+            travel_time = profile.travel(zones[route[i]], time, travel_time)
 
         time += travel_time
         cost += travel_time
@@ -84,19 +289,10 @@ def route_cost(
         # -------------------------------------------------
         # INCIDENT REACTION (REAL-TIME ADAPTATION)
         # -------------------------------------------------
-        if incident and route[i + 1] == incident["index"]:
-
-            if incident["kind"] == "traffic_jam":
-                # soft avoidance
-                cost += incident["severity"] * 35
-
-            elif incident["kind"] == "accident":
-                # strong avoidance
-                cost += incident["severity"] * 60
-
-            elif incident["kind"] == "road_closed":
-                # near-infinite penalty
-                cost += 200
+        # every incident near the stop or on the leg (model.incidents)
+        cost += stop_pen[route[i + 1]]
+        if leg_pen is not None:
+            cost += leg_pen[route[i]][route[i + 1]]
 
         # -------------------------------------------------
         # TIME WINDOW CONSTRAINT
@@ -140,66 +336,762 @@ def route_cost(
     return cost
 
 
+# =====================================================
+# BATCH (VECTORIZED) ROUTE COST
+# =====================================================
+
+def route_cost_batch(
+    routes,
+    coords,
+    fragile_flags,
+    time_windows,
+    start_time_min,
+    context,
+    matrix=None,
+):
+    """
+    Score many routes at once; vectorized twin of `route_cost`.
+
+    `routes` is a 2-D int array (one permutation per row, all of the same
+    length). Returns a float64 array with one cost per row, equal to
+    `route_cost` on each row up to float rounding. The clock comes from
+    `batch_clock`; everything else is a handful of NumPy calls with no Python
+    loop per candidate or per position.
+    """
+    routes = np.asarray(routes, dtype=np.intp)
+    if routes.ndim == 1:
+        routes = routes[None, :]
+
+    n_routes, length = routes.shape
+    if length < 2:
+        return np.zeros(n_routes)
+
+    if matrix is None:
+        matrix = build_travel_matrix(coords, context)
+
+    src = routes[:, :-1]
+    dst = routes[:, 1:]
+
+    travel = matrix.time[src, dst]
+    leg_dist = matrix.dist[src, dst]
+
+    # -------------------------------------------------
+    # Clock, waits and lateness
+    # -------------------------------------------------
+    win_start, win_end = window_arrays(time_windows)
+    ws = win_start[dst]
+    we = win_end[dst]
+
+    travel, arrival, time = batch_clock(travel, src, ws, start_time_min, matrix)
+
+    wait = np.maximum(ws - arrival, 0.0)
+    late = np.maximum(time - we, 0.0)
+
+    # -------------------------------------------------
+    # Incident and fragile penalties
+    # -------------------------------------------------
+    incident_pen = matrix.penalties.stop[dst]
+    if matrix.penalties.leg is not None:
+        incident_pen = incident_pen + matrix.penalties.leg[src, dst]
+    fragile = np.asarray(fragile_flags, dtype=bool)[dst]
+
+    cost = (
+        travel
+        + incident_pen
+        + wait * 0.2
+        + late * 6.0
+        + np.where(fragile, 2.0 * travel, 0.0)
+    ).sum(axis=1)
+
+    # -------------------------------------------------
+    # Smoothness (legs 2.. only, as in route_cost)
+    # -------------------------------------------------
+    if length >= 4:
+        pts = np.asarray(coords, dtype=np.float64).reshape(-1, 2)[routes]
+        vec = np.diff(pts, axis=1)
+        v1 = vec[:, 1:-1]
+        v2 = vec[:, 2:]
+
+        dot = v1[..., 0] * v2[..., 0] + v1[..., 1] * v2[..., 1]
+        mag = np.hypot(v1[..., 0], v1[..., 1]) * np.hypot(v2[..., 0], v2[..., 1])
+
+        ratio = np.divide(dot, mag, out=np.zeros_like(dot), where=mag > 0)
+        angle = np.degrees(np.arccos(np.clip(ratio, -1.0, 1.0)))
+        sharp = (mag > 0) & (angle < 45)
+
+        cost += np.where(sharp, 0.3 * leg_dist[:, 2:], 0.0).sum(axis=1)
+
+    return cost
+
+
+def batch_clock(travel, src, ws, start_time_min, matrix):
+    """
+    (travel, arrival, clock after any wait) per leg of a batch, from the
+    table travel times `travel` of legs leaving stops `src` for stops
+    with window starts `ws` (all (routes x legs)).
+
+    With static times the clock with window waits,
+    t_j = max(t_{j-1} + d_j, win_start_j), is solved in closed form from
+    the cumulative travel time S_j:
+        t_j = S_j + max(start, max_{k <= j}(win_start_k - S_k))
+    Under a time-of-day profile a leg's duration depends on its departure,
+    so the clock walks the legs, still vectorized across the routes.
+    """
+    profile = getattr(matrix, "profile", None)
+    if profile is None:
+        elapsed = np.cumsum(travel, axis=1)
+        offset = np.maximum(
+            float(start_time_min),
+            np.maximum.accumulate(ws - elapsed, axis=1),
+        )
+        time = elapsed + offset
+
+        prev_offset = np.empty_like(offset)
+        prev_offset[:, 0] = start_time_min
+        prev_offset[:, 1:] = offset[:, :-1]
+        arrival = elapsed + prev_offset
+        return travel, arrival, time
+
+    zones = np.asarray(matrix.zones)[src]
+    actual = np.empty_like(travel)
+    arrival = np.empty_like(travel)
+    time = np.empty_like(travel)
+
+    clock = np.full(len(travel), float(start_time_min))
+    for j in range(travel.shape[1]):
+        leg = profile.travel_array(zones[:, j], clock, travel[:, j])
+        actual[:, j] = leg
+        arrival[:, j] = clock + leg
+        clock = np.maximum(arrival[:, j], ws[:, j])
+        time[:, j] = clock
+    return actual, arrival, time
+
+
+def window_arrays(time_windows):
+    """
+    Window bounds as float arrays; open sides become -inf / +inf.
+    An already converted (win_start, win_end) pair is passed through, so
+    callers scoring many batches can convert once.
+    """
+    if (
+        isinstance(time_windows, tuple)
+        and len(time_windows) == 2
+        and isinstance(time_windows[0], np.ndarray)
+    ):
+        return time_windows
+
+    win_start = np.array(
+        [-np.inf if w[0] is None else w[0] for w in time_windows],
+        dtype=np.float64,
+    )
+    win_end = np.array(
+        [np.inf if w[1] is None else w[1] for w in time_windows],
+        dtype=np.float64,
+    )
+    return win_start, win_end
+
+
+def insertion_neighbourhood(route, stop):
+    """Every route with `stop` inserted at positions 1..len(route)."""
+    route = np.asarray(route, dtype=np.intp)
+    n = len(route)
+
+    out = np.empty((n, n + 1), dtype=np.intp)
+    for pos in range(1, n + 1):
+        out[pos - 1, :pos] = route[:pos]
+        out[pos - 1, pos] = stop
+        out[pos - 1, pos + 1:] = route[pos:]
+    return out
+
+
+def two_opt_neighbourhood(route):
+    """
+    Every 2-opt move of `route` that keeps position 0 fixed.
+
+    Returns (moves, routes) where moves[m] = (i, j) means the segment
+    route[i..j] is reversed in routes[m].
+    """
+    route = np.asarray(route, dtype=np.intp)
+    n = len(route)
+
+    moves = np.array(
+        [(i, j) for i in range(1, n - 1) for j in range(i + 1, n)],
+        dtype=np.intp,
+    ).reshape(-1, 2)
+
+    out = np.tile(route, (len(moves), 1))
+    for m, (i, j) in enumerate(moves):
+        out[m, i:j + 1] = route[i:j + 1][::-1]
+    return moves, out
+
+
+# =====================================================
+# INCREMENTAL ROUTE STATE
+# =====================================================
+
+def _refresh_min_table(table, tail, start):
+    """
+    Sparse table: table[l][i] = min(values[i : i + 2**l]), updated in
+    place after values[start:] became `tail` (the length may change);
+    entries over values[:start] only are kept.
+    """
+    table[0][start:] = tail
+    n = len(table[0])
+    level, span = 1, 1
+    while 2 * span <= n:
+        prev = table[level - 1]
+        lo = max(0, start - 2 * span + 1)
+        if level == len(table):
+            table.append([])
+        table[level][lo:] = [min(prev[i], prev[i + span]) for i in range(lo, len(prev) - span)]
+        level += 1
+        span *= 2
+    del table[level:]
+
+
+def _smoothness_penalty(p0, p1, p2, leg_dist) -> float:
+    v1 = (p1[0] - p0[0], p1[1] - p0[1])
+    v2 = (p2[0] - p1[0], p2[1] - p1[1])
+
+    dot = v1[0] * v2[0] + v1[1] * v2[1]
+    mag = math.hypot(*v1) * math.hypot(*v2)
+
+    if mag > 0:
+        angle = math.degrees(math.acos(max(-1, min(1, dot / mag))))
+        if angle < 45:
+            return 0.3 * leg_dist
+    return 0.0
+
+
+class RouteState:
+    """
+    Cached evaluation of a single route under `route_cost`.
+
+    For every position p the state keeps:
+      - times[p]:  clock after serving route[p] (after any wait)
+      - cum[p]:    cost accumulated up to and including route[p]
+      - legs[p]:   travel time of the leg into route[p]
+      - fixed[p]:  cost of that leg other than windows
+                   (travel + incident + fragile + smoothness)
+      - wait_slack[p] / late_slack[p]: how far the schedule after p
+        can shift earlier / later without changing any window penalty
+
+    `splice_cost` (and the `insertion_cost` / `removal_cost` shortcuts)
+    splice a change into the cached prefix and only walk the suffix until
+    the schedule re-joins the cached one (or provably cannot change a
+    penalty any more). They return the cost `route_cost` would give for
+    the modified route, up to float rounding, without building it.
+    `splice`, `insert` and `remove` apply a move and refresh the caches
+    from the edited position onward only.
+
+    Under a time-of-day profile (see model.time_profile) a leg's travel
+    time depends on when it departs. The state then also keeps
+    depart_lo[p] .. depart_hi[p], the departures for which the leg into
+    route[p] stays inside its speed bucket and keeps its cached duration;
+    cached legs are reused only inside that range, and the slacks stop
+    at the first leg that would leave it, so an early exit still proves
+    every later leg unchanged.
+
+    The route is held as a `Route` (model.route). A `Route` passed in is
+    used as is and edited in place; any other sequence is copied into a
+    new one.
+    """
+
+    def __init__(
+        self,
+        route,
+        coords,
+        fragile_flags,
+        time_windows,
+        start_time_min,
+        context,
+        matrix=None,
+    ):
+        if matrix is None:
+            matrix = build_travel_matrix(coords, context)
+
+        self.coords = coords
+        self.fragile_flags = fragile_flags
+        self.time_windows = time_windows
+        self.start_time_min = start_time_min
+        self.dist_rows = matrix.dist_rows
+        self.time_rows = matrix.time_rows
+        self.turns = matrix.turns
+        self.profile = matrix.profile
+        self.zones = matrix.zone_list
+        self.stop_pen = matrix.penalties.stop_list
+        self.leg_pen = matrix.penalties.leg_rows
+
+        if not isinstance(route, Route):
+            route = Route(route, len(coords))
+        self.route = route
+        self.pos = route.pos
+
+        n = len(route)
+        self.times = [float(start_time_min)] * n
+        self.cum = [0.0] * n
+        self.legs = [0.0] * n
+        self.fixed = [0.0] * n
+        self.wait_slack = [math.inf] * n
+        self.late_slack = [math.inf] * n
+        self.depart_lo = [-math.inf] * n
+        self.depart_hi = [math.inf] * n
+        self._wait_room = [math.inf] * n
+        self._late_room = [math.inf] * n
+        # position 0 never waits or runs late
+        self._early_min = [[math.inf] * n]
+        self._late_min = [[math.inf] * n]
+        self._rebuild()
+
+    # -------------------------------------------------
+    # Per-leg building blocks (mirror route_cost)
+    # -------------------------------------------------
+
+    def _leg(self, pre, a, b, leg_index, depart=0.0):
+        travel = self.time_rows[a][b]
+        if self.profile is not None:
+            travel = self.profile.travel(self.zones[a], depart, travel)
+
+        fixed = travel + self.stop_pen[b]
+        if self.leg_pen is not None:
+            fixed += self.leg_pen[a][b]
+        if self.fragile_flags[b]:
+            fixed += 2.0 * travel
+        if leg_index >= 2:
+            turn = self.turns.get((pre, a, b))
+            if turn is None:
+                coords = self.coords
+                turn = _smoothness_penalty(
+                    coords[pre], coords[a], coords[b], self.dist_rows[a][b]
+                )
+                self.turns[(pre, a, b)] = turn
+            fixed += turn
+
+        return travel, fixed
+
+    def _arrive(self, stop, time):
+        win_start, win_end = self.time_windows[stop]
+        penalty = 0.0
+
+        if win_start is not None and time < win_start:
+            penalty += (win_start - time) * 0.2
+            time = win_start
+
+        if win_end is not None and time > win_end:
+            penalty += (time - win_end) * 6.0
+
+        return time, penalty
+
+    def _rebuild(self, start=1):
+        """
+        Refresh the caches for positions `start` onward; the ones before
+        it are still valid (a move leaves route[:start] and its schedule
+        untouched). The per-position lists must already have the route's
+        length. The slacks are walked back only until they stop changing.
+        """
+        route = self.route
+        n = len(route)
+        wait_room = self._wait_room
+        late_room = self._late_room
+
+        for p in range(start, n):
+            pre = route[p - 2] if p >= 2 else None
+            travel, fixed = self._leg(pre, route[p - 1], route[p], p - 1, self.times[p - 1])
+            arrival = self.times[p - 1] + travel
+            time, penalty = self._arrive(route[p], arrival)
+
+            self.legs[p] = travel
+            self.fixed[p] = fixed
+            self.times[p] = time
+            self.cum[p] = self.cum[p - 1] + fixed + penalty
+
+            # Room this position leaves before a shift changes its penalty;
+            # positions already waiting or late have no room at all.
+            wait_room[p] = late_room[p] = math.inf
+            win_start, win_end = self.time_windows[route[p]]
+            if win_start is not None:
+                room = arrival - win_start
+                wait_room[p] = room if room >= 0 else -math.inf
+            if win_end is not None:
+                room = win_end - time
+                late_room[p] = room if room >= 0 else -math.inf
+            if self.profile is not None:
+                early, late = self.profile.bucket_room(self.times[p - 1], travel)
+                self.depart_lo[p] = self.times[p - 1] - early
+                self.depart_hi[p] = self.times[p - 1] + late
+                wait_room[p] = min(wait_room[p], early)
+                late_room[p] = min(late_room[p], late)
+
+        if n:
+            self.wait_slack[n - 1] = self.late_slack[n - 1] = math.inf
+        for p in range(n - 2, -1, -1):
+            wait = min(self.wait_slack[p + 1], wait_room[p + 1])
+            late = min(self.late_slack[p + 1], late_room[p + 1])
+            if p < start - 1 and wait == self.wait_slack[p] and late == self.late_slack[p]:
+                # rooms before `start` are unchanged: so is every earlier slack
+                break
+            self.wait_slack[p] = wait
+            self.late_slack[p] = late
+
+        if self.profile is not None:
+            # a waiting (late) position reacts to any later (earlier) clock
+            tail = range(start, n)
+            _refresh_min_table(
+                self._early_min,
+                [wait_room[p] if late_room[p] >= 0 else -math.inf for p in tail],
+                start,
+            )
+            _refresh_min_table(
+                self._late_min,
+                [late_room[p] if wait_room[p] >= 0 else -math.inf for p in tail],
+                start,
+            )
+
+        self.total = self.cum[-1] if n else 0.0
+
+    def _resize(self, p, q, size):
+        """Replace the cached entries of positions p..q-1 by `size` blank ones."""
+        for cache, blank in (
+            (self.times, 0.0),
+            (self.cum, 0.0),
+            (self.legs, 0.0),
+            (self.fixed, 0.0),
+            (self.wait_slack, math.inf),
+            (self.late_slack, math.inf),
+            (self.depart_lo, -math.inf),
+            (self.depart_hi, math.inf),
+            (self._wait_room, math.inf),
+            (self._late_room, math.inf),
+        ):
+            cache[p:q] = [blank] * size
+
+    def _first_change(self, k, shift):
+        """
+        First position after k whose leg or window reacts to the clock at
+        k moving by `shift` (len(route) if none): binary lifting over the
+        range-min tables of the per-position rooms.
+        """
+        if shift < 0:
+            table, need = self._early_min, -shift
+        else:
+            table, need = self._late_min, shift
+
+        pos = k + 1
+        for level in range(len(table) - 1, -1, -1):
+            row = table[level]
+            if pos < len(row) and row[pos] >= need:
+                pos += 1 << level
+        return pos
+
+    # -------------------------------------------------
+    # Move evaluation
+    # -------------------------------------------------
+
+    def splice_cost(self, p, head, q):
+        """Cost of route[:p] + head + route[q:] for 1 <= p <= q."""
+        route = self.route
+        n = len(route)
+        static = self.profile is None
+        depart_lo, depart_hi = self.depart_lo, self.depart_hi
+
+        time = self.times[p - 1]
+        cost = self.cum[p - 1]
+        pre = route[p - 2] if p >= 2 else None
+        a = route[p - 1]
+        j = p  # position of the next stop in the modified route
+
+        for b in head:
+            k = self.pos[b]
+            if (
+                k >= 1
+                and route[k - 1] == a
+                and (k < 2 or route[k - 2] == pre)
+                and (j - 1 >= 2) == (k - 1 >= 2)
+                and (static or depart_lo[k] <= time <= depart_hi[k])
+            ):
+                # Head stop keeps its original predecessors (e.g. the body
+                # of a moved segment): reuse the cached leg.
+                travel, fixed = self.legs[k], self.fixed[k]
+            else:
+                travel, fixed = self._leg(pre, a, b, j - 1, time)
+            time, penalty = self._arrive(b, time + travel)
+            cost += fixed + penalty
+            pre, a = a, b
+            j += 1
+
+        k = q
+        while k < n:
+            b = route[k]
+
+            if k >= q + 2 and (j - 1 >= 2) == (k - 1 >= 2):
+                # Same predecessors as before: only the clock can differ.
+                if static or depart_lo[k] <= time <= depart_hi[k]:
+                    travel, fixed = self.legs[k], self.fixed[k]
+                else:
+                    travel, fixed = self._leg(pre, a, b, j - 1, time)
+                time, penalty = self._arrive(b, time + travel)
+                cost += fixed + penalty
+
+                shift = time - self.times[k]
+                if static:
+                    if shift == 0.0 or -self.wait_slack[k] <= shift <= self.late_slack[k]:
+                        return cost + (self.total - self.cum[k])
+                elif shift == 0.0:
+                    return cost + (self.total - self.cum[k])
+                else:
+                    # Skip the run of stops the shift leaves unchanged
+                    # (same bucket, no window reacts): their cached cost
+                    # carries over and the clock stays `shift` off.
+                    f = self._first_change(k, shift)
+                    if f >= n:
+                        return cost + (self.total - self.cum[k])
+                    if f > k + 1:
+                        cost += self.cum[f - 1] - self.cum[k]
+                        j += f - 1 - k
+                        k = f - 1
+                        time = self.times[k] + shift
+                        a, b = route[k - 1], route[k]
+            else:
+                travel, fixed = self._leg(pre, a, b, j - 1, time)
+                time, penalty = self._arrive(b, time + travel)
+                cost += fixed + penalty
+
+            pre, a = a, b
+            j += 1
+            k += 1
+
+        return cost
+
+    def insertion_cost(self, pos, stop):
+        """Route cost after inserting `stop` before position `pos` (>= 1)."""
+        return self.splice_cost(pos, (stop,), pos)
+
+    def removal_cost(self, pos):
+        """Route cost after removing the stop at position `pos` (>= 1)."""
+        return self.splice_cost(pos, (), pos + 1)
+
+    def insertion_costs(self, stop, positions=None):
+        if positions is None:
+            positions = range(1, len(self.route) + 1)
+        return [self.insertion_cost(i, stop) for i in positions]
+
+    def best_insertion(self, stop):
+        best_pos = 1
+        best_cost = float("inf")
+
+        for i in range(1, len(self.route) + 1):
+            c = self.insertion_cost(i, stop)
+            if c < best_cost:
+                best_cost = c
+                best_pos = i
+
+        return best_pos, best_cost
+
+    def removal_savings(self):
+        """
+        Approximate cost saved by removing each stop, from one pass.
+
+        savings[i] is the cached cost of the legs into and out of route[i]
+        (window penalties included) minus the time-independent cost of
+        the bypass leg route[i-1] -> route[i+1]; knock-on schedule shifts
+        and turn angles are ignored. Position 0 is fixed and gets -inf.
+        """
+        route = self.route
+        n = len(route)
+        cum = self.cum
+        savings = [-math.inf] * n
+
+        for i in range(1, n):
+            if i + 1 < n:
+                _, bypass = self._leg(None, route[i - 1], route[i + 1], 0, self.times[i - 1])
+                savings[i] = cum[i + 1] - cum[i - 1] - bypass
+            else:
+                savings[i] = cum[i] - cum[i - 1]
+
+        return savings
+
+    def splice(self, p, head, q):
+        self.route.splice(p, head, q)
+        self._resize(p, q, len(head))
+        self._rebuild(p)
+
+    def insert(self, pos, stop):
+        self.route.insert(pos, stop)
+        self._resize(pos, pos, 1)
+        self._rebuild(pos)
+
+    def remove(self, pos):
+        stop = self.route.pop(pos)
+        self._resize(pos, pos + 1, 0)
+        self._rebuild(pos)
+        return stop
+
+
 # =====================================================
 # DESTROY OPERATORS
 # =====================================================
 
+def removal_size(n, rng, min_frac=0.1, max_frac=0.3, cap=12):
+    """
+    How many stops one destroy step removes, scaled to the route size:
+    uniform in [max(2, 10%), min(cap, 30%)] of the movable stops.
+    """
+    movable = n - 1
+    if movable <= 0:
+        return 0
+
+    lo = max(min(2, movable), int(movable * min_frac))
+    hi = max(lo, min(cap, int(movable * max_frac)))
+    return rng.randint(lo, hi)
+
+
+# Destroy operators take a `Route` and remove stops from it in place
+# (one compaction pass); they return (route, removed) with the same route.
+
 def destroy_random(route, k, rng):
     idx = rng.sample(range(1, len(route)), min(k, len(route) - 1))
     removed = [route[i] for i in idx]
-    remaining = [r for r in route if r not in removed]
-    return remaining, removed
+    route.remove_many(removed)
+    return route, removed
 
 
 def destroy_fragile(route, fragile_flags, k, rng):
-    fragile = [i for i in route if fragile_flags[i]]
+    # position 0 is the fixed start, as in the other destroy operators
+    fragile = [i for i in route[1:] if fragile_flags[i]]
     if not fragile:
         return destroy_random(route, k, rng)
 
     removed = rng.sample(fragile, min(k, len(fragile)))
-    remaining = [r for r in route if r not in removed]
-    return remaining, removed
+    route.remove_many(removed)
+    return route, removed
+
+
+def destroy_worst(state, k, rng, p=3.0):
+    """
+    Worst removal (Ropke & Pisinger): rank stops by removal savings and
+    draw k of them, picking rank floor(y**p * len) with y ~ U(0, 1).
+    Higher p is more greedy; p = 1 is uniform.
+    """
+    savings = state.removal_savings()
+    ranked = sorted(range(1, len(state.route)), key=lambda i: -savings[i])
+
+    picked = []
+    for _ in range(min(k, len(ranked))):
+        picked.append(ranked.pop(int(rng.random() ** p * len(ranked))))
 
+    removed = [state.route[i] for i in picked]
+    state.route.remove_many(removed)
+    return state.route, removed
 
-def destroy_worst(route, cost_fn, rng):
-    worst = max(
-        route[1:],
-        key=lambda i: cost_fn(route[: route.index(i) + 1]),
+
+def relatedness_matrix(time_matrix, time_windows, time_weight=1.0, window_weight=1.0):
+    """
+    Shaw relatedness between stops (lower = more related): normalized
+    travel time (both directions) plus normalized window-start distance.
+    Open window starts count as the earliest start in the instance.
+    """
+    t = np.minimum(time_matrix, time_matrix.T)
+    t_max = float(t.max()) if t.size else 0.0
+
+    starts = np.array(
+        [np.nan if w[0] is None else float(w[0]) for w in time_windows],
+        dtype=np.float64,
     )
-    remaining = route[:]
-    remaining.remove(worst)
-    return remaining, [worst]
+    if np.all(np.isnan(starts)):
+        starts = np.zeros_like(starts)
+    else:
+        starts = np.where(np.isnan(starts), np.nanmin(starts), starts)
+    span = float(starts.max() - starts.min())
+
+    related = time_weight * (t / t_max if t_max > 0 else t)
+    if span > 0:
+        related = related + window_weight * np.abs(starts[:, None] - starts[None, :]) / span
+    return related
+
+
+def destroy_shaw(route, relatedness, k, rng, p=6.0):
+    """
+    Related removal (Shaw): start from a random stop, then repeatedly
+    remove a stop related to one already removed, drawing from the
+    relatedness ranking with rank floor(y**p * len).
+    """
+    pending = route[1:].tolist()
+    if not pending or k <= 0:
+        return route, []
+
+    removed = [pending.pop(rng.randrange(len(pending)))]
+
+    while len(removed) < k and pending:
+        ref = relatedness[rng.choice(removed)]
+        pending.sort(key=lambda s: ref[s])
+        removed.append(pending.pop(int(rng.random() ** p * len(pending))))
+
+    route.remove_many(removed)
+    return route, removed
+
+
+def destroy_radius(route, index, coords, k, rng):
+    """
+    Spatial removal: every stop within a random radius of a random stop
+    (at most k). The radius is a random fraction of the distance to the
+    seed's k-th nearest stop, so the cluster size tracks local density.
+    """
+    if len(route) <= 1 or k <= 0:
+        return route, []
+
+    seed = route[rng.randrange(1, len(route))]
+    nearest = index.nearest(coords[seed], k + 1)
+    reach = math.dist(coords[seed], coords[nearest[-1]])
+    radius = reach * rng.uniform(0.5, 1.0)
+
+    start = route[0]
+    removed = [s for s in index.within(coords[seed], radius) if s != start][:k]
+    if seed not in removed:
+        removed = [seed] + removed[: k - 1]
+
+    route.remove_many(removed)
+    return route, removed
 
 
 # =====================================================
 # REPAIR OPERATORS
 # =====================================================
 
-def repair_greedy(route, removed, cost_fn):
+def repair_greedy(state, removed):
     for r in removed:
-        best_pos = 1
-        best_cost = float("inf")
+        best_pos, _ = state.best_insertion(r)
+        state.insert(best_pos, r)
 
-        for i in range(1, len(route) + 1):
-            candidate = route[:i] + [r] + route[i:]
-            c = cost_fn(candidate)
-            if c < best_cost:
-                best_cost = c
-                best_pos = i
+    return state.route
 
-        route.insert(best_pos, r)
 
-    return route
+def _granular_positions(route, stop, neighbours):
+    """Insertion positions right before / after the stop's nearest neighbours."""
+    pos = route.pos
+    cands = set()
+    for c in neighbours[stop]:
+        j = pos[c]
+        if j >= 0:
+            cands.add(j + 1)
+            if j >= 1:
+                cands.add(j)
+    return sorted(cands) or None
 
 
-def repair_regret(route, removed, cost_fn):
+def repair_regret(state, removed, neighbours=None):
+    """
+    Regret-2 insertion. With `neighbours`, regrets are ranked on the
+    positions next to each stop's nearest neighbours only (granular);
+    the chosen stop is still placed by a full greedy scan.
+    """
     while removed:
         regrets = []
 
         for r in removed:
-            costs = []
-            for i in range(1, len(route) + 1):
-                costs.append(cost_fn(route[:i] + [r] + route[i:]))
+            positions = None
+            if neighbours is not None:
+                positions = _granular_positions(state.route, r, neighbours)
+            costs = state.insertion_costs(r, positions)
 
             costs.sort()
             regret = costs[1] - costs[0] if len(costs) > 1 else costs[0]
@@ -207,9 +1099,9 @@ def repair_regret(route, removed, cost_fn):
 
         _, chosen = max(regrets)
         removed.remove(chosen)
-        route = repair_greedy(route, [chosen], cost_fn)
+        repair_greedy(state, [chosen])
 
-    return route
+    return state.route
 
 
 # =====================================================
@@ -254,6 +1146,38 @@ class AdaptiveSelector:
 # ADAPTIVE ALNS OPTIMIZER
 # =====================================================
 
+def route_lower_bound(coords, fragile_flags, context, matrix=None) -> float:
+    """
+    Cheap lower bound on `route_cost` over all orders starting at stop 0.
+
+    Every other stop is entered exactly once, so it costs at least its
+    cheapest incoming leg (tripled when fragile) plus its stop incident
+    penalty; leg incidents, waits, lateness and smoothness are >= 0.
+    """
+    n = len(coords)
+    if n < 2:
+        return 0.0
+
+    if matrix is None:
+        matrix = build_travel_matrix(coords, context)
+
+    incoming = matrix.time.copy()
+    np.fill_diagonal(incoming, np.inf)
+    cheapest_in = incoming.min(axis=0)
+    if matrix.profile is not None:
+        # no leg is driven faster than the profile's quietest bucket
+        cheapest_in = cheapest_in * matrix.profile.min_multiplier
+
+    stop_pen = matrix.penalties.stop_list
+    return float(
+        sum(
+            cheapest_in[j] * (3.0 if fragile_flags[j] else 1.0)
+            + stop_pen[j]
+            for j in range(1, n)
+        )
+    )
+
+
 def optimize_route(
     coords,
     fragile_flags,
@@ -263,13 +1187,52 @@ def optimize_route(
     iters=400,
     seed=None,
     explain: bool = False,
+    matrix=None,
+    time_limit_ms=None,
+    max_no_improve=None,
+    target_gap=None,
+    return_stats: bool = False,
+    initial_route=None,
+    temperature=0.15,
+    construction="auto",
+    local_search: bool = True,
+    neighbour_k: int = 8,
 ):
-    n = len(coords)
-    best = list(range(n))
+    """
+    Adaptive LNS with simulated-annealing acceptance.
+
+    The search stops at the first of:
+      - `iters` iterations
+      - `time_limit_ms` of wall-clock time
+      - `max_no_improve` consecutive iterations without a new best
+      - best cost within `target_gap` (relative) of `route_lower_bound`
+
+    The search starts from `initial_route` when given (it must begin with
+    stop 0). Otherwise it starts from the `construction` heuristic (see
+    model.construction): one picked by the windows for "auto", or the
+    cheapest of all of them for "best".
+    The stats report the heuristic used and its cost.
+
+    With `local_search`, every new best route (and the starting route) is
+    intensified by relocate / Or-opt / 2-opt moves restricted to the
+    `neighbour_k` nearest stops (see model.local_search). The annealing temperature
+    starts at `temperature` times the starting cost; warm starts use a
+    low value to keep the search close to the incumbent.
+
+    Returns (best_route, best_cost), or (best_route, best_cost, stats)
+    with `return_stats=True`, where stats reports the iterations actually
+    run, the stop reason and the elapsed time.
+    """
+    started = perf_counter()
 
     # Deterministic RNG for statistical stability
     rng = random.Random(seed if seed is not None else 42)
 
+    # One travel-time matrix for the whole call; every cost evaluation,
+    # operator and the explanation index into it by stop id.
+    if matrix is None:
+        matrix = build_travel_matrix(coords, context)
+
     cost_fn = lambda r: route_cost(
         r,
         coords,
@@ -277,54 +1240,158 @@ def optimize_route(
         time_windows,
         start_time_min,
         context,
+        matrix=matrix,
+    )
+
+    new_state = lambda r: RouteState(
+        r,
+        coords,
+        fragile_flags,
+        time_windows,
+        start_time_min,
+        context,
+        matrix=matrix,
     )
 
-    best_cost = cost_fn(best)
-    T = best_cost * 0.15
+    if initial_route is not None:
+        current = Route(initial_route, len(coords))
+        construction_used = "initial_route"
+    else:
+        names, seeds = candidate_routes(matrix.time, time_windows, construction)
+        seed_costs = route_cost_batch(
+            seeds,
+            coords,
+            fragile_flags,
+            time_windows,
+            start_time_min,
+            context,
+            matrix=matrix,
+        )
+        k = int(np.argmin(seed_costs))
+        current = Route(seeds[k], len(coords))
+        construction_used = names[k]
+
+    deadline = None
+    if time_limit_ms is not None:
+        deadline = started + time_limit_ms / 1000.0
+
+    neighbours = neighbour_lists(matrix.time, neighbour_k)
+    ls_moves = 0
+
+    def intensify(route):
+        nonlocal ls_moves
+        state = new_state(route)
+        # Local search may use at most half of what is left of the budget,
+        # so a slow descent on a large route cannot starve the ALNS loop.
+        ls_deadline = deadline
+        if deadline is not None:
+            now = perf_counter()
+            ls_deadline = now + max(deadline - now, 0.0) / 2.0
+        ls_moves += improve(state, neighbours, ls_deadline)
+        return state.route, cost_fn(state.route)
+
+    current_cost = cost_fn(current)
+    construction_cost = current_cost
+    if local_search:
+        current, current_cost = intensify(current)
+
+    # Three route buffers for the whole search: the incumbent, the best and
+    # a scratch copy that destroy/repair edit in place. Accepting swaps the
+    # scratch and current references, so no route is allocated per iteration.
+    best, best_cost = current.copy(), current_cost
+    scratch = current.copy()
+    T = current_cost * temperature
+
+    lower_bound = None
+    if target_gap is not None:
+        lower_bound = route_lower_bound(coords, fragile_flags, context, matrix)
+
+    relatedness = relatedness_matrix(matrix.time, time_windows)
+    index = GridIndex(coords)
+    k_fn = lambda r: removal_size(len(r), rng)
 
     destroy_ops = {
-        "random": lambda r: destroy_random(r, 2, rng),
-        "fragile": lambda r: destroy_fragile(r, fragile_flags, 2, rng),
-        "worst": lambda r: destroy_worst(r, cost_fn, rng),
+        "random": lambda r: destroy_random(r, k_fn(r), rng),
+        "fragile": lambda r: destroy_fragile(r, fragile_flags, k_fn(r), rng),
+        "worst": lambda r: destroy_worst(new_state(r), k_fn(r), rng),
+        "shaw": lambda r: destroy_shaw(r, relatedness, k_fn(r), rng),
+        "radius": lambda r: destroy_radius(r, index, coords, k_fn(r), rng),
     }
 
     repair_ops = {
         "greedy": repair_greedy,
-        "regret": repair_regret,
+        "regret": lambda state, removed: repair_regret(state, removed, neighbours),
     }
 
     destroy_selector = AdaptiveSelector(destroy_ops, rng)
     repair_selector = AdaptiveSelector(repair_ops, rng)
 
     last_improving = None  # (destroy_name, repair_name, delta)
+    iterations = 0
+    no_improve = 0
+    stop_reason = "iterations"
+
+    while iterations < iters:
+        if lower_bound is not None and _gap(best_cost, lower_bound) <= target_gap:
+            stop_reason = "target_gap"
+            break
+        if max_no_improve is not None and no_improve >= max_no_improve:
+            stop_reason = "no_improve"
+            break
+        if deadline is not None and perf_counter() >= deadline:
+            stop_reason = "time_limit"
+            break
+
+        iterations += 1
+        no_improve += 1
 
-    for _ in range(iters):
         d_op = destroy_selector.select()
         r_op = repair_selector.select()
 
-        remaining, removed = destroy_ops[d_op](best)
-        candidate = repair_ops[r_op](remaining, removed, cost_fn)
+        scratch.assign(current)
+        remaining, removed = destroy_ops[d_op](scratch)
+        candidate = repair_ops[r_op](new_state(remaining), removed)
 
         candidate_cost = cost_fn(candidate)
-        delta = candidate_cost - best_cost
+        delta = candidate_cost - current_cost
 
         if delta < 0 or rng.random() < math.exp(-delta / max(T, 1e-6)):
             destroy_selector.reward(d_op, delta)
             repair_selector.reward(r_op, delta)
-            best = candidate
-            best_cost = candidate_cost
+            current, scratch = candidate, current
+            current_cost = candidate_cost
             if delta < 0:
                 last_improving = (d_op, r_op, delta)
 
+            if current_cost < best_cost:
+                if local_search:
+                    current, current_cost = intensify(current)
+                best.assign(current)
+                best_cost = current_cost
+                no_improve = 0
+
         destroy_selector.update()
         repair_selector.update()
         T *= 0.995
 
+    stats = {
+        "iterations": iterations,
+        "stop_reason": stop_reason,
+        "elapsed_ms": (perf_counter() - started) * 1000.0,
+        "construction": construction_used,
+        "construction_cost": construction_cost,
+        "local_search_moves": ls_moves,
+    }
+    if lower_bound is not None:
+        stats["lower_bound"] = lower_bound
+        stats["gap"] = _gap(best_cost, lower_bound)
+
     if explain:
         print(
-            "[ALNS] final best_cost={:.3f} iters={} last_improvement={}".format(
+            "[ALNS] final best_cost={:.3f} iters={} stop={} last_improvement={}".format(
                 best_cost,
-                iters,
+                iterations,
+                stop_reason,
                 last_improving,
             )
         )
@@ -336,13 +1403,23 @@ def optimize_route(
                 time_windows=time_windows,
                 start_time_min=start_time_min,
                 context=context,
+                matrix=matrix,
             )
         except Exception as exc:  # defensive: never break optimization on logging
             print(f"[ALNS] explain_route failed: {exc}")
 
+    best = best.tolist()
+    if return_stats:
+        return best, best_cost, stats
     return best, best_cost
 
 
+def _gap(cost, lower_bound) -> float:
+    if cost <= 0:
+        return 0.0
+    return max(0.0, (cost - lower_bound) / cost)
+
+
 def explain_route(
     route,
     coords,
@@ -350,6 +1427,7 @@ def explain_route(
     time_windows,
     start_time_min,
     context,
+    matrix=None,
 ):
     """
     Explain the cost composition of a given route.
@@ -364,16 +1442,16 @@ def explain_route(
 
     time = start_time_min
     vehicle = context.get("vehicle", "van")
-    speed = vehicle_speed(vehicle)
     traffic_level = context.get("traffic", "Normal")
-    incident = context.get("incident")
 
-    traffic_multiplier = {
-        "Low": 0.9,
-        "Normal": 1.0,
-        "Medium": 1.15,
-        "Heavy": 1.35,
-    }.get(traffic_level, 1.0)
+    if matrix is None:
+        matrix = build_travel_matrix(coords, context)
+    dist_rows = matrix.dist_rows
+    time_rows = matrix.time_rows
+    profile = matrix.profile
+    zones = matrix.zone_list
+    stop_pen = matrix.penalties.stop_list
+    leg_pen = matrix.penalties.leg_rows
 
     total_cost = 0.0
     print(
@@ -391,8 +1469,10 @@ def explain_route(
         a = coords[from_idx]
         b = coords[to_idx]
 
-        leg_dist = dist(a, b)
-        base_travel = (leg_dist / speed) * traffic_multiplier
+        leg_dist = dist_rows[from_idx][to_idx]
+        base_travel = time_rows[from_idx][to_idx]
+        if profile is not None:
+            base_travel = profile.travel(zones[from_idx], time, base_travel)
 
         wait_pen = 0.0
         late_pen = 0.0
@@ -403,17 +1483,11 @@ def explain_route(
         time += base_travel
         total_cost += base_travel
 
-        # Incident penalty (if any)
-        if incident and to_idx == incident.get("index"):
-            kind = incident.get("kind")
-            severity = float(incident.get("severity", 1.0))
-            if kind == "traffic_jam":
-                incident_pen += severity * 35
-            elif kind == "accident":
-                incident_pen += severity * 60
-            elif kind == "road_closed":
-                incident_pen += 200
-            total_cost += incident_pen
+        # Incident penalties (near the stop, on the leg)
+        incident_pen += stop_pen[to_idx]
+        if leg_pen is not None:
+            incident_pen += leg_pen[from_idx][to_idx]
+        total_cost += incident_pen
 
         # Time windows
         win_start, win_end = time_windows[to_idx]
@@ -8,13 +8,21 @@ defending the design:
   - traffic-level sensitivity
   - incident penalties
   - stochastic stability of ALNS
+  - incremental (RouteState) evaluation vs full route_cost
+  - vectorized route_cost_batch vs scalar route_cost
 """
 
 from typing import List, Tuple
 import random
 import statistics as stats
 
-from .alns_optimizer import optimize_route, route_cost
+from .alns_optimizer import (
+    RouteState,
+    optimize_route,
+    route_cost,
+    route_cost_batch,
+    two_opt_neighbourhood,
+)
 
 
 def _toy_instance() -> Tuple[List[Tuple[float, float]], List[bool], List[Tuple[int, int]]]:
@@ -114,6 +122,56 @@ def _random_instance(n_stops: int):
     return coords, fragile, windows
 
 
+def incremental_consistency_check(n_stops: int = 20, trials: int = 20) -> None:
+    """
+    Compare RouteState insertion / removal deltas against a full
+    route_cost on the modified route for every position.
+    """
+    worst_gap = 0.0
+
+    for s in range(trials):
+        random.seed(s)
+        coords, fragile, windows = _random_instance(n_stops=n_stops)
+        ctx = {
+            "vehicle": "van",
+            "traffic": "Heavy",
+            "incident": {"index": 1 + s % n_stops, "kind": "accident", "severity": 1.0},
+        }
+
+        route = list(range(len(coords)))
+        r = route.pop(random.randint(1, len(route) - 1))
+        state = RouteState(route, coords, fragile, windows, 8 * 60, ctx)
+
+        for i in range(1, len(route) + 1):
+            full = route_cost(route[:i] + [r] + route[i:], coords, fragile, windows, 8 * 60, ctx)
+            worst_gap = max(worst_gap, abs(state.insertion_cost(i, r) - full))
+
+        for i in range(1, len(route)):
+            full = route_cost(route[:i] + route[i + 1:], coords, fragile, windows, 8 * 60, ctx)
+            worst_gap = max(worst_gap, abs(state.removal_cost(i) - full))
+
+    print(f"[INCREMENTAL] stops={n_stops} trials={trials} max_abs_gap={worst_gap:.2e}")
+
+
+def batch_consistency_check(n_stops: int = 20, trials: int = 10) -> None:
+    """Score every 2-opt move with route_cost_batch and with route_cost."""
+    worst_gap = 0.0
+
+    for s in range(trials):
+        random.seed(s)
+        coords, fragile, windows = _random_instance(n_stops=n_stops)
+        ctx = {"vehicle": "scooter", "traffic": "Medium"}
+
+        _, routes = two_opt_neighbourhood(list(range(len(coords))))
+        batch = route_cost_batch(routes, coords, fragile, windows, 8 * 60, ctx)
+
+        for row, c in zip(routes, batch):
+            full = route_cost(list(row), coords, fragile, windows, 8 * 60, ctx)
+            worst_gap = max(worst_gap, abs(c - full))
+
+    print(f"[BATCH] stops={n_stops} trials={trials} max_abs_gap={worst_gap:.2e}")
+
+
 def robustness_benchmark() -> None:
     """
     Statistical robustness check across:
@@ -183,5 +241,8 @@ if __name__ == "__main__":
     incident_stress_test()
     print("\n=== Stability check ===")
     stability_check()
+    print("\n=== Incremental evaluation check ===")
+    incremental_consistency_check()
+    batch_consistency_check()
     robustness_benchmark()
 
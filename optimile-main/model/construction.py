@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+"""
+Construction heuristics that seed the ALNS search.
+
+Each heuristic builds a complete route starting at stop 0 from the
+travel-time matrix (and, for the window-aware one, the time windows)
+only, using vectorized NumPy steps so a 50-stop route takes well under a
+millisecond.
+
+"auto" (the default) builds one route: time-window insertion when any
+stop has a window, nearest neighbour otherwise. "best" builds all of
+them and the optimizer starts from the one the full cost function
+scores cheapest. That is a better start on some days, but it runs the
+O(n^2)-per-stop cheapest insertion and scores every candidate, which a
+short ALNS run usually makes up for anyway.
+"""
+
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+
+def identity_order(time_matrix: np.ndarray, time_windows) -> List[int]:
+    """The stops in the order they were given."""
+    return list(range(time_matrix.shape[0]))
+
+
+def nearest_neighbour(time_matrix: np.ndarray, time_windows=None) -> List[int]:
+    """Always drive to the closest (by travel time) unvisited stop."""
+    n = time_matrix.shape[0]
+    if n == 0:
+        return []
+
+    visited = np.zeros(n, dtype=bool)
+    visited[0] = True
+    route = [0]
+
+    for _ in range(n - 1):
+        row = np.where(visited, np.inf, time_matrix[route[-1]])
+        nxt = int(np.argmin(row))
+        visited[nxt] = True
+        route.append(nxt)
+
+    return route
+
+
+def _insertion_deltas(time_matrix: np.ndarray, route: List[int], stop: int) -> np.ndarray:
+    """Extra travel time of inserting `stop` before positions 1..len(route)."""
+    prev = np.asarray(route)
+    nxt = prev[1:]
+
+    deltas = time_matrix[prev, stop].copy()
+    deltas[:-1] += time_matrix[stop, nxt] - time_matrix[prev[:-1], nxt]
+    return deltas
+
+
+def time_window_insertion(time_matrix: np.ndarray, time_windows) -> List[int]:
+    """
+    Insert stops in order of window end (earliest deadline first).
+
+    Each stop goes to its cheapest position after every stop whose window
+    closes before this one opens, so hard window precedence is kept while
+    overlapping windows are still ordered by travel time.
+    """
+    n = time_matrix.shape[0]
+    if n == 0:
+        return []
+
+    def bound(value, open_value):
+        return open_value if value is None else float(value)
+
+    starts = [bound(w[0], -np.inf) for w in time_windows]
+    ends = [bound(w[1], np.inf) for w in time_windows]
+    pending = sorted(range(1, n), key=lambda s: (ends[s], starts[s], time_matrix[0, s]))
+
+    route = [0]
+    for stop in pending:
+        earliest = 1
+        for pos in range(len(route) - 1, 0, -1):
+            if ends[route[pos]] < starts[stop]:
+                earliest = pos + 1
+                break
+
+        deltas = _insertion_deltas(time_matrix, route, stop)
+        pos = earliest + int(np.argmin(deltas[earliest - 1:]))
+        route.insert(pos, stop)
+
+    return route
+
+
+def cheapest_insertion(time_matrix: np.ndarray, time_windows=None) -> List[int]:
+    """
+    Repeatedly insert the (stop, position) pair adding the least travel time.
+
+    deltas[s, g] is the extra travel time of putting pending stop s into
+    gap g (after route[g]). An insertion only touches the gap it splits,
+    so each step recomputes two columns instead of the whole table.
+    """
+    n = time_matrix.shape[0]
+    if n == 0:
+        return []
+
+    route = [0]
+    pending = np.arange(1, n)
+    m = len(pending)
+
+    deltas = np.empty((m, n))
+    deltas[:, 0] = time_matrix[0, pending]
+    gaps = 1
+
+    while m:
+        flat = int(np.argmin(deltas[:m, :gaps]))
+        s, g = divmod(flat, gaps)
+        stop = int(pending[s])
+
+        # drop the inserted stop (swap with the last pending row)
+        m -= 1
+        pending[s] = pending[m]
+        deltas[s, :gaps] = deltas[m, :gaps]
+        rows = pending[:m]
+
+        # gap g (a -> b) becomes a -> stop and stop -> b
+        a = route[g]
+        deltas[:m, g + 2:gaps + 1] = deltas[:m, g + 1:gaps]
+        deltas[:m, g] = (
+            time_matrix[a, rows] + time_matrix[rows, stop] - time_matrix[a, stop]
+        )
+        deltas[:m, g + 1] = time_matrix[stop, rows]
+        if g + 1 < len(route):
+            b = route[g + 1]
+            deltas[:m, g + 1] += time_matrix[rows, b] - time_matrix[stop, b]
+
+        route.insert(g + 1, stop)
+        gaps += 1
+
+    return route
+
+
+CONSTRUCTIONS: Dict[str, Callable[[np.ndarray, list], List[int]]] = {
+    "identity": identity_order,
+    "nearest_neighbour": nearest_neighbour,
+    "time_window": time_window_insertion,
+    "cheapest_insertion": cheapest_insertion,
+}
+
+
+def _has_windows(time_windows) -> bool:
+    return time_windows is not None and any(
+        start is not None or end is not None for start, end in time_windows
+    )
+
+
+def candidate_routes(
+    time_matrix: np.ndarray,
+    time_windows,
+    method: str = "auto",
+) -> Tuple[List[str], List[List[int]]]:
+    """
+    Routes to score for `method`: one heuristic by name, the one that
+    suits the windows for "auto", or all of them for "best".
+    """
+    if method == "auto":
+        names = ["time_window" if _has_windows(time_windows) else "nearest_neighbour"]
+    elif method == "best":
+        names = list(CONSTRUCTIONS)
+    elif method in CONSTRUCTIONS:
+        names = [method]
+    else:
+        raise ValueError(f"unknown construction method: {method!r}")
+
+    return names, [CONSTRUCTIONS[name](time_matrix, time_windows) for name in names]
@@ -5,14 +5,39 @@ Decision logic for triggering re-optimization.
 
 This module is deliberately rule-based and transparent:
 it never overrides hard constraints and is easy to reason about.
+
+The rules, in order:
+  1. no delay, no reroute;
+  2. a delay the last plan has not yet absorbed that would eat the
+     time-window slack reroutes at once (windows break without a new
+     plan), whenever the last reroute was;
+  3. within REOPT_COOLDOWN_S of the last reroute the fresh plan stands;
+  4. otherwise reroute from MIN_DELAY_MIN minutes of delay
+     (FRAGILE_MIN_DELAY_MIN when the next stop is fragile).
 """
 
+import math
+
+import numpy as np
+
+from .alns_optimizer import LazyTravelMatrix, window_arrays
+from .decompose import route_schedule
+
+# a fresh plan is kept this long unless windows are at stake
+REOPT_COOLDOWN_S = 60.0
+
+# smallest delay worth an ALNS run; kept low so the simulate button and
+# real traffic both trigger
+MIN_DELAY_MIN = 1.0
+FRAGILE_MIN_DELAY_MIN = 0.5
+
 
 def should_reoptimize(
     delay_minutes: float,
     next_stop_fragile: bool,
     time_window_slack: float,
     last_reopt_seconds: float,
+    handled_delay_minutes: float = 0.0,
 ) -> bool:
     """
     Decide whether the current event justifies running ALNS again.
@@ -24,15 +49,38 @@ def should_reoptimize(
     next_stop_fragile:
         Whether the immediate next stop carries a fragile delivery.
     time_window_slack:
-        Remaining slack (in minutes) before time windows become tight.
+        Remaining slack (in minutes) before time windows become tight;
+        `window_slack` computes it, math.inf when no window is at risk.
     last_reopt_seconds:
-        Cooldown guardrail from the caller. Currently used only as a
-        threshold knob, but kept for explainability.
+        Seconds since this driver's last reroute (math.inf if none).
+    handled_delay_minutes:
+        Delay the last reroute already planned around.
     """
     if delay_minutes <= 0:
         return False
 
-    # Reoptimize if delay is meaningful (>= 1 min) - keep threshold low
-    # so simulate button and real traffic both trigger.
-    return delay_minutes >= 1.0
+    new_delay = delay_minutes - handled_delay_minutes
+    if new_delay >= MIN_DELAY_MIN and new_delay >= time_window_slack:
+        return True
+
+    if last_reopt_seconds < REOPT_COOLDOWN_S:
+        return False
+
+    threshold = FRAGILE_MIN_DELAY_MIN if next_stop_fragile else MIN_DELAY_MIN
+    return delay_minutes >= threshold
+
+
+def window_slack(route, coords, time_windows, start_time_min, context) -> float:
+    """
+    Minutes the schedule of `route` can slip before its first time
+    window is missed (negative when already late; math.inf without
+    closing windows). Uses the leg model of route_cost without an n x n
+    matrix, so it is cheap enough to run on every trigger.
+    """
+    if len(route) < 2:
+        return math.inf
 
+    windows = window_arrays(time_windows)
+    clock = route_schedule(route, LazyTravelMatrix(coords, context), windows, start_time_min)
+    slack = windows[1][np.asarray(route[1:])] - clock[1:]
+    return float(slack.min())
@@ -0,0 +1,528 @@
+from __future__ import annotations
+
+"""
+Decomposition for very large single-vehicle days (hundreds to a few
+thousand stops), where one `optimize_route` over all stops is too slow.
+
+  1. Partition the stops (stop 0, the start, stays out) into clusters of
+     about `cluster_size`: k-means on (lat, lng, window midpoint), or a
+     sweep by angle around the start.
+  2. Order the clusters (sweep order, or by time then distance) and
+     estimate when the driver enters each one from a nearest-neighbour
+     pass, so every cluster is a small problem with its own start point
+     and start clock.
+  3. Optimize the clusters in parallel (solver pool) and stitch them.
+  4. Boundary repair: re-optimize a window of stops around every seam,
+     keeping a change only if the whole route gets cheaper.
+
+No step builds an n x n table: clusters and windows get their own small
+matrices, and whole-route costs use `LazyTravelMatrix`.
+"""
+
+import math
+from collections import Counter
+from concurrent.futures import Executor
+from time import perf_counter
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .alns_optimizer import (
+    LazyTravelMatrix,
+    batch_clock,
+    build_travel_matrix,
+    leg_multiplier,
+    route_cost_batch,
+    vehicle_speed,
+    window_arrays,
+)
+from .construction import nearest_neighbour
+from .distance import ROAD_FACTOR, planar
+from .incidents import remap_incidents
+from .parallel import run_chain
+
+
+# =====================================================
+# PARTITIONING
+# =====================================================
+
+def _window_midpoints(time_windows) -> np.ndarray:
+    """Window midpoint per stop; one-sided windows use their bound, open ones NaN."""
+    mids = []
+    for start, end in time_windows:
+        if start is not None and end is not None:
+            mids.append((start + end) / 2.0)
+        elif start is not None or end is not None:
+            mids.append(float(start if start is not None else end))
+        else:
+            mids.append(np.nan)
+    return np.array(mids, dtype=np.float64)
+
+
+def _features(
+    pts: np.ndarray,
+    time_windows,
+    window_weight: float,
+    minutes_per_unit: float,
+) -> np.ndarray:
+    """
+    (x, y, t) all in minutes: positions scaled by the travel time per
+    coordinate unit, t the window midpoint (times `window_weight`),
+    centered. A day whose windows span hours but whose legs take minutes
+    is then split mostly by time, and vice versa.
+    """
+    mids = _window_midpoints(time_windows)
+    t = np.zeros(len(pts))
+
+    known = ~np.isnan(mids)
+    if known.any():
+        t[known] = (mids[known] - mids[known].mean()) * window_weight
+
+    return np.column_stack([pts * minutes_per_unit, t])
+
+
+def kmeans_clusters(
+    coords,
+    time_windows,
+    k: int,
+    window_weight: float = 1.0,
+    minutes_per_unit: float = 1.0,
+    iters: int = 25,
+    seed: int = 42,
+) -> List[List[int]]:
+    """
+    Lloyd's k-means (k-means++ seeding) on (lat, lng, window midpoint),
+    see `_features` for the scaling. Stops without a window sit at the
+    mean midpoint, so they group by position only. Returns the non-empty
+    clusters as index lists.
+    """
+    pts = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    n = len(pts)
+    k = max(1, min(k, n))
+    if n == 0:
+        return []
+
+    feats = _features(pts, time_windows, window_weight, minutes_per_unit)
+    rng = np.random.default_rng(seed)
+
+    centers = np.empty((k, feats.shape[1]))
+    centers[0] = feats[rng.integers(n)]
+    d2 = ((feats - centers[0]) ** 2).sum(axis=1)
+    for c in range(1, k):
+        total = d2.sum()
+        pick = rng.choice(n, p=d2 / total) if total > 0 else rng.integers(n)
+        centers[c] = feats[pick]
+        d2 = np.minimum(d2, ((feats - centers[c]) ** 2).sum(axis=1))
+
+    labels = np.zeros(n, dtype=np.intp)
+    for _ in range(iters):
+        d2 = ((feats[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        new_labels = d2.argmin(axis=1)
+        if np.array_equal(new_labels, labels) and _ > 0:
+            break
+        labels = new_labels
+
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, feats)
+        filled = counts > 0
+        centers[filled] = sums[filled] / counts[filled, None]
+
+    return [idx.tolist() for idx in (np.flatnonzero(labels == c) for c in range(k)) if len(idx)]
+
+
+def _split_large(clusters, coords, time_windows, cluster_size, minutes_per_unit, seed) -> List[List[int]]:
+    """Re-cluster any k-means cluster over twice `cluster_size` (k-means is not size-balanced)."""
+    out = []
+    pending = list(clusters)
+    while pending:
+        c = pending.pop()
+        if len(c) <= 2 * cluster_size:
+            out.append(c)
+            continue
+
+        parts = kmeans_clusters(
+            [coords[i] for i in c],
+            [time_windows[i] for i in c],
+            math.ceil(len(c) / cluster_size),
+            minutes_per_unit=minutes_per_unit,
+            seed=seed,
+        )
+        if len(parts) == 1:
+            # all stops coincide: plain chunks
+            parts = [p.tolist() for p in np.array_split(np.arange(len(c)), math.ceil(len(c) / cluster_size))]
+        pending.extend([c[i] for i in p] for p in parts)
+
+    return out
+
+
+def sweep_clusters(coords, depot, k: int) -> List[List[int]]:
+    """
+    Sort stops by angle around `depot` and cut the sweep into k runs of
+    (nearly) equal size, starting after the widest angular gap. The runs
+    come back in sweep order. Windows are ignored, so this suits days
+    without tight windows; k-means is the default.
+    """
+    pts = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    n = len(pts)
+    if n == 0:
+        return []
+
+    angle = np.arctan2(pts[:, 1] - depot[1], pts[:, 0] - depot[0])
+    order = np.argsort(angle, kind="stable")
+
+    sorted_angle = angle[order]
+    gaps = np.diff(np.append(sorted_angle, sorted_angle[0] + 2 * math.pi))
+    order = np.roll(order, -((int(np.argmax(gaps)) + 1) % n))
+
+    return [chunk.tolist() for chunk in np.array_split(order, max(1, min(k, n)))]
+
+
+def _order_clusters(clusters, feats, depot) -> List[List[int]]:
+    """
+    Visit order for k-means clusters: by mean window time when the day
+    has windows, otherwise nearest centroid first from the depot.
+    """
+    centroids = np.array([feats[c].mean(axis=0) for c in clusters])
+
+    if np.any(centroids[:, 2] != 0):
+        order = np.argsort(centroids[:, 2], kind="stable")
+        return [clusters[i] for i in order]
+
+    left = list(range(len(clusters)))
+    here = np.asarray(depot, dtype=np.float64)
+    ordered = []
+    while left:
+        nxt = min(left, key=lambda i: float(np.hypot(*(centroids[i, :2] - here))))
+        left.remove(nxt)
+        ordered.append(clusters[nxt])
+        here = centroids[nxt, :2]
+    return ordered
+
+
+# =====================================================
+# COSTS AND CLOCKS ON THE WHOLE ROUTE
+# =====================================================
+
+def path_cost(route, coords, fragile_flags, time_windows, start_time_min, context) -> float:
+    """`route_cost` of one (possibly very long) route without an n x n matrix."""
+    return float(
+        route_cost_batch(
+            [route],
+            coords,
+            fragile_flags,
+            time_windows,
+            start_time_min,
+            context,
+            matrix=LazyTravelMatrix(coords, context),
+        )[0]
+    )
+
+
+def route_schedule(route, matrix, windows, start_time_min) -> np.ndarray:
+    """Clock after serving each position of `route` (as in route_cost_batch)."""
+    route = np.asarray(route, dtype=np.intp)
+    if len(route) < 2:
+        return np.full(len(route), float(start_time_min))
+
+    src = route[None, :-1]
+    travel = matrix.time[route[:-1], route[1:]][None]
+    _, _, time = batch_clock(travel, src, windows[0][route[1:]][None], start_time_min, matrix)
+    return np.concatenate([[float(start_time_min)], time[0]])
+
+
+# =====================================================
+# SUB-PROBLEMS
+# =====================================================
+
+def _subproblem(entry, stops, coords, fragile_flags, time_windows, start_clock, context) -> Dict:
+    """`optimize_route` arguments for stops [entry] + stops (entry is local 0)."""
+    nodes = [entry] + list(stops)
+    local = remap_incidents(context, {node: k for k, node in enumerate(nodes)}, coords)
+
+    return {
+        "coords": [coords[i] for i in nodes],
+        "fragile_flags": [bool(fragile_flags[i]) for i in nodes],
+        "time_windows": [time_windows[i] for i in nodes],
+        "context": local,
+        "start_time_min": start_clock,
+    }
+
+
+def _run_jobs(jobs, executor):
+    if executor is not None:
+        return list(executor.map(run_chain, jobs))
+    return [run_chain(job) for job in jobs]
+
+
+def _per_job_ms(budget_ms, n_jobs, workers):
+    if budget_ms is None or n_jobs == 0:
+        return None
+    rounds = math.ceil(n_jobs / max(1, workers))
+    return max(1.0, budget_ms / rounds)
+
+
+# =====================================================
+# DECOMPOSED OPTIMIZATION
+# =====================================================
+
+class Decomposition:
+    """
+    `optimize_decomposed` in phases, so the caller decides where the
+    sub-problems run: partition on construction, then
+
+        jobs = dec.cluster_jobs()          # one `run_chain` job per cluster
+        jobs = dec.stitch(results)         # one job per seam
+        route, cost, stats = dec.finish(results)
+
+    The object pickles, so every phase may run in a different process.
+    """
+
+    def __init__(
+        self,
+        coords,
+        fragile_flags,
+        time_windows,
+        context,
+        start_time_min,
+        cluster_size: int = 80,
+        method: str = "kmeans",
+        iters: int = 400,
+        seed: Optional[int] = None,
+        time_limit_ms: Optional[float] = None,
+        boundary: int = 10,
+        workers: int = 1,
+    ):
+        # perf_counter is system-wide, so the deadline holds in any process
+        self.started = perf_counter()
+        self.deadline = None
+        if time_limit_ms is not None:
+            self.deadline = self.started + time_limit_ms / 1000.0
+
+        self.coords = coords
+        self.fragile_flags = fragile_flags
+        self.time_windows = time_windows
+        self.context = context
+        self.start_time_min = start_time_min
+        self.cluster_size = cluster_size
+        self.method = method
+        self.iters = iters
+        self.seed = seed if seed is not None else 42
+        self.boundary = boundary
+        self.workers = workers
+
+        self.clusters: List[List[int]] = []
+        self.entries: List[int] = []
+        self.clocks: List[float] = []
+        self.route: List[int] = list(range(len(coords)))
+        self.spans = []
+        self.iterations = 0
+        self.reasons = Counter()
+        if len(coords) > 2:
+            self._partition()
+
+    def _cost(self, route) -> float:
+        return path_cost(
+            route, self.coords, self.fragile_flags, self.time_windows, self.start_time_min, self.context
+        )
+
+    def _partition(self):
+        coords, context = self.coords, self.context
+        n = len(coords)
+        pts = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+
+        # -------------------------------------------------
+        # 1-2. Partition and order
+        # -------------------------------------------------
+        stops = list(range(1, n))
+        k = math.ceil(len(stops) / self.cluster_size)
+        stop_coords = [coords[i] for i in stops]
+
+        if self.method == "kmeans":
+            windows = [self.time_windows[i] for i in stops]
+            scale = leg_multiplier(context) / vehicle_speed(
+                context.get("vehicle", "van")
+            )
+            # cluster in the plane of the distance mode, so minutes match the matrix
+            plane = planar(
+                pts, context.get("distance", "euclidean"), context.get("road_factor", ROAD_FACTOR)
+            )
+            local = kmeans_clusters(plane[1:], windows, k, minutes_per_unit=scale, seed=self.seed)
+            local = _split_large(local, plane[1:], windows, self.cluster_size, scale, self.seed)
+            feats = _features(plane[1:], windows, 1.0, scale)
+            local = _order_clusters(local, feats, plane[0] * scale)
+        elif self.method == "sweep":
+            local = sweep_clusters(stop_coords, coords[0], k)
+        else:
+            raise ValueError(f"unknown decomposition method: {self.method!r}")
+
+        self.clusters = [[stops[i] for i in c] for c in local]
+
+        # entry point and entry clock of every cluster, from a nearest-neighbour pass
+        lazy = LazyTravelMatrix(coords, context)
+        windows_arr = window_arrays(self.time_windows)
+        entry, clock = 0, float(self.start_time_min)
+        for cluster in self.clusters:
+            self.entries.append(entry)
+            self.clocks.append(clock)
+            nodes = [entry] + cluster
+            matrix = build_travel_matrix([coords[i] for i in nodes], context)
+            nn = [nodes[i] for i in nearest_neighbour(matrix.time)]
+            entry = nn[-1]
+            clock = float(route_schedule(nn, lazy, windows_arr, clock)[-1])
+
+    def cluster_jobs(self) -> List[Dict]:
+        """3. One sub-problem per cluster, sharing 70% of the time left."""
+        cluster_ms = None
+        if self.deadline is not None:
+            cluster_ms = 0.7 * max(0.0, (self.deadline - perf_counter()) * 1000.0)
+
+        per_job = _per_job_ms(cluster_ms, len(self.clusters), self.workers)
+        jobs = []
+        for c, cluster in enumerate(self.clusters):
+            job = _subproblem(
+                self.entries[c],
+                cluster,
+                self.coords,
+                self.fragile_flags,
+                self.time_windows,
+                self.clocks[c],
+                self.context,
+            )
+            job.update(iters=self.iters, seed=self.seed + c, time_limit_ms=per_job)
+            jobs.append(job)
+        return jobs
+
+    def stitch(self, results) -> List[Dict]:
+        """Join the cluster results; returns one repair sub-problem per seam."""
+        if not self.clusters:
+            self.stitched_cost = self._cost(self.route)
+            return []
+
+        route = [0]
+        for cluster, (order, _, stats) in zip(self.clusters, results):
+            nodes = [None] + cluster
+            route.extend(nodes[i] for i in order if i != 0)
+            self.iterations += stats["iterations"]
+            self.reasons[stats["stop_reason"]] += 1
+
+        self.route = route
+        self.stitched_cost = self._cost(route)
+
+        # -------------------------------------------------
+        # 4. Boundary repair around every seam
+        # -------------------------------------------------
+        seams = []
+        pos = 1
+        for cluster in self.clusters[:-1]:
+            pos += len(cluster)
+            seams.append(pos)
+
+        n = len(self.coords)
+        width = max(1, min(self.boundary, self.cluster_size // 2))
+
+        boundary_ms = None
+        if self.deadline is not None:
+            # jobs overrun their own limits a little (matrix, construction)
+            boundary_ms = 0.8 * (self.deadline - perf_counter()) * 1000.0
+
+        if not seams or (boundary_ms is not None and boundary_ms <= 0):
+            return []
+
+        lazy = LazyTravelMatrix(self.coords, self.context)
+        clock = route_schedule(route, lazy, window_arrays(self.time_windows), self.start_time_min)
+        self.spans = [(max(1, s - width), min(n, s + width)) for s in seams]
+
+        per_job = _per_job_ms(boundary_ms, len(self.spans), self.workers)
+        jobs = []
+        for c, (lo, hi) in enumerate(self.spans):
+            job = _subproblem(
+                route[lo - 1],
+                route[lo:hi],
+                self.coords,
+                self.fragile_flags,
+                self.time_windows,
+                float(clock[lo - 1]),
+                self.context,
+            )
+            job.update(
+                iters=self.iters,
+                seed=self.seed + len(self.clusters) + c,
+                time_limit_ms=per_job,
+                initial_route=list(range(hi - lo + 1)),
+            )
+            jobs.append(job)
+        return jobs
+
+    def finish(self, results):
+        """Keep each seam repair that lowers the whole route; (route, cost, stats)."""
+        route, cost = self.route, self.stitched_cost
+        repaired = 0
+        for (lo, hi), (order, _, stats) in zip(self.spans, results):
+            self.iterations += stats["iterations"]
+            window = route[lo:hi]
+            nodes = [None] + window
+            candidate = route[:lo] + [nodes[i] for i in order if i != 0] + route[hi:]
+            if candidate == route:
+                continue
+            candidate_cost = self._cost(candidate)
+            if candidate_cost < cost - 1e-9:
+                route, cost = candidate, candidate_cost
+                repaired += 1
+
+        stats = {
+            "clusters": len(self.clusters),
+            "iterations": self.iterations,
+            "stop_reason": self.reasons.most_common(1)[0][0] if self.reasons else "iterations",
+            "construction": f"{self.method}_decomposition",
+            "construction_cost": self.stitched_cost,
+            "boundary_repairs": repaired,
+            "elapsed_ms": (perf_counter() - self.started) * 1000.0,
+        }
+        return route, cost, stats
+
+
+def optimize_decomposed(
+    coords,
+    fragile_flags,
+    time_windows,
+    context,
+    start_time_min,
+    cluster_size: int = 80,
+    method: str = "kmeans",
+    iters: int = 400,
+    seed: Optional[int] = None,
+    time_limit_ms: Optional[float] = None,
+    boundary: int = 10,
+    executor: Optional[Executor] = None,
+    workers: int = 1,
+    return_stats: bool = False,
+):
+    """
+    Cluster, optimize the clusters in parallel, stitch, repair the seams
+    (see module docstring). Same contract as `optimize_route`: stop 0 is
+    the start, and the result is (route, cost) or (route, cost, stats).
+
+    With a `time_limit_ms`, the clusters get 70% of what is left after
+    partitioning and the boundary repair most of the rest; each phase is
+    shared by `workers` parallel jobs.
+    """
+    dec = Decomposition(
+        coords,
+        fragile_flags,
+        time_windows,
+        context,
+        start_time_min,
+        cluster_size=cluster_size,
+        method=method,
+        iters=iters,
+        seed=seed,
+        time_limit_ms=time_limit_ms,
+        boundary=boundary,
+        workers=workers,
+    )
+    seams = dec.stitch(_run_jobs(dec.cluster_jobs(), executor))
+    route, cost, stats = dec.finish(_run_jobs(seams, executor))
+    if return_stats:
+        return route, cost, stats
+    return route, cost
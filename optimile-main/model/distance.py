@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+"""
+Distance providers for the travel-time matrix.
+
+Modes (selected with context["distance"]):
+  - "euclidean": straight line on raw lat/lng degrees (the original model)
+  - "haversine": great-circle distance in km
+  - "road":      haversine x a road circuity factor (context["road_factor"],
+                 ROAD_FACTOR by default), a cheap stand-in for road distance
+  - "network":   shortest path on the offline road graph, in km
+                 (see model.road_network)
+
+Every closed-form mode computes the full n x n table in one broadcast
+NumPy expression. Tables can be kept in a shared cache keyed by a hash of the
+coordinate *set* (order-independent), so repeated requests on the same
+stops - a /reoptimize every few minutes on the same remaining stops -
+skip the trigonometry; only the rows of the "anchor" points that move
+between calls (the driver) are computed fresh.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+# typical ratio of road to great-circle distance in a city grid
+ROAD_FACTOR = 1.3
+
+DISTANCE_MODES = ("euclidean", "haversine", "road", "network")
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; works on scalars and (broadcast) arrays."""
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    dphi = np.radians(np.subtract(lat2, lat1))
+    dlambda = np.radians(np.subtract(lon2, lon1))
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def pairwise(a, b, mode: str = "euclidean", road_factor: float = ROAD_FACTOR) -> np.ndarray:
+    """
+    Distances between the points of `a` and `b` (arrays of (lat, lng),
+    broadcast against each other): a[:, None] / b[None, :] gives a table.
+    """
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+
+    if mode == "euclidean":
+        dx = a[..., 0] - b[..., 0]
+        dy = a[..., 1] - b[..., 1]
+        return np.sqrt(dx * dx + dy * dy)
+    if mode == "haversine":
+        return haversine(a[..., 0], a[..., 1], b[..., 0], b[..., 1])
+    if mode == "road":
+        return haversine(a[..., 0], a[..., 1], b[..., 0], b[..., 1]) * road_factor
+    if mode == "network":
+        from .road_network import default_network
+
+        return default_network().pairwise(a, b)
+
+    raise ValueError(f"unknown distance mode: {mode!r}")
+
+
+def planar(coords, mode: str = "euclidean", road_factor: float = ROAD_FACTOR) -> np.ndarray:
+    """
+    Points projected to a plane in the mode's distance unit
+    (equirectangular around the mean latitude for the km modes; the road
+    factor stands in for the graph's circuity under "network"), for
+    clustering and other geometry that needs coordinates, not a table.
+    """
+    pts = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    if mode == "euclidean":
+        return pts
+
+    scale = np.radians(1.0) * EARTH_RADIUS_KM
+    if mode in ("road", "network"):
+        scale *= road_factor
+    elif mode != "haversine":
+        raise ValueError(f"unknown distance mode: {mode!r}")
+
+    mean_lat = np.radians(pts[:, 0].mean()) if len(pts) else 0.0
+    return np.column_stack([pts[:, 0] * scale, pts[:, 1] * scale * np.cos(mean_lat)])
+
+
+# =====================================================
+# MATRIX CACHE
+# =====================================================
+
+class MatrixCache:
+    """Thread-safe LRU of distance tables, bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes: int = 256 * 2**20):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._tables: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            table = self._tables.get(key)
+            if table is None:
+                self.misses += 1
+                return None
+            self._tables.move_to_end(key)
+            self.hits += 1
+            return table
+
+    def put(self, key: str, table: np.ndarray):
+        if table.nbytes > self.max_bytes:
+            return
+        table.setflags(write=False)
+        with self._lock:
+            old = self._tables.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._tables[key] = table
+            self._bytes += table.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._tables.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+            self._bytes = 0
+
+
+# one cache per process (each solver-pool worker has its own)
+matrix_cache = MatrixCache()
+
+
+def _set_key(pts: np.ndarray, mode: str, road_factor: float) -> Tuple[str, np.ndarray]:
+    """Order-independent key of a point set, and the sorting permutation."""
+    order = np.lexsort((pts[:, 1], pts[:, 0]))
+    digest = hashlib.blake2b(np.ascontiguousarray(pts[order]).tobytes(), digest_size=16)
+    digest.update(f"{mode}:{road_factor!r}".encode())
+    if mode == "network":
+        from .road_network import network_path
+
+        digest.update(str(network_path()).encode())
+    return digest.hexdigest(), order
+
+
+def _table(a: np.ndarray, b: np.ndarray, mode: str, road_factor: float) -> np.ndarray:
+    """(len(a) x len(b)) table; the road graph batches all sources in one call."""
+    if mode == "network":
+        from .road_network import default_network
+
+        return default_network().table(a, b)
+    return pairwise(a[:, None, :], b[None, :, :], mode, road_factor)
+
+
+def distance_matrix(
+    coords,
+    mode: str = "euclidean",
+    road_factor: float = ROAD_FACTOR,
+    anchors: int = 0,
+    cache: Optional[MatrixCache] = None,
+) -> np.ndarray:
+    """
+    Full n x n distance table for `coords` under `mode`.
+
+    With a `cache`, the table of coords[anchors:] is looked up by the
+    hash of that point set (in any order) and stored after a miss; the
+    first `anchors` points are not part of the key and their rows and
+    columns are always computed. A cached table is read-only; callers
+    get it directly only when nothing had to be re-ordered or added.
+    """
+    pts = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+
+    if cache is None or len(pts) <= anchors:
+        return _table(pts, pts, mode, road_factor)
+
+    core = pts[anchors:]
+    key, order = _set_key(core, mode, road_factor)
+    table = cache.get(key)
+    if table is None:
+        ordered = core[order]
+        table = _table(ordered, ordered, mode, road_factor)
+        cache.put(key, table)
+
+    # table is in sorted order: rank[i] is core point i's row in it
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+
+    if anchors == 0:
+        if np.array_equal(order, np.arange(len(order))):
+            return table
+        return table[np.ix_(rank, rank)]
+
+    full = np.empty((len(pts), len(pts)))
+    full[anchors:, anchors:] = table[np.ix_(rank, rank)]
+    full[:anchors, :] = _table(pts[:anchors], pts, mode, road_factor)
+    full[anchors:, :anchors] = _table(core, pts[:anchors], mode, road_factor)
+    return full
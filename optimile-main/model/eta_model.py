@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+"""
+Learned leg travel times from the trained ETA pipeline.
+
+model/optimile_model.py trains a scikit-learn Pipeline (scaler + one-hot
+encoder, RandomForestRegressor) on delivery records and saves it with
+joblib. The API loads it once at startup from $OPTIMILE_ETA_MODEL
+(`default_eta_model`), memory-mapped: joblib leaves the forest's node
+arrays in the file, so the solver workers forked afterwards share those
+pages instead of each unpickling 400 trees.
+
+The pipeline predicts the minutes of a whole delivery, f(distance_km):
+pickup and handling plus the drive. A leg takes the part that grows with
+its length, f(d) - f(0) (never below 0), under the request's conditions
+(vehicle, traffic, weather, time of day, weekday); features a request
+does not carry (agent, area, category) take typical values.
+
+A RandomForest call costs milliseconds, so predictions are batched and
+cached per leg length. All the n x n legs of a request share everything
+but their length, so lengths are bucketed to DIST_STEP_KM. The buckets
+not seen before under those conditions are predicted in one call; every
+other leg is a table lookup.
+
+Select it with context["travel_time"] = "model".
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import joblib
+import numpy as np
+
+from .distance import distance_matrix
+
+ETA_MODEL_ENV = "OPTIMILE_ETA_MODEL"
+
+# leg lengths are predicted at this resolution (km)
+DIST_STEP_KM = 0.05
+# order_minutes is bucketed to this many minutes
+MINUTE_BUCKET = 15
+# conditions (vehicle, traffic, weather, time, weekday) with a cached table
+MAX_CONDITIONS = 256
+
+# columns of the training frame, in order (see optimile_model.train_and_save)
+FEATURE_COLUMNS = [
+    "agent_age",
+    "agent_rating",
+    "order_minutes",
+    "pickup_delay",
+    "day_of_week",
+    "distance_km",
+    "weather",
+    "traffic",
+    "vehicle",
+    "area",
+    "category",
+    "fragile_flag",
+]
+
+# API values -> the training data's spelling (trailing spaces included)
+TRAFFIC_LEVELS = {"Low": "Low ", "Normal": "Medium ", "Medium": "Medium ", "Heavy": "High ", "Jam": "Jam "}
+VEHICLES = {"motorcycle": "motorcycle ", "scooter": "scooter ", "van": "van", "bicycle": "bicycle "}
+
+# features a request does not carry; an unknown category encodes as all zeros
+DEFAULT_FEATURES = {
+    "agent_age": 30.0,
+    "agent_rating": 4.6,
+    "pickup_delay": 10.0,
+    "area": "Metropolitian ",
+    "category": "",
+    "fragile_flag": 0,
+}
+
+Conditions = Tuple[str, str, str, int, int]
+
+
+class ETAModel:
+    """The trained pipeline with a per-conditions table of predicted minutes per length bucket."""
+
+    def __init__(self, pipeline, max_conditions: int = MAX_CONDITIONS):
+        self.pipeline = pipeline
+        self.max_conditions = max_conditions
+        self.predicted = 0
+        self.lookups = 0
+        # conditions -> f(bucket * DIST_STEP_KM), NaN where not predicted yet
+        self._tables: "OrderedDict[Conditions, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: Optional[str] = "r") -> "ETAModel":
+        return cls(joblib.load(path, mmap_mode=mmap_mode))
+
+    @staticmethod
+    def conditions(context: Dict) -> Conditions:
+        # with a speed profile the table holds free-flow minutes
+        traffic = "Low" if context.get("profile") is not None else context.get("traffic", "Normal")
+        vehicle = context.get("vehicle", "van")
+        minutes = int(context.get("order_minutes", 720)) // MINUTE_BUCKET * MINUTE_BUCKET
+        return (
+            VEHICLES.get(vehicle, vehicle),
+            TRAFFIC_LEVELS.get(traffic, traffic),
+            str(context.get("weather", "Sunny")),
+            minutes,
+            int(context.get("day_of_week", 0)),
+        )
+
+    def leg_minutes(self, km, context: Dict) -> np.ndarray:
+        """Learned minutes of legs `km` long (any shape) under `context`."""
+        km = np.asarray(km, dtype=np.float64)
+        buckets = np.rint(km / DIST_STEP_KM).astype(np.intp)
+        key = self.conditions(context)
+
+        with self._lock:
+            table = self._tables.get(key)
+            size = int(buckets.max(initial=0)) + 1
+            if table is None or len(table) < size:
+                grown = np.full(size, np.nan)
+                if table is not None:
+                    grown[: len(table)] = table
+                table = grown
+            self._tables[key] = table
+            self._tables.move_to_end(key)
+            while len(self._tables) > self.max_conditions:
+                self._tables.popitem(last=False)
+
+            # bucket 0 is f(0), the part of a delivery that is not driving
+            missing = np.unique(np.append(buckets.ravel(), 0))
+            missing = missing[np.isnan(table[missing])]
+            if len(missing):
+                table[missing] = self._predict(missing * DIST_STEP_KM, key)
+                self.predicted += len(missing)
+            self.lookups += buckets.size
+            minutes = table[buckets] - table[0]
+
+        return np.maximum(minutes, 0.0)
+
+    def _predict(self, km: np.ndarray, key: Conditions) -> np.ndarray:
+        # the pipeline's ColumnTransformer picks its columns by name
+        import pandas as pd
+
+        vehicle, traffic, weather, minutes, weekday = key
+        n = len(km)
+        frame = pd.DataFrame(
+            {
+                **{name: [value] * n for name, value in DEFAULT_FEATURES.items()},
+                "order_minutes": [minutes] * n,
+                "day_of_week": [weekday] * n,
+                "distance_km": km,
+                "weather": [weather] * n,
+                "traffic": [traffic] * n,
+                "vehicle": [vehicle] * n,
+            },
+            columns=FEATURE_COLUMNS,
+        )
+        return np.asarray(self.pipeline.predict(frame), dtype=np.float64)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "conditions": len(self._tables),
+            "predicted": self.predicted,
+            "lookups": self.lookups,
+        }
+
+
+# =====================================================
+# PROCESS-WIDE MODEL
+# =====================================================
+
+_default: Optional[ETAModel] = None
+_default_lock = threading.Lock()
+
+
+def eta_model_path() -> Optional[str]:
+    return os.getenv(ETA_MODEL_ENV) or None
+
+
+def default_eta_model() -> ETAModel:
+    """The pipeline at $OPTIMILE_ETA_MODEL, loaded once per process."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                path = eta_model_path()
+                if path is None:
+                    raise ValueError(f"model travel times need ${ETA_MODEL_ENV} to point at a trained pipeline")
+                _default = ETAModel.load(path)
+    return _default
+
+
+def model_time_matrix(coords, context: Dict, anchors: int = 0, cache=None) -> np.ndarray:
+    """(n x n) learned minutes between `coords`, from haversine km as in training."""
+    km = distance_matrix(coords, "haversine", anchors=anchors, cache=cache)
+    return default_eta_model().leg_minutes(km, context)
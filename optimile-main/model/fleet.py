@@ -0,0 +1,791 @@
+from __future__ import annotations
+
+"""
+Multi-vehicle routing with time windows (VRPTW) on the ALNS engine.
+
+Node layout: nodes 0..V-1 are the vehicle start points and stop i is
+node V + i. Every route begins at its vehicle's start node and is scored
+by `route_cost_batch` under that vehicle's own context (its
+`vehicle_speed`, or the ETA model under `travel_time`), so a mixed fleet
+is compared in the same minutes.
+The fleet cost is the sum of the route costs plus UNASSIGNED_PENALTY per
+stop that no vehicle has capacity for.
+
+Search:
+  - construction: stops in window order, each at its cheapest feasible
+    position among the routes of its nearest nodes
+  - ALNS over the whole fleet: random / radius / route-string removal,
+    greedy and regret-2 repair across routes, simulated annealing
+  - inter-route local search on new bests: relocate (move a stop into
+    another route) and exchange (swap two stops of different routes)
+  - polish: every route is re-optimized on its own as a single-vehicle
+    sub-problem (`optimize_route`), in parallel on the solver pool
+
+All insertion variants of a route are rows of one int array scored in a
+single `route_cost_batch` call. The leg tables are shared NumPy arrays
+(one time table per vehicle type), never nested lists, so a shift of a
+few thousand stops fits in memory.
+"""
+
+import math
+import random
+from concurrent.futures import Executor
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .alns_optimizer import (
+    AdaptiveSelector,
+    TravelMatrix,
+    profile_zones,
+    removal_size,
+    route_cost_batch,
+    time_table,
+    window_arrays,
+)
+from .distance import ROAD_FACTOR, distance_matrix, matrix_cache
+from .incidents import incident_penalties, remap_incidents
+from .local_search import neighbour_lists
+from .parallel import run_chain
+from .spatial import GridIndex
+
+# cost of leaving a stop unserved (no vehicle with room for it)
+UNASSIGNED_PENALTY = 500.0
+
+EPS = 1e-9
+
+
+# =====================================================
+# PROBLEM AND SOLUTION
+# =====================================================
+
+class FleetProblem:
+    """
+    Static data of one fleet optimization call.
+
+    `vehicles` are dicts with "vehicle" (motorcycle | scooter | van),
+    "start" (lat, lng) and an optional "capacity" (None = unlimited).
+    `demands[i]` is the load of stop i (1 each when omitted). Incidents
+    in `context` (model.incidents) refer to stop indexes or locations.
+    """
+
+    def __init__(
+        self,
+        coords,
+        fragile_flags,
+        time_windows,
+        demands,
+        vehicles,
+        context,
+        start_time_min,
+        neighbour_k: int = 12,
+    ):
+        V = len(vehicles)
+        self.n_vehicles = V
+        self.n_stops = len(coords)
+        self.vehicles = vehicles
+        self.start_time_min = start_time_min
+
+        self.coords = np.asarray(
+            [v["start"] for v in vehicles] + list(coords), dtype=np.float64
+        ).reshape(-1, 2)
+        self.fragile = np.array([False] * V + [bool(f) for f in fragile_flags])
+        self.time_windows = [(None, None)] * V + list(time_windows)
+        self.windows = window_arrays(self.time_windows)
+
+        if demands is None:
+            demands = [1.0] * self.n_stops
+        self.demand = [0.0] * V + [float(d) for d in demands]
+        self.capacity = [
+            math.inf if v.get("capacity") is None else float(v["capacity"])
+            for v in vehicles
+        ]
+
+        # Same table as build_travel_matrix, so a route scores the same
+        # here and in its single-vehicle sub-problem. The vehicle starts
+        # are anchors: the stop block is cached across requests.
+        self.dist = distance_matrix(
+            self.coords,
+            context.get("distance", "euclidean"),
+            context.get("road_factor", ROAD_FACTOR),
+            anchors=V,
+            cache=matrix_cache,
+        )
+
+        # one time table per vehicle type; the distance table is shared
+        profile, zones = profile_zones(self.coords, context)
+        context = remap_incidents(context, {i: V + i for i in range(self.n_stops)}, self.coords)
+        penalties = incident_penalties(self.coords, context)
+        self.matrices: Dict[str, TravelMatrix] = {}
+        self.kinds: List[str] = []
+        self.contexts: List[Dict] = []
+
+        for v in vehicles:
+            kind = v.get("vehicle", "van")
+            ctx = dict(context, vehicle=kind)
+            if kind not in self.matrices:
+                times = time_table(self.coords, self.dist, ctx, anchors=V, cache=matrix_cache)
+                self.matrices[kind] = TravelMatrix(self.dist, times, profile, zones, penalties)
+
+            self.kinds.append(kind)
+            self.contexts.append(ctx)
+
+        self.neighbours = neighbour_lists(self.dist, neighbour_k)
+        self.index = GridIndex(self.coords[V:])
+
+    def cost(self, v: int, routes) -> np.ndarray:
+        """Costs of candidate routes (rows) driven by vehicle `v`."""
+        return route_cost_batch(
+            routes,
+            self.coords,
+            self.fragile,
+            self.windows,
+            self.start_time_min,
+            self.contexts[v],
+            matrix=self.matrices[self.kinds[v]],
+        )
+
+    def best_insertions(self, v: int, route: List[int], nodes: List[int]) -> List[Tuple[float, int]]:
+        """
+        (new route cost, position) of the cheapest insertion of each of
+        `nodes` into route `v`, scored in a single batch.
+        """
+        m = len(route)
+        base = np.asarray(route, dtype=np.intp)
+        cols = np.arange(m + 1)
+        pos = np.arange(1, m + 1)[:, None]
+        slot = cols == pos
+
+        # cand[i, p-1] is route[:p] + [nodes[i]] + route[p:]
+        template = base[np.where(cols < pos, cols, cols - 1)]
+        cand = np.repeat(template[None], len(nodes), axis=0)
+        cand[:, slot] = np.asarray(nodes, dtype=np.intp)[:, None]
+
+        costs = self.cost(v, cand.reshape(-1, m + 1)).reshape(len(nodes), m)
+        best = costs.argmin(axis=1)
+        return [
+            (float(costs[i, b]), int(b) + 1) for i, b in enumerate(best.tolist())
+        ]
+
+    def best_insertion(self, v: int, route: List[int], node: int) -> Tuple[float, int]:
+        return self.best_insertions(v, route, [node])[0]
+
+
+class FleetSolution:
+    """One route per vehicle, with cached route costs and loads."""
+
+    def __init__(self, problem: FleetProblem):
+        V = problem.n_vehicles
+        self.routes: List[List[int]] = [[v] for v in range(V)]
+        self.costs = [0.0] * V
+        self.loads = [0.0] * V
+        self.route_of = list(range(V)) + [-1] * problem.n_stops
+        self.unassigned = set(range(V, V + problem.n_stops))
+
+    def copy(self) -> "FleetSolution":
+        clone = FleetSolution.__new__(FleetSolution)
+        clone.routes = [r[:] for r in self.routes]
+        clone.costs = self.costs[:]
+        clone.loads = self.loads[:]
+        clone.route_of = self.route_of[:]
+        clone.unassigned = set(self.unassigned)
+        return clone
+
+    def total(self) -> float:
+        return sum(self.costs) + UNASSIGNED_PENALTY * len(self.unassigned)
+
+    def assigned(self, problem: FleetProblem) -> List[int]:
+        V = problem.n_vehicles
+        return [n for n in range(V, V + problem.n_stops) if self.route_of[n] >= 0]
+
+    def fits(self, problem: FleetProblem, v: int, node: int) -> bool:
+        return self.loads[v] + problem.demand[node] <= problem.capacity[v] + EPS
+
+    def insert(self, problem: FleetProblem, v: int, pos: int, node: int, new_cost: float):
+        self.routes[v].insert(pos, node)
+        self.costs[v] = new_cost
+        self.loads[v] += problem.demand[node]
+        self.route_of[node] = v
+        self.unassigned.discard(node)
+
+    def set_route(self, problem: FleetProblem, v: int, route: List[int], cost: float):
+        for node in self.routes[v][1:]:
+            self.route_of[node] = -1
+        for node in route[1:]:
+            self.route_of[node] = v
+        self.routes[v] = route
+        self.costs[v] = cost
+        self.loads[v] = sum(problem.demand[n] for n in route)
+
+    def detach(self, problem: FleetProblem, nodes) -> List[int]:
+        """Take `nodes` off their routes; the removed nodes are returned."""
+        taken = set(nodes)
+        touched = {self.route_of[n] for n in taken} - {-1}
+
+        for v in touched:
+            route = [n for n in self.routes[v] if n not in taken]
+            self.set_route(problem, v, route, float(problem.cost(v, [route])[0]))
+
+        return [n for n in nodes if n not in self.unassigned]
+
+
+# =====================================================
+# INSERTION (CONSTRUCTION AND REPAIR)
+# =====================================================
+
+def _candidate_routes(problem: FleetProblem, sol: FleetSolution, node: int) -> List[int]:
+    """
+    Routes of the node's nearest neighbours that still have room, plus
+    the empty vehicle that starts nearest the node (an idle vehicle has
+    no stops among anyone's neighbours, so it would never be tried).
+    """
+    routes = {sol.route_of[c] for c in problem.neighbours[node]}
+    routes.discard(-1)
+
+    V = problem.n_vehicles
+    empty = [v for v in range(V) if len(sol.routes[v]) == 1 and sol.fits(problem, v, node)]
+    if empty:
+        routes.add(min(empty, key=lambda v: problem.dist[node, v]))
+
+    feasible = [v for v in routes if sol.fits(problem, v, node)]
+
+    if not feasible:
+        # every nearby route is full: try the closest vehicle starts
+        order = np.argsort(problem.dist[node, :V], kind="stable").tolist()
+        feasible = [v for v in order if sol.fits(problem, v, node)][:4]
+
+    return feasible
+
+
+def _insertion_options(problem, sol, node) -> Dict[int, Tuple[float, int]]:
+    """route -> (new route cost, position) for every candidate route."""
+    return {
+        v: problem.best_insertion(v, sol.routes[v], node)
+        for v in _candidate_routes(problem, sol, node)
+    }
+
+
+def repair_greedy(problem: FleetProblem, sol: FleetSolution, removed: List[int], rng=None):
+    for node in removed:
+        options = _insertion_options(problem, sol, node)
+        if not options:
+            sol.unassigned.add(node)
+            continue
+
+        v = min(options, key=lambda r: options[r][0] - sol.costs[r])
+        new_cost, pos = options[v]
+        sol.insert(problem, v, pos, node, new_cost)
+
+    return sol
+
+
+def repair_regret(problem: FleetProblem, sol: FleetSolution, removed: List[int], rng=None):
+    """
+    Regret-2 across routes: insert first the stop that loses most if it
+    does not get its best route. Only the options on the route that just
+    changed are re-scored.
+    """
+    # score each candidate route once for all the stops that want it
+    wanted: Dict[int, List[int]] = {}
+    for node in removed:
+        for v in _candidate_routes(problem, sol, node):
+            wanted.setdefault(v, []).append(node)
+
+    options: Dict[int, Dict[int, Tuple[float, int]]] = {node: {} for node in removed}
+    for v, nodes in wanted.items():
+        for node, option in zip(nodes, problem.best_insertions(v, sol.routes[v], nodes)):
+            options[node][v] = option
+
+    pending = list(removed)
+
+    while pending:
+        pick = None
+        for node in pending:
+            deltas = sorted(c - sol.costs[v] for v, (c, _) in options[node].items())
+            if not deltas:
+                continue
+            regret = deltas[1] - deltas[0] if len(deltas) > 1 else math.inf
+            key = (regret, -deltas[0])
+            if pick is None or key > pick[0]:
+                pick = (key, node)
+
+        if pick is None:
+            # nothing left fits anywhere
+            sol.unassigned.update(pending)
+            break
+
+        node = pick[1]
+        pending.remove(node)
+        opts = options.pop(node)
+        v = min(opts, key=lambda r: opts[r][0] - sol.costs[r])
+        new_cost, pos = opts[v]
+        sol.insert(problem, v, pos, node, new_cost)
+
+        stale = [other for other in pending if v in options[other]]
+        for other in stale:
+            if not sol.fits(problem, v, other):
+                del options[other][v]
+        stale = [other for other in stale if v in options[other]]
+        if stale:
+            for other, option in zip(stale, problem.best_insertions(v, sol.routes[v], stale)):
+                options[other][v] = option
+
+    return sol
+
+
+def construct(problem: FleetProblem) -> FleetSolution:
+    """Greedy insertion of all stops, earliest window end first."""
+    V = problem.n_vehicles
+    win_start, win_end = problem.windows
+    order = sorted(
+        range(V, V + problem.n_stops),
+        key=lambda n: (win_end[n], win_start[n]),
+    )
+    return repair_greedy(problem, FleetSolution(problem), order)
+
+
+# =====================================================
+# DESTROY OPERATORS
+# =====================================================
+
+def destroy_random(problem, sol, k, rng):
+    assigned = sol.assigned(problem)
+    return sol.detach(problem, rng.sample(assigned, min(k, len(assigned))))
+
+
+def destroy_radius(problem, sol, k, rng):
+    """The k stops nearest to a random stop, whatever route they are on."""
+    assigned = sol.assigned(problem)
+    if not assigned:
+        return []
+
+    V = problem.n_vehicles
+    seed = rng.choice(assigned)
+    nearest = problem.index.nearest(problem.coords[seed], k)
+    return sol.detach(problem, [V + i for i in nearest])
+
+
+def destroy_string(problem, sol, k, rng):
+    """A run of up to k consecutive stops from one route (all of a short route)."""
+    assigned = sol.assigned(problem)
+    if not assigned:
+        return []
+
+    route = sol.routes[sol.route_of[rng.choice(assigned)]]
+    length = min(k, len(route) - 1)
+    start = rng.randint(1, len(route) - length)
+    return sol.detach(problem, route[start:start + length])
+
+
+# =====================================================
+# INTER-ROUTE LOCAL SEARCH
+# =====================================================
+
+def relocate(problem: FleetProblem, sol: FleetSolution, node: int) -> bool:
+    """Move `node` to its best position in another nearby route."""
+    v = sol.route_of[node]
+    without = [n for n in sol.routes[v] if n != node]
+    cost_without = float(problem.cost(v, [without])[0])
+    gain = sol.costs[v] - cost_without
+
+    best = None
+    for r in _candidate_routes(problem, sol, node):
+        if r == v:
+            continue
+        new_cost, pos = problem.best_insertion(r, sol.routes[r], node)
+        delta = new_cost - sol.costs[r] - gain
+        if delta < -EPS and (best is None or delta < best[0]):
+            best = (delta, r, pos, new_cost)
+
+    if best is None:
+        return False
+
+    _, r, pos, new_cost = best
+    sol.set_route(problem, v, without, cost_without)
+    sol.insert(problem, r, pos, node, new_cost)
+    return True
+
+
+def exchange(problem: FleetProblem, sol: FleetSolution, node: int) -> bool:
+    """
+    Swap `node` with the best nearby stop of another route, each taking
+    the other's place.
+    """
+    V = problem.n_vehicles
+    v = sol.route_of[node]
+    demand = problem.demand
+
+    others = []
+    for other in problem.neighbours[node]:
+        u = sol.route_of[other]
+        if other < V or u < 0 or u == v:
+            continue
+        if sol.loads[v] - demand[node] + demand[other] > problem.capacity[v] + EPS:
+            continue
+        if sol.loads[u] - demand[other] + demand[node] > problem.capacity[u] + EPS:
+            continue
+        others.append(other)
+
+    if not others:
+        return False
+
+    # one batch for route v (node replaced by each candidate) and one per
+    # other route touched
+    rv = np.asarray(sol.routes[v], dtype=np.intp)
+    rows_v = np.repeat(rv[None], len(others), axis=0)
+    rows_v[:, sol.routes[v].index(node)] = others
+    costs_v = problem.cost(v, rows_v)
+
+    by_route: Dict[int, List[int]] = {}
+    for i, other in enumerate(others):
+        by_route.setdefault(sol.route_of[other], []).append(i)
+
+    best = None
+    for u, idx in by_route.items():
+        ru = np.asarray(sol.routes[u], dtype=np.intp)
+        rows_u = np.repeat(ru[None], len(idx), axis=0)
+        for row, i in enumerate(idx):
+            rows_u[row, sol.routes[u].index(others[i])] = node
+        costs_u = problem.cost(u, rows_u)
+
+        for row, i in enumerate(idx):
+            delta = costs_v[i] + costs_u[row] - sol.costs[v] - sol.costs[u]
+            if delta < -EPS and (best is None or delta < best[0]):
+                best = (delta, u, rows_v[i].tolist(), rows_u[row].tolist(), costs_v[i], costs_u[row])
+
+    if best is None:
+        return False
+
+    _, u, route_v, route_u, cost_v, cost_u = best
+    sol.set_route(problem, v, route_v, float(cost_v))
+    sol.set_route(problem, u, route_u, float(cost_u))
+    return True
+
+
+def improve_fleet(
+    problem: FleetProblem,
+    sol: FleetSolution,
+    rng,
+    deadline: Optional[float] = None,
+    max_moves: int = 1000,
+) -> int:
+    """
+    First-improvement relocate / exchange passes over all assigned stops
+    until a pass finds nothing, the deadline passes or `max_moves` moves
+    were made. Returns the number of moves applied.
+    """
+    moves = 0
+    improved = True
+
+    while improved and moves < max_moves:
+        improved = False
+        nodes = sol.assigned(problem)
+        rng.shuffle(nodes)
+
+        for node in nodes:
+            if deadline is not None and perf_counter() >= deadline:
+                return moves
+            if sol.route_of[node] < 0:
+                continue
+            if relocate(problem, sol, node) or exchange(problem, sol, node):
+                moves += 1
+                improved = True
+                if moves >= max_moves:
+                    break
+
+    return moves
+
+
+# =====================================================
+# PER-ROUTE SUB-PROBLEMS
+# =====================================================
+
+def route_subproblem(problem: FleetProblem, v: int, route: List[int]) -> Dict:
+    """Single-vehicle `optimize_route` arguments for one fleet route (local ids)."""
+    context = remap_incidents(
+        problem.contexts[v], {node: k for k, node in enumerate(route)}, problem.coords
+    )
+
+    return {
+        "coords": problem.coords[route].tolist(),
+        "fragile_flags": problem.fragile[route].tolist(),
+        "time_windows": [problem.time_windows[n] for n in route],
+        "context": context,
+        "start_time_min": problem.start_time_min,
+        "initial_route": list(range(len(route))),
+    }
+
+
+def polish_jobs(
+    problem: FleetProblem,
+    sol: FleetSolution,
+    workers: int = 1,
+    time_limit_ms: Optional[float] = None,
+    iters: int = 200,
+    seed: int = 42,
+) -> List[Tuple[int, Dict]]:
+    """(vehicle, `run_chain` job) for every route with 3+ stops."""
+    which = [v for v, route in enumerate(sol.routes) if len(route) >= 4]
+
+    per_job_ms = None
+    if time_limit_ms is not None and which:
+        # jobs run `workers` at a time
+        rounds = math.ceil(len(which) / max(1, workers))
+        per_job_ms = max(1.0, time_limit_ms / rounds)
+
+    jobs = []
+    for v in which:
+        job = route_subproblem(problem, v, sol.routes[v])
+        job.update(iters=iters, seed=seed + v, time_limit_ms=per_job_ms)
+        jobs.append((v, job))
+    return jobs
+
+
+def polish_routes(
+    problem: FleetProblem,
+    sol: FleetSolution,
+    executor: Optional[Executor] = None,
+    workers: int = 1,
+    time_limit_ms: Optional[float] = None,
+    iters: int = 200,
+    seed: int = 42,
+) -> int:
+    """
+    Re-optimize every route with 3+ stops as its own single-vehicle
+    problem; the sub-problems run on `executor` when given. A route is
+    replaced only when its sub-problem result is cheaper. Returns the
+    number of routes improved.
+    """
+    jobs = polish_jobs(problem, sol, workers, time_limit_ms, iters, seed)
+    if not jobs:
+        return 0
+
+    if executor is not None:
+        results = list(executor.map(run_chain, [job for _, job in jobs]))
+    else:
+        results = [run_chain(job) for _, job in jobs]
+
+    improved = 0
+    for (v, _), (local, _, _) in zip(jobs, results):
+        route = [sol.routes[v][i] for i in local]
+        cost = float(problem.cost(v, [route])[0])
+        if cost < sol.costs[v] - EPS:
+            sol.set_route(problem, v, route, cost)
+            improved += 1
+
+    return improved
+
+
+def merge_polish(routes, cost, stats, jobs, results):
+    """
+    Apply the results of a deferred polish (`optimize_fleet(...,
+    defer_polish=True)`) to its (routes, cost, stats); `jobs` are the
+    (vehicle, job) pairs from stats["polish_jobs"], `results` their
+    `run_chain` results. The sub-problems score a route on the same
+    tables as the fleet, so their costs are used as they are. Returns
+    (routes, cost) and updates stats.
+    """
+    routes = [route[:] for route in routes]
+    route_costs = stats["route_costs"]
+    improved = 0
+    for (v, _), (local, sub_cost, _) in zip(jobs, results):
+        if list(local) == list(range(len(local))):
+            continue
+        if sub_cost < route_costs[v] - EPS:
+            # local 0 is the vehicle start, local i the route's (i-1)th stop
+            routes[v] = [routes[v][i - 1] for i in local[1:]]
+            route_costs[v] = float(sub_cost)
+            improved += 1
+
+    stats["polished_routes"] = improved
+    cost = sum(route_costs) + UNASSIGNED_PENALTY * len(stats["unassigned"])
+    return routes, cost
+
+
+# =====================================================
+# FLEET ALNS
+# =====================================================
+
+def optimize_fleet(
+    coords,
+    fragile_flags,
+    time_windows,
+    demands,
+    vehicles,
+    context,
+    start_time_min,
+    iters: int = 2000,
+    seed: Optional[int] = None,
+    time_limit_ms: Optional[float] = None,
+    max_no_improve: Optional[int] = None,
+    temperature: float = 0.05,
+    local_search: bool = True,
+    polish: bool = True,
+    executor: Optional[Executor] = None,
+    workers: int = 1,
+    defer_polish: bool = False,
+):
+    """
+    Fleet ALNS with simulated-annealing acceptance (see module docstring).
+
+    With a `time_limit_ms`, the fleet search gets three quarters of it
+    and the per-route polish the rest (all of it without `polish`).
+    With `defer_polish`, the polish sub-problems are not run but come
+    back in stats["polish_jobs"], for the caller to run on its own
+    workers and apply with `merge_polish`.
+
+    Returns (routes, cost, stats): routes[v] lists the stop indices
+    vehicle v visits in order, and stats["unassigned"] the stops no
+    vehicle could take.
+    """
+    started = perf_counter()
+    rng = random.Random(seed if seed is not None else 42)
+
+    if len(coords) == 0:
+        stats = {
+            "iterations": 0,
+            "stop_reason": "no_stops",
+            "elapsed_ms": (perf_counter() - started) * 1000.0,
+            "construction_cost": 0.0,
+            "local_search_moves": 0,
+            "polished_routes": 0,
+            "route_costs": [0.0] * len(vehicles),
+            "loads": [0.0] * len(vehicles),
+            "unassigned": [],
+        }
+        return [[] for _ in vehicles], 0.0, stats
+
+    problem = FleetProblem(
+        coords, fragile_flags, time_windows, demands, vehicles, context, start_time_min
+    )
+    V = problem.n_vehicles
+
+    deadline = search_deadline = None
+    if time_limit_ms is not None:
+        deadline = started + time_limit_ms / 1000.0
+        share = 0.75 if polish else 1.0
+        search_deadline = started + share * time_limit_ms / 1000.0
+
+    current = construct(problem)
+    construction_cost = current.total()
+    ls_moves = 0
+
+    def intensify(sol):
+        nonlocal ls_moves
+        # at most half of the remaining search time, as in optimize_route
+        ls_deadline = search_deadline
+        if search_deadline is not None:
+            now = perf_counter()
+            ls_deadline = now + max(search_deadline - now, 0.0) / 2.0
+        ls_moves += improve_fleet(problem, sol, rng, ls_deadline)
+
+    if local_search:
+        intensify(current)
+
+    current_cost = current.total()
+    best, best_cost = current.copy(), current_cost
+
+    # temperature relative to one route, since moves touch only a few
+    T = temperature * current_cost / max(1, V)
+
+    k_fn = lambda: removal_size(min(problem.n_stops, 100) + 1, rng, cap=30)
+
+    destroy_ops = {
+        "random": lambda sol: destroy_random(problem, sol, k_fn(), rng),
+        "radius": lambda sol: destroy_radius(problem, sol, k_fn(), rng),
+        "string": lambda sol: destroy_string(problem, sol, k_fn(), rng),
+    }
+    repair_ops = {
+        "greedy": lambda sol, removed: repair_greedy(problem, sol, removed, rng),
+        "regret": lambda sol, removed: repair_regret(problem, sol, removed, rng),
+    }
+
+    destroy_selector = AdaptiveSelector(destroy_ops, rng)
+    repair_selector = AdaptiveSelector(repair_ops, rng)
+
+    iterations = 0
+    no_improve = 0
+    stop_reason = "iterations"
+
+    while iterations < iters:
+        if max_no_improve is not None and no_improve >= max_no_improve:
+            stop_reason = "no_improve"
+            break
+        if search_deadline is not None and perf_counter() >= search_deadline:
+            stop_reason = "time_limit"
+            break
+
+        iterations += 1
+        no_improve += 1
+
+        d_op = destroy_selector.select()
+        r_op = repair_selector.select()
+
+        candidate = current.copy()
+        removed = destroy_ops[d_op](candidate)
+        # stops nobody could take get another chance every iteration
+        removed += sorted(candidate.unassigned)
+        candidate.unassigned.clear()
+        rng.shuffle(removed)
+        repair_ops[r_op](candidate, removed)
+
+        candidate_cost = candidate.total()
+        delta = candidate_cost - current_cost
+
+        if delta < 0 or rng.random() < math.exp(-delta / max(T, 1e-6)):
+            destroy_selector.reward(d_op, delta)
+            repair_selector.reward(r_op, delta)
+            current, current_cost = candidate, candidate_cost
+
+            if current_cost < best_cost - EPS:
+                if local_search:
+                    intensify(current)
+                    current_cost = current.total()
+                best, best_cost = current.copy(), current_cost
+                no_improve = 0
+
+        destroy_selector.update()
+        repair_selector.update()
+        T *= 0.995
+
+    polished = 0
+    deferred = []
+    if polish:
+        remaining_ms = None
+        if deadline is not None:
+            remaining_ms = max(1.0, (deadline - perf_counter()) * 1000.0)
+        if defer_polish:
+            deferred = polish_jobs(
+                problem,
+                best,
+                workers,
+                time_limit_ms=remaining_ms,
+                seed=seed if seed is not None else 42,
+            )
+        else:
+            polished = polish_routes(
+                problem,
+                best,
+                executor=executor,
+                workers=workers,
+                time_limit_ms=remaining_ms,
+                seed=seed if seed is not None else 42,
+            )
+            best_cost = best.total()
+
+    routes = [[n - V for n in route[1:]] for route in best.routes]
+    stats = {
+        "iterations": iterations,
+        "stop_reason": stop_reason,
+        "elapsed_ms": (perf_counter() - started) * 1000.0,
+        "construction_cost": construction_cost,
+        "local_search_moves": ls_moves,
+        "polished_routes": polished,
+        "route_costs": best.costs[:],
+        "loads": best.loads[:],
+        "unassigned": sorted(n - V for n in best.unassigned),
+    }
+    if defer_polish:
+        stats["polish_jobs"] = deferred
+    return routes, best_cost, stats
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+"""
+Bulk matching of provider incidents to a route's stops and legs.
+
+Provider incidents are polylines: a TomTom geometry is a GeoJSON Point
+or LineString in [lng, lat] order. A route is the polyline
+coords[0] -> coords[1] -> ... (coords are (lat, lng), coords[0] is the
+driver). Everything is projected to one local km plane, and then
+
+  - every incident polyline is densified to points LEG_RADIUS_KM / 2
+    apart, so distances to points stand in for distances to segments;
+  - every route leg is sampled every SAMPLE_KM; the affected fraction of
+    a leg for an incident is the share of its samples within
+    LEG_RADIUS_KM of the incident (one KD-tree range join for all
+    incidents and legs);
+  - the nearest stop of an incident is the nearest stop to any of its
+    points (one KD-tree query over all points).
+
+There are no Python loops over incident x stop pairs, so city-wide tiles
+with hundreds of incidents stay cheap.
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from .distance import planar
+
+# an incident this close to a leg's road counts as on it (km)
+LEG_RADIUS_KM = 0.05
+# leg sampling step (km), and the most samples one leg gets
+SAMPLE_KM = 0.05
+MAX_SAMPLES_PER_LEG = 200
+
+
+class IncidentMatch:
+    """
+    Result of `match_incidents` for I incidents over a route of L legs:
+      - stop[i]:         nearest stop (index into coords, >= 1; -1 if none)
+      - stop_km[i]:      distance from the incident to that stop
+      - leg_fraction[i, l]: share of leg l (coords[l] -> coords[l + 1])
+                         within LEG_RADIUS_KM of the incident
+    """
+
+    def __init__(self, stop: np.ndarray, stop_km: np.ndarray, leg_fraction: np.ndarray):
+        self.stop = stop
+        self.stop_km = stop_km
+        self.leg_fraction = leg_fraction
+
+    def __len__(self):
+        return len(self.stop)
+
+
+def incident_polyline(incident: Dict) -> np.ndarray:
+    """(k, 2) (lat, lng) points of a provider incident; empty if it has no usable geometry."""
+    geom = incident.get("geometry", {}) or {}
+    points = geom.get("coordinates") or []
+    kind = geom.get("type")
+
+    # a Point is one [lng, lat] pair, a LineString a list of them
+    if kind == "Point" or (len(points) >= 2 and not isinstance(points[0], (list, tuple))):
+        points = [points]
+    try:
+        lnglat = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    except (TypeError, ValueError):
+        return np.empty((0, 2))
+    return lnglat[:, ::-1]
+
+
+def _densify(lines: List[np.ndarray], step: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Points along every polyline of `lines` at most `step` apart, and the line of each."""
+    a_parts, b_parts, owners, tails, tail_owner = [], [], [], [], []
+    for k, line in enumerate(lines):
+        if len(line) == 0:
+            continue
+        a_parts.append(line[:-1])
+        b_parts.append(line[1:])
+        owners.append(np.full(len(line) - 1, k))
+        tails.append(line[-1:])
+        tail_owner.append(k)
+
+    if not tails:
+        return np.empty((0, 2)), np.empty(0, dtype=np.intp)
+
+    a = np.concatenate(a_parts)
+    b = np.concatenate(b_parts)
+    seg_owner = np.concatenate(owners).astype(np.intp)
+    n_sub = np.maximum(1, np.ceil(np.linalg.norm(b - a, axis=1) / step)).astype(np.intp)
+
+    seg = np.repeat(np.arange(len(a)), n_sub)
+    first = np.cumsum(n_sub) - n_sub
+    t = (np.arange(len(seg)) - first[seg]) / n_sub[seg]
+    points = np.concatenate([a[seg] + t[:, None] * (b - a)[seg], np.concatenate(tails)])
+    owner = np.concatenate([seg_owner[seg], np.asarray(tail_owner, dtype=np.intp)])
+    return points, owner
+
+
+def match_incidents(incidents_raw: List[Dict], coords) -> IncidentMatch:
+    """Match provider incidents to the stops and legs of the route `coords`."""
+    n_inc = len(incidents_raw)
+    pts = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    n_legs = max(len(pts) - 1, 0)
+    stop = np.full(n_inc, -1, dtype=np.intp)
+    stop_km = np.full(n_inc, np.inf)
+    leg_fraction = np.zeros((n_inc, n_legs))
+
+    lines = [incident_polyline(inc) for inc in incidents_raw]
+    sizes = [len(line) for line in lines]
+    if n_inc == 0 or n_legs == 0 or not any(sizes):
+        return IncidentMatch(stop, stop_km, leg_fraction)
+
+    # one plane for the route and every incident point
+    plane = planar(np.vstack([pts] + [line for line in lines if len(line)]), "haversine")
+    route = plane[: len(pts)]
+    offsets = np.cumsum([len(pts)] + sizes)
+    lines = [plane[offsets[k]:offsets[k + 1]] for k in range(n_inc)]
+
+    inc_pts, inc_owner = _densify(lines, LEG_RADIUS_KM / 2)
+
+    # nearest stop (>= 1; 0 is the driver) of every incident
+    dist, near = cKDTree(route[1:]).query(inc_pts)
+    order = np.lexsort((dist, inc_owner))
+    owners = inc_owner[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = owners[1:] != owners[:-1]
+    stop[owners[first]] = near[order[first]] + 1
+    stop_km[owners[first]] = dist[order[first]]
+
+    # legs: sample every leg, then one range join of samples x incident points
+    leg_len = np.linalg.norm(route[1:] - route[:-1], axis=1)
+    n_samples = np.clip(np.ceil(leg_len / SAMPLE_KM), 1, MAX_SAMPLES_PER_LEG).astype(np.intp)
+    leg = np.repeat(np.arange(n_legs), n_samples)
+    first_sample = np.cumsum(n_samples) - n_samples
+    t = (np.arange(len(leg)) + 0.5 - first_sample[leg]) / n_samples[leg]
+    samples = route[:-1][leg] + t[:, None] * (route[1:] - route[:-1])[leg]
+
+    pairs = cKDTree(samples).sparse_distance_matrix(
+        cKDTree(inc_pts), LEG_RADIUS_KM, output_type="ndarray"
+    )
+    if len(pairs):
+        # one hit per (sample, incident), however many incident points it is near
+        hits = np.unique(np.column_stack([pairs["i"], inc_owner[pairs["j"]]]), axis=0)
+        np.add.at(leg_fraction, (hits[:, 1], leg[hits[:, 0]]), 1.0)
+        leg_fraction /= n_samples[None, :]
+
+    return IncidentMatch(stop, stop_km, leg_fraction)
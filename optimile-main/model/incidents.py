@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+"""
+Incident penalties for the route cost.
+
+An incident is a dict
+
+    {
+        "kind": "traffic_jam" | "accident" | "road_closed",
+        "severity": float,             # default 1
+        "index": int,                  # attached to a stop ...
+        "lat": float, "lng": float,    # ... or placed on the map
+        "radius": float,               # reach in km (default 0)
+        "scope": "stop" | "leg",       # default: "stop" with an index,
+                                       #          "leg" with a location
+        "legs": [[src, dst, fraction], ...],  # ... or on these legs only
+    }
+
+A "stop" incident penalizes arriving at every stop within `radius` of it
+(only its own stop at radius 0, the original behaviour). A "leg"
+incident penalizes every leg whose straight segment passes within
+`radius` of it, e.g. a closure on a highway the route would cross.
+
+An incident with "legs" was matched to the road of known legs (live
+incidents, model.incident_match): it penalizes driving between src and
+dst (stop indexes), in either direction since both use the same road,
+by `fraction` of its penalty, the share of the leg it covers, and
+nothing else.
+
+All incidents of a context (the "incidents" list, plus the single legacy
+"incident") are folded once per optimization call into
+
+    stop[b]     summed penalty of arriving at b
+    leg[a, b]   summed penalty of driving a -> b  (None without leg incidents)
+
+so the cost loops pay one array read per leg whatever the incident count.
+"""
+
+from typing import Dict, List
+
+import numpy as np
+
+from .distance import planar
+
+def incident_penalty(incident) -> float:
+    """Cost of one incident hit, from its kind and severity."""
+    kind = incident["kind"]
+    if kind == "traffic_jam":
+        # soft avoidance
+        return incident.get("severity", 1.0) * 35
+    if kind == "accident":
+        # strong avoidance
+        return incident.get("severity", 1.0) * 60
+    if kind == "road_closed":
+        # near-infinite penalty
+        return 200
+    return 0.0
+
+
+def context_incidents(context) -> List[Dict]:
+    """Every incident of `context`: its "incidents" list and the legacy single "incident"."""
+    incidents = list(context.get("incidents") or ())
+    if context.get("incident"):
+        incidents.append(context["incident"])
+    return incidents
+
+
+def _scope(incident) -> str:
+    if incident.get("legs"):
+        return "leg"
+    return incident.get("scope") or ("stop" if incident.get("index") is not None else "leg")
+
+
+def check_incidents(incidents, n_stops: int):
+    """Raise ValueError for an incident with no valid place, radius or scope."""
+    for i, inc in enumerate(incidents):
+        if _scope(inc) not in ("stop", "leg"):
+            raise ValueError(f"incident {i}: unknown scope {inc.get('scope')!r}")
+        index = inc.get("index")
+        if inc.get("legs"):
+            for src, dst, fraction in inc["legs"]:
+                if not (0 <= src < n_stops and 0 <= dst < n_stops):
+                    raise ValueError(f"incident {i}: leg {src} -> {dst} out of range")
+                if not 0 <= fraction <= 1:
+                    raise ValueError(f"incident {i}: leg fraction must be in [0, 1]")
+        elif index is not None:
+            if not 0 <= index < n_stops:
+                raise ValueError(f"incident {i}: stop index {index} out of range")
+        elif inc.get("lat") is None or inc.get("lng") is None:
+            raise ValueError(f"incident {i}: needs a stop index, lat/lng or legs")
+        if (inc.get("radius") or 0.0) < 0:
+            raise ValueError(f"incident {i}: radius must be >= 0")
+
+
+def remap_incidents(context, index_of: Dict[int, int], coords) -> Dict:
+    """
+    Copy of `context` for a sub-problem whose stop ids are `index_of`
+    (old id -> new id). Stop-attached incidents follow their stop; one
+    whose stop is not in the sub-problem is dropped, unless it reaches
+    further (radius or leg scope), in which case it keeps acting from
+    its location. Leg-matched incidents keep the legs with both ends in
+    the sub-problem, and are dropped with none. Located incidents are
+    kept as they are.
+    """
+    incidents = []
+    for inc in context_incidents(context):
+        index = inc.get("index")
+        if inc.get("legs"):
+            legs = [
+                [index_of[int(src)], index_of[int(dst)], fraction]
+                for src, dst, fraction in inc["legs"]
+                if int(src) in index_of and int(dst) in index_of
+            ]
+            if not legs:
+                continue
+            inc = dict(inc, legs=legs)
+            inc.pop("index", None)
+        elif index is not None:
+            new = index_of.get(int(index))
+            if new is not None:
+                inc = dict(inc, index=new)
+            elif (inc.get("radius") or 0.0) > 0 or _scope(inc) == "leg":
+                lat, lng = coords[int(index)]
+                inc = dict(inc, index=None, lat=float(lat), lng=float(lng), scope=_scope(inc))
+            else:
+                continue
+        incidents.append(inc)
+
+    local = dict(context)
+    local.pop("incident", None)
+    local.pop("incidents", None)
+    if incidents:
+        local["incidents"] = incidents
+    return local
+
+
+# =====================================================
+# PENALTY ARRAYS
+# =====================================================
+
+class IncidentPenalties:
+    """Folded incident penalties; `stop_list` / `leg_rows` feed the scalar loops."""
+
+    def __init__(self, stop: np.ndarray, leg=None):
+        self.stop = stop
+        self.leg = leg
+        self._stop_list = None
+        self._leg_rows = None
+
+    @property
+    def stop_list(self):
+        if self._stop_list is None:
+            self._stop_list = self.stop.tolist()
+        return self._stop_list
+
+    @property
+    def leg_rows(self):
+        if self._leg_rows is None and self.leg is not None:
+            self._leg_rows = self.leg.tolist()
+        return self._leg_rows
+
+
+def _segment_hits(a: np.ndarray, b: np.ndarray, centre: np.ndarray, radius: float) -> np.ndarray:
+    """Whether segments a -> b (broadcast (..., 2) arrays) pass within `radius` of `centre`."""
+    d = b - a
+    length2 = (d * d).sum(axis=-1)
+    ac = centre - a
+    t = np.divide((ac * d).sum(axis=-1), length2, out=np.zeros_like(length2), where=length2 > 0)
+    t = np.clip(t, 0.0, 1.0)
+    gap = ac - t[..., None] * d
+    return (gap * gap).sum(axis=-1) <= radius * radius
+
+
+class _LegPenaltyPairs:
+    """Leg penalties computed on demand for fancy-indexed (src, dst) pairs."""
+
+    def __init__(self, pts, leg_incidents, matched=None):
+        self.pts = pts
+        self.leg_incidents = leg_incidents
+        # penalties of matched legs, both ways: sorted src * n + dst keys
+        # and their sums
+        n = len(pts)
+        directed = {}
+        for (a, b), penalty in (matched or {}).items():
+            directed[a, b] = directed[b, a] = penalty
+        self._keys = np.array([src * n + dst for src, dst in sorted(directed)], dtype=np.intp)
+        self._matched = np.array([directed[pair] for pair in sorted(directed)], dtype=np.float64)
+
+    def __getitem__(self, key):
+        src, dst = key
+        a = self.pts[src]
+        b = self.pts[dst]
+        out = np.zeros(a.shape[:-1])
+        for centre, radius, penalty in self.leg_incidents:
+            out += np.where(_segment_hits(a, b, centre, radius), penalty, 0.0)
+        if len(self._keys):
+            keys = np.asarray(src) * len(self.pts) + np.asarray(dst)
+            at = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+            out += np.where(self._keys[at] == keys, self._matched[at], 0.0)
+        # staying put is no leg (the dense table's zero diagonal)
+        return np.where(np.asarray(src) == np.asarray(dst), 0.0, out)
+
+
+def incident_penalties(coords, context, lazy: bool = False) -> IncidentPenalties:
+    """
+    Fold the incidents of `context` over the stops `coords`. Geometry is
+    measured in km on a local plane, whatever the distance mode. With
+    `lazy`, leg penalties are computed per requested pair instead of as
+    an n x n table.
+    """
+    n = len(coords)
+    stop = np.zeros(n)
+    incidents = context_incidents(context)
+    if not incidents:
+        return IncidentPenalties(stop)
+
+    located = [inc for inc in incidents if inc.get("index") is None and not inc.get("legs")]
+    pts = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    if located:
+        extra = np.array([(inc["lat"], inc["lng"]) for inc in located], dtype=np.float64)
+        plane = planar(np.vstack([pts, extra]), "haversine")
+    else:
+        plane = planar(pts, "haversine")
+    where = {id(inc): plane[n + k] for k, inc in enumerate(located)}
+
+    leg_incidents = []
+    # (a, b), a < b -> summed penalty of the matched legs between a and b
+    matched: Dict[tuple, float] = {}
+    for inc in incidents:
+        penalty = incident_penalty(inc)
+        if penalty == 0:
+            continue
+        if inc.get("legs"):
+            # one incident covers a stretch of road once, however many
+            # times (or ways) its legs list it
+            covered: Dict[tuple, float] = {}
+            for src, dst, fraction in inc["legs"]:
+                src, dst = int(src), int(dst)
+                if 0 <= src < n and 0 <= dst < n and src != dst:
+                    pair = (min(src, dst), max(src, dst))
+                    covered[pair] = max(covered.get(pair, 0.0), float(fraction))
+            for pair, fraction in covered.items():
+                matched[pair] = matched.get(pair, 0.0) + penalty * fraction
+            continue
+        index = inc.get("index")
+        radius = float(inc.get("radius") or 0.0)
+
+        if index is not None and not 0 <= index < n:
+            continue
+        centre = plane[index] if index is not None else where[id(inc)]
+
+        if _scope(inc) == "stop":
+            if index is not None and radius <= 0:
+                stop[index] += penalty
+            else:
+                d = plane[:n] - centre
+                stop[(d * d).sum(axis=1) <= radius * radius] += penalty
+        else:
+            leg_incidents.append((centre, radius, penalty))
+
+    if not leg_incidents and not matched:
+        return IncidentPenalties(stop)
+    if lazy:
+        return IncidentPenalties(stop, _LegPenaltyPairs(plane[:n], leg_incidents, matched))
+
+    leg = np.zeros((n, n))
+    a = plane[:n, None, :]
+    b = plane[None, :n, :]
+    for centre, radius, penalty in leg_incidents:
+        leg[_segment_hits(a, b, centre, radius)] += penalty
+    for (a, b), penalty in matched.items():
+        leg[a, b] += penalty
+        leg[b, a] += penalty
+    np.fill_diagonal(leg, 0.0)
+    return IncidentPenalties(stop, leg)
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+"""
+Intra-route local search used to intensify ALNS on new best routes.
+
+Three neighbourhoods, all keeping position 0 (the start) fixed:
+  - relocate: move one stop next to one of its nearest neighbours
+  - Or-opt:   move a segment of 2-3 consecutive stops (either
+              orientation) next to a neighbour of its first/last stop
+  - 2-opt:    reverse a segment so that a stop becomes adjacent to one
+              of its nearest neighbours
+
+Candidates are restricted by k-nearest-neighbour lists (by travel time),
+and every move is one `RouteState.splice_cost` call
+(route[:p] + head + route[q:]), so only the changed part of the route
+and the suffix up to where the schedule re-joins are re-evaluated.
+Moves are applied first-improvement; stop positions come from the
+route's own index (`Route.pos`).
+"""
+
+from time import perf_counter
+from typing import List, Optional
+
+import numpy as np
+
+EPS = 1e-9
+
+
+def neighbour_lists(time_matrix: np.ndarray, k: int = 8) -> List[List[int]]:
+    """For every stop, its `k` closest other stops by travel time."""
+    n = time_matrix.shape[0]
+    k = min(k, n - 1)
+    if k <= 0:
+        return [[] for _ in range(n)]
+
+    t = time_matrix.copy()
+    np.fill_diagonal(t, np.inf)
+    nearest = np.argpartition(t, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(t, nearest, axis=1).argsort(axis=1)
+    return np.take_along_axis(nearest, order, axis=1).tolist()
+
+
+def _segment_moves(route, pos, neighbours, length):
+    """Yield (p, head, q) splices moving route[i:i+length] near a neighbour."""
+    n = len(route)
+
+    for i in range(1, n - length + 1):
+        seg = route[i:i + length]
+        end = i + length
+        orientations = [seg] if length == 1 else [seg, seg[::-1]]
+
+        targets = [pos[c] + 1 for c in neighbours[seg[0]]]   # after c
+        targets += [pos[c] for c in neighbours[seg[-1]]]     # before c
+
+        for t in targets:
+            if t < 1 or i <= t <= end:
+                continue
+            for moved in orientations:
+                if t < i:
+                    yield t, moved + route[t:i], end
+                else:
+                    yield i, route[end:t] + moved, t
+
+
+def relocate(state, neighbours, deadline: Optional[float] = None) -> bool:
+    return _first_improvement(state, neighbours, deadline, (1,))
+
+
+def or_opt(state, neighbours, deadline: Optional[float] = None) -> bool:
+    return _first_improvement(state, neighbours, deadline, (2, 3))
+
+
+def two_opt(state, neighbours, deadline: Optional[float] = None) -> bool:
+    route = state.route
+    pos = route.pos
+    current = state.total
+
+    for i in range(1, len(route)):
+        if deadline is not None and perf_counter() >= deadline:
+            return False
+
+        a = route[i - 1]
+        for c in neighbours[a]:
+            j = pos[c]
+            if j > i:
+                # a -> c: reverse route[i..j]
+                move = (i, route[i:j + 1][::-1], j + 1)
+            elif 1 <= j + 1 < i - 1:
+                # c -> a: reverse route[j+1..i-1]
+                move = (j + 1, route[j + 1:i][::-1], i)
+            else:
+                continue
+
+            if state.splice_cost(*move) < current - EPS:
+                state.splice(*move)
+                return True
+
+    return False
+
+
+def _first_improvement(state, neighbours, deadline, lengths) -> bool:
+    route = state.route
+    pos = route.pos
+    current = state.total
+
+    for length in lengths:
+        for move in _segment_moves(route, pos, neighbours, length):
+            if deadline is not None and perf_counter() >= deadline:
+                return False
+            if state.splice_cost(*move) < current - EPS:
+                state.splice(*move)
+                return True
+
+    return False
+
+
+def improve(
+    state,
+    neighbours,
+    deadline: Optional[float] = None,
+    max_moves: int = 1000,
+) -> int:
+    """
+    Apply improving relocate / Or-opt / 2-opt moves to `state` in place
+    until none is left (a local optimum), the deadline passes or
+    `max_moves` moves were made. Returns the number of moves applied.
+    """
+    moves = 0
+    operators = (relocate, or_opt, two_opt)
+
+    while moves < max_moves:
+        if not any(op(state, neighbours, deadline) for op in operators):
+            break
+        moves += 1
+
+    return moves
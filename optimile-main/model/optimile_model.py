@@ -2,7 +2,6 @@ import pandas as pd
 import numpy as np
 import joblib
 
-from math import radians, sin, cos, sqrt, atan2
 from sklearn.model_selection import train_test_split
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
@@ -10,6 +9,8 @@ from sklearn.preprocessing import OneHotEncoder, StandardScaler
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import r2_score, mean_absolute_error, mean_squared_error
 
+from distance import haversine
+
 # ===============================
 # CONFIG
 # ===============================
@@ -28,23 +29,6 @@ FRAGILE_CATEGORIES = {
 
 RANDOM_STATE = 42
 
-# ===============================
-# GEO
-# ===============================
-
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371.0
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = (
-        sin(dlat / 2) ** 2
-        + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
-    )
-    c = 2 * atan2(sqrt(a), sqrt(1 - a))
-    return R * c
-
-
 # ===============================
 # TRAIN
 # ===============================
@@ -69,14 +53,11 @@ def train_and_save():
     df["pickup_delay"] = df["pickup_delay"].fillna(10)
 
     # -------- Distance --------
-    df["distance_km"] = df.apply(
-        lambda r: haversine(
-            r["Store_Latitude"],
-            r["Store_Longitude"],
-            r["Drop_Latitude"],
-            r["Drop_Longitude"],
-        ),
-        axis=1,
+    df["distance_km"] = haversine(
+        df["Store_Latitude"],
+        df["Store_Longitude"],
+        df["Drop_Latitude"],
+        df["Drop_Longitude"],
     )
 
     # -------- Fragility --------
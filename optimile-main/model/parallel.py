@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+"""
+Multi-start ALNS across a process pool.
+
+Independent ALNS chains with different seeds run in parallel, and the
+best route over all chains wins. The pool is owned by the caller (the
+backend creates one at startup), so no processes are spawned per request.
+
+Optionally the chains exchange solutions: the run is split into epochs
+of `exchange_every` iterations and, after each epoch, the worse half of
+the chains restarts from the best route found so far (the elite).
+"""
+
+import math
+from concurrent.futures import Executor
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+
+from .alns_optimizer import optimize_route
+
+
+def run_chain(kwargs: Dict) -> Tuple[List[int], float, Dict]:
+    """Pool entry point: one ALNS chain (module-level so it pickles)."""
+    return optimize_route(return_stats=True, **kwargs)
+
+
+def multi_start_optimize(
+    coords,
+    fragile_flags,
+    time_windows,
+    context,
+    start_time_min,
+    executor: Optional[Executor] = None,
+    n_chains: int = 4,
+    seed: Optional[int] = None,
+    iters: int = 400,
+    time_limit_ms: Optional[float] = None,
+    max_no_improve: Optional[int] = None,
+    target_gap: Optional[float] = None,
+    exchange_every: Optional[int] = None,
+    initial_route=None,
+    construction: str = "auto",
+):
+    """
+    Run `n_chains` ALNS chains and return (best_route, best_cost, chains).
+
+    `chains` holds per-chain stats (seed, cost, iterations, stop reason,
+    elapsed time, epochs won, construction heuristic and its cost). Chains run on `executor` when given,
+    otherwise one after another in-process. Every chain gets the full
+    iteration / time budget, so wall-clock time matches a single run.
+    """
+    started = perf_counter()
+    base_seed = seed if seed is not None else 42
+    seeds = [base_seed + 7919 * c for c in range(n_chains)]
+
+    epoch_iters = iters
+    if exchange_every:
+        epoch_iters = max(1, min(exchange_every, iters))
+    n_epochs = math.ceil(iters / epoch_iters)
+
+    starts = [initial_route] * n_chains
+    chains = [
+        {
+            "seed": s,
+            "cost": math.inf,
+            "iterations": 0,
+            "stop_reason": None,
+            "elapsed_ms": 0.0,
+            "epochs_won": 0,
+            "construction": None,
+            "construction_cost": None,
+        }
+        for s in seeds
+    ]
+    routes: List[Optional[List[int]]] = [None] * n_chains
+
+    for epoch in range(n_epochs):
+        budget_ms = None
+        if time_limit_ms is not None:
+            budget_ms = time_limit_ms - (perf_counter() - started) * 1000.0
+            if budget_ms <= 0:
+                break
+
+        jobs = [
+            {
+                "coords": coords,
+                "fragile_flags": fragile_flags,
+                "time_windows": time_windows,
+                "context": context,
+                "start_time_min": start_time_min,
+                "iters": min(epoch_iters, iters - epoch * epoch_iters),
+                "seed": seeds[c] + epoch,
+                "time_limit_ms": budget_ms,
+                "max_no_improve": max_no_improve,
+                "target_gap": target_gap,
+                "initial_route": starts[c],
+                "construction": construction,
+            }
+            for c in range(n_chains)
+        ]
+
+        if executor is not None:
+            results = list(executor.map(run_chain, jobs))
+        else:
+            results = [run_chain(job) for job in jobs]
+
+        for c, (route, cost, stats) in enumerate(results):
+            chain = chains[c]
+            chain["iterations"] += stats["iterations"]
+            chain["elapsed_ms"] += stats["elapsed_ms"]
+            chain["stop_reason"] = stats["stop_reason"]
+            if epoch == 0:
+                chain["construction"] = stats["construction"]
+                chain["construction_cost"] = stats["construction_cost"]
+            if cost < chain["cost"]:
+                chain["cost"] = cost
+                routes[c] = route
+
+        elite = min(range(n_chains), key=lambda c: chains[c]["cost"])
+        chains[elite]["epochs_won"] += 1
+
+        # Elite exchange: the worse half restarts from the best route.
+        ranked = sorted(range(n_chains), key=lambda c: chains[c]["cost"])
+        for c in range(n_chains):
+            starts[c] = routes[c]
+        for c in ranked[(n_chains + 1) // 2:]:
+            starts[c] = routes[elite]
+
+        if all(chain["stop_reason"] == "target_gap" for chain in chains):
+            break
+
+    elite = min(range(n_chains), key=lambda c: chains[c]["cost"])
+    return routes[elite], chains[elite]["cost"], chains
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+"""
+Offline road network for shortest-path leg distances.
+
+The graph is a directed CSR adjacency with edge lengths in km over nodes
+given as (lat, lng). Its canonical on-disk form is one `.npz` with the
+arrays
+
+    nodes   (N, 2) float64   node (lat, lng)
+    indptr  (N + 1,) int32   CSR row pointers
+    indices (E,) int32       edge heads
+    length  (E,) float64     edge length in km
+
+(build one from an edge list with `RoadNetwork.from_edges(...).save`; an
+OSM extract has to be converted to this edge list offline). `.npz`
+members cannot be memory-mapped, so `RoadNetwork.load` unpacks them once
+into a `<name>.cache/` directory of `.npy` files and maps those on every
+later start; solver workers then share the pages instead of each parsing
+the archive.
+
+Stops are snapped to their nearest node with a KD-tree; the leg distance
+is snap offset + shortest path + snap offset. Many-to-many tables run
+scipy's multi-source Dijkstra over the distinct snapped sources (or over
+the targets on the reversed graph, when there are fewer of them - a
+driver's column costs one search, not one per stop), in blocks so the
+(sources x N) scratch stays bounded on large graphs. Pairs with no path
+fall back to the "road" estimate (haversine x ROAD_FACTOR).
+
+Select it with context["distance"] = "network"; the network is the one
+at $OPTIMILE_ROAD_NETWORK (see `default_network`).
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+
+from .distance import EARTH_RADIUS_KM, ROAD_FACTOR, haversine
+
+NETWORK_ENV = "OPTIMILE_ROAD_NETWORK"
+
+_ARRAYS = ("nodes", "indptr", "indices", "length")
+
+# bound on the float64 (sources x nodes) Dijkstra output per block
+DIJKSTRA_BLOCK_BYTES = 64 * 2**20
+
+
+class RoadNetwork:
+    def __init__(self, nodes, indptr, indices, length):
+        self.nodes = np.asarray(nodes, dtype=np.float64).reshape(-1, 2)
+        n = len(self.nodes)
+        self.graph = csr_matrix(
+            (np.asarray(length, dtype=np.float64), np.asarray(indices, dtype=np.int32),
+             np.asarray(indptr, dtype=np.int32)),
+            shape=(n, n),
+        )
+
+        # equirectangular plane around the network's mean latitude, km
+        lat0 = np.radians(self.nodes[:, 0].mean()) if n else 0.0
+        self._scale = np.array([1.0, np.cos(lat0)]) * np.radians(1.0) * EARTH_RADIUS_KM
+        self.tree = cKDTree(self.nodes * self._scale)
+        self._reverse = None
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def reverse(self) -> csr_matrix:
+        """The graph with every edge flipped (paths *to* a node), built on first use."""
+        if self._reverse is None:
+            self._reverse = self.graph.transpose().tocsr()
+        return self._reverse
+
+    def _paths(self, sources: np.ndarray, targets: np.ndarray) -> np.ndarray:
+        """Shortest path lengths sources x targets, searching from the smaller side."""
+        if len(targets) < len(sources):
+            return self._search(self.reverse, targets, sources).T
+        return self._search(self.graph, sources, targets)
+
+    def _search(self, graph, sources, targets) -> np.ndarray:
+        paths = np.empty((len(sources), len(targets)))
+        block = max(1, DIJKSTRA_BLOCK_BYTES // (8 * max(len(self), 1)))
+        for lo in range(0, len(sources), block):
+            rows = dijkstra(graph, directed=True, indices=sources[lo:lo + block])
+            paths[lo:lo + block] = rows[:, targets]
+        return paths
+
+    # -------------------------------------------------
+    # Build / persist
+    # -------------------------------------------------
+
+    @classmethod
+    def from_edges(cls, nodes, src, dst, length=None, oneway=None) -> "RoadNetwork":
+        """
+        Build from an edge list. `length` defaults to the haversine length
+        of each edge; edges are two-way unless flagged in `oneway`.
+        """
+        nodes = np.asarray(nodes, dtype=np.float64).reshape(-1, 2)
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        if length is None:
+            length = haversine(nodes[src, 0], nodes[src, 1], nodes[dst, 0], nodes[dst, 1])
+        length = np.asarray(length, dtype=np.float64)
+
+        if oneway is None:
+            back = np.ones(len(src), dtype=bool)
+        else:
+            back = ~np.asarray(oneway, dtype=bool)
+        heads = np.concatenate([src, dst[back]])
+        tails = np.concatenate([dst, src[back]])
+        weights = np.concatenate([length, length[back]])
+
+        # csr_matrix sums duplicate edges; keep the shortest instead
+        order = np.lexsort((weights, tails, heads))
+        heads, tails, weights = heads[order], tails[order], weights[order]
+        first = np.ones(len(heads), dtype=bool)
+        first[1:] = (heads[1:] != heads[:-1]) | (tails[1:] != tails[:-1])
+        heads, tails, weights = heads[first], tails[first], weights[first]
+
+        indptr = np.zeros(len(nodes) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(heads, minlength=len(nodes)), out=indptr[1:])
+        return cls(nodes, indptr, tails.astype(np.int32), weights)
+
+    def save(self, path):
+        np.savez(
+            path,
+            nodes=self.nodes,
+            indptr=self.graph.indptr,
+            indices=self.graph.indices,
+            length=self.graph.data,
+        )
+
+    @classmethod
+    def load(cls, path, mmap: bool = True) -> "RoadNetwork":
+        """Load a `.npz` network, through its memory-mapped `.npy` cache."""
+        path = Path(path)
+        if not mmap:
+            with np.load(path) as data:
+                return cls(*(data[k] for k in _ARRAYS))
+
+        cache = path.with_name(path.name + ".cache")
+        fresh = cache.is_dir() and all(
+            (cache / f"{k}.npy").exists()
+            and (cache / f"{k}.npy").stat().st_mtime >= path.stat().st_mtime
+            for k in _ARRAYS
+        )
+        if not fresh:
+            cache.mkdir(exist_ok=True)
+            with np.load(path) as data:
+                for k in _ARRAYS:
+                    # write-then-rename so a concurrent reader never maps a partial file
+                    tmp = cache / f"{k}.{os.getpid()}.tmp.npy"
+                    np.save(tmp, data[k])
+                    os.replace(tmp, cache / f"{k}.npy")
+
+        return cls(*(np.load(cache / f"{k}.npy", mmap_mode="r") for k in _ARRAYS))
+
+    # -------------------------------------------------
+    # Queries
+    # -------------------------------------------------
+
+    def snap(self, coords) -> Tuple[np.ndarray, np.ndarray]:
+        """Nearest node of each point and the great-circle offset to it in km."""
+        pts = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        _, node = self.tree.query(pts * self._scale)
+        node = np.asarray(node, dtype=np.int64)
+        near = self.nodes[node]
+        offset = haversine(pts[:, 0], pts[:, 1], near[:, 0], near[:, 1])
+        return node, offset
+
+    def table(self, a, b) -> np.ndarray:
+        """(len(a) x len(b)) road distances in km between point lists."""
+        a = np.asarray(a, dtype=np.float64).reshape(-1, 2)
+        b = np.asarray(b, dtype=np.float64).reshape(-1, 2)
+        if len(a) == 0 or len(b) == 0:
+            return np.zeros((len(a), len(b)))
+
+        node_a, off_a = self.snap(a)
+        node_b, off_b = self.snap(b)
+        sources, src_of = np.unique(node_a, return_inverse=True)
+        targets, dst_of = np.unique(node_b, return_inverse=True)
+
+        paths = self._paths(sources, targets)
+        out = off_a[:, None] + paths[np.ix_(src_of, dst_of)] + off_b[None, :]
+
+        # disconnected pairs: road estimate instead of infinity
+        lost = ~np.isfinite(out)
+        if lost.any():
+            ia, ib = np.nonzero(lost)
+            out[ia, ib] = ROAD_FACTOR * haversine(a[ia, 0], a[ia, 1], b[ib, 0], b[ib, 1])
+
+        # a point to itself is free, even when it snaps off-network
+        same = (a[:, None, 0] == b[None, :, 0]) & (a[:, None, 1] == b[None, :, 1])
+        out[same] = 0.0
+        return out
+
+    def pairwise(self, a, b) -> np.ndarray:
+        """Element-wise road distances between broadcast point arrays."""
+        a, b = np.broadcast_arrays(np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64))
+        shape = a.shape[:-1]
+        ua, ia = np.unique(a.reshape(-1, 2), axis=0, return_inverse=True)
+        ub, ib = np.unique(b.reshape(-1, 2), axis=0, return_inverse=True)
+        return self.table(ua, ub)[ia.ravel(), ib.ravel()].reshape(shape)
+
+
+# =====================================================
+# PROCESS-WIDE NETWORK
+# =====================================================
+
+_default: Optional[RoadNetwork] = None
+_default_lock = threading.Lock()
+
+
+def network_path() -> Optional[str]:
+    return os.getenv(NETWORK_ENV) or None
+
+
+def default_network() -> RoadNetwork:
+    """The network at $OPTIMILE_ROAD_NETWORK, loaded once per process."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                path = network_path()
+                if path is None:
+                    raise ValueError(f"road network distance needs ${NETWORK_ENV} to point at a .npz graph")
+                _default = RoadNetwork.load(path)
+    return _default
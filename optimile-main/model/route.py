@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+"""
+Compact route representation for the ALNS inner loop.
+
+A Route keeps the visiting order in an `array('H')` (2 bytes per stop)
+next to an inverse index `pos[stop] -> position` (-1 when the stop is not
+on the route) sized for the whole stop universe. Both buffers are edited
+in place:
+
+  - insert / pop / remove / splice / reverse shift the tail with one
+    memmove and re-index only the positions that moved
+  - remove_many drops a whole destroy set in one compaction pass
+  - assign copies another route into the existing buffers, so the search
+    can keep a scratch route and swap references instead of building a
+    new list every iteration
+
+`index` and `in` are O(1) lookups in `pos`. Slices return `array('H')`,
+which concatenates and reverses like a list, so move construction code
+works unchanged.
+"""
+
+from array import array
+from typing import Iterable, Optional
+
+import numpy as np
+
+NOT_ON_ROUTE = -1
+
+
+class Route:
+    __slots__ = ("stops", "pos")
+
+    def __init__(self, stops: Iterable[int] = (), n_stops: Optional[int] = None):
+        self.stops = array("H", stops)
+        if n_stops is None:
+            n_stops = max(self.stops) + 1 if self.stops else 0
+        self.pos = array("i", [NOT_ON_ROUTE]) * n_stops
+        self._reindex(0)
+
+    def _reindex(self, start: int, end: Optional[int] = None):
+        stops, pos = self.stops, self.pos
+        for i in range(start, len(stops) if end is None else end):
+            pos[stops[i]] = i
+
+    # -------------------------------------------------
+    # Sequence protocol
+    # -------------------------------------------------
+
+    def __len__(self):
+        return len(self.stops)
+
+    def __iter__(self):
+        return iter(self.stops)
+
+    def __getitem__(self, i):
+        return self.stops[i]
+
+    def __contains__(self, stop):
+        return 0 <= stop < len(self.pos) and self.pos[stop] != NOT_ON_ROUTE
+
+    def __eq__(self, other):
+        if isinstance(other, Route):
+            return self.stops == other.stops
+        return list(self.stops) == list(other)
+
+    def __repr__(self):
+        return f"Route({self.stops.tolist()})"
+
+    def __array__(self, dtype=None, copy=None):
+        return np.frombuffer(self.stops, dtype=np.uint16).astype(dtype or np.intp)
+
+    def index(self, stop: int) -> int:
+        p = self.pos[stop] if 0 <= stop < len(self.pos) else NOT_ON_ROUTE
+        if p == NOT_ON_ROUTE:
+            raise ValueError(f"stop {stop} is not on the route")
+        return p
+
+    def tolist(self):
+        return self.stops.tolist()
+
+    # -------------------------------------------------
+    # In-place edits
+    # -------------------------------------------------
+
+    def insert(self, i: int, stop: int):
+        n = len(self.stops)
+        i = min(max(i + n if i < 0 else i, 0), n)
+        self.stops.insert(i, stop)
+        self._reindex(i)
+
+    def pop(self, i: int = -1) -> int:
+        if i < 0:
+            i += len(self.stops)
+        stop = self.stops.pop(i)
+        self.pos[stop] = NOT_ON_ROUTE
+        self._reindex(i)
+        return stop
+
+    def remove(self, stop: int) -> int:
+        return self.pop(self.index(stop))
+
+    def remove_many(self, removed: Iterable[int]):
+        """Drop every stop in `removed` with one compaction pass."""
+        stops, pos = self.stops, self.pos
+        for s in removed:
+            pos[s] = NOT_ON_ROUTE
+
+        w = 0
+        for r in range(len(stops)):
+            s = stops[r]
+            if pos[s] != NOT_ON_ROUTE:
+                stops[w] = s
+                pos[s] = w
+                w += 1
+        del stops[w:]
+
+    def splice(self, p: int, head, q: int):
+        """Replace positions p..q-1 with `head` (route[:p] + head + route[q:])."""
+        stops, pos = self.stops, self.pos
+        for i in range(p, q):
+            pos[stops[i]] = NOT_ON_ROUTE
+
+        if not isinstance(head, array):
+            head = array("H", head)
+        stops[p:q] = head
+        self._reindex(p, p + len(head) if len(head) == q - p else None)
+
+    def reverse(self, i: int, j: int):
+        """Reverse positions i..j-1 in place."""
+        stops = self.stops
+        lo, hi = i, j - 1
+        while lo < hi:
+            stops[lo], stops[hi] = stops[hi], stops[lo]
+            lo += 1
+            hi -= 1
+        self._reindex(i, j)
+
+    def assign(self, other: "Route"):
+        """Become a copy of `other`, reusing this route's buffers."""
+        self.stops[:] = other.stops
+        if len(self.pos) == len(other.pos):
+            self.pos[:] = other.pos
+        else:
+            self.pos = array("i", other.pos)
+
+    def copy(self) -> "Route":
+        clone = Route.__new__(Route)
+        clone.stops = array("H", self.stops)
+        clone.pos = array("i", self.pos)
+        return clone
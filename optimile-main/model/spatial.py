@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+"""
+Uniform-grid spatial index over 2-D points.
+
+Points are bucketed into square cells once; radius and k-nearest queries
+only look at the cells around the query point. Coordinates are used as
+given (the same planar lat/lng space as the default travel matrix), so
+radii are in coordinate units.
+
+Queries never walk past the box of occupied cells, so a query costs at
+most one sweep of that box even for degenerate point sets (all stops on
+one street, or on one spot).
+"""
+
+import math
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+Cell = Tuple[int, int]
+
+
+class GridIndex:
+    def __init__(self, points: Sequence[Tuple[float, float]], cell_size: float = None):
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        n = len(self.points)
+
+        if cell_size is None:
+            # about one point per cell on average; collinear points have no
+            # area, so never below one point per cell along the longer side
+            if n:
+                extent = self.points.max(axis=0) - self.points.min(axis=0)
+                area = float(extent[0] * extent[1])
+                cell_size = max(math.sqrt(area / n), float(extent.max()) / n)
+            else:
+                cell_size = 1.0
+        self.cell_size = max(float(cell_size), 1e-9)
+
+        self.cells: Dict[Cell, List[int]] = {}
+        keys = self._cell_of(self.points)
+        for idx, key in enumerate(map(tuple, keys.tolist())):
+            self.cells.setdefault(key, []).append(idx)
+
+        # box of occupied cells (empty when there are no points)
+        if n:
+            self.lo = tuple(int(v) for v in keys.min(axis=0))
+            self.hi = tuple(int(v) for v in keys.max(axis=0))
+        else:
+            self.lo, self.hi = (0, 0), (-1, -1)
+
+    def _cell_of(self, pts: np.ndarray) -> np.ndarray:
+        return np.floor(pts / self.cell_size).astype(np.int64)
+
+    def _rings(self, cx: int, cy: int) -> Tuple[int, int]:
+        """First and last ring around (cx, cy) that meet the occupied box."""
+        (x0, y0), (x1, y1) = self.lo, self.hi
+        first = max(0, x0 - cx, cx - x1, y0 - cy, cy - y1)
+        last = max(cx - x0, x1 - cx, cy - y0, y1 - cy)
+        return first, last
+
+    def _ring(self, cx: int, cy: int, r: int):
+        """Cells of the occupied box at Chebyshev distance exactly r from (cx, cy)."""
+        if r == 0:
+            yield cx, cy
+            return
+        (x0, y0), (x1, y1) = self.lo, self.hi
+        low = y0 <= cy - r <= y1
+        high = y0 <= cy + r <= y1
+        for x in range(max(cx - r, x0), min(cx + r, x1) + 1):
+            if low:
+                yield x, cy - r
+            if high:
+                yield x, cy + r
+        left = x0 <= cx - r <= x1
+        right = x0 <= cx + r <= x1
+        for y in range(max(cy - r + 1, y0), min(cy + r - 1, y1) + 1):
+            if left:
+                yield cx - r, y
+            if right:
+                yield cx + r, y
+
+    def within(self, point, radius: float) -> List[int]:
+        """Indices of points within `radius` of `point`, nearest first."""
+        x, y = float(point[0]), float(point[1])
+        reach = int(math.ceil(radius / self.cell_size))
+        cx, cy = (int(v) for v in self._cell_of(np.array([x, y])))
+        first, last = self._rings(cx, cy)
+
+        found = []
+        for r in range(first, min(reach, last) + 1):
+            for cell in self._ring(cx, cy, r):
+                found.extend(self.cells.get(cell, ()))
+        if not found:
+            return []
+
+        idx = np.asarray(found)
+        d = np.hypot(self.points[idx, 0] - x, self.points[idx, 1] - y)
+        keep = d <= radius
+        return idx[keep][np.argsort(d[keep], kind="stable")].tolist()
+
+    def nearest(self, point, k: int) -> List[int]:
+        """The `k` points closest to `point`, nearest first."""
+        n = len(self.points)
+        k = min(k, n)
+        if k <= 0:
+            return []
+
+        x, y = float(point[0]), float(point[1])
+        cx, cy = (int(v) for v in self._cell_of(np.array([x, y])))
+
+        found: List[int] = []
+        r, last = self._rings(cx, cy)
+        # once k candidates are in, one more ring makes the result exact
+        while len(found) < k or r <= math.ceil(self._kth_distance(found, x, y, k) / self.cell_size):
+            for cell in self._ring(cx, cy, r):
+                found.extend(self.cells.get(cell, ()))
+            r += 1
+            if len(found) == n or r > last:
+                break
+
+        idx = np.asarray(found)
+        d = np.hypot(self.points[idx, 0] - x, self.points[idx, 1] - y)
+        return idx[np.argsort(d, kind="stable")[:k]].tolist()
+
+    def _kth_distance(self, found: List[int], x: float, y: float, k: int) -> float:
+        idx = np.asarray(found)
+        d = np.hypot(self.points[idx, 0] - x, self.points[idx, 1] - y)
+        return float(np.partition(d, k - 1)[k - 1])
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+"""
+Time-dependent travel times (Ichoua-Gendreau-Laporte model).
+
+The day is cut into buckets, and each bucket has its own travel-time
+multiplier: 1.0 means free flow at the vehicle speed, and 1.35 matches the
+old "Heavy" level. A leg that takes `base` free-flow minutes is driven at
+the multiplier of every bucket it crosses. Its duration is therefore
+piecewise linear in the departure time, and a later departure never
+arrives earlier (FIFO). FIFO keeps waits absorbing schedule shifts, so
+RouteState's incremental evaluation stays exact.
+
+Lookups run on arrays precomputed per zone:
+    bounds[i]    bucket boundaries, in minutes of the day (0 .. 1440)
+    progress[i]  free-flow minutes covered from midnight to bounds[i]
+A departure maps to its progress, the leg adds `base`, and the inverse map
+gives the arrival time. Scalar code does this with two bisects per leg
+(one when the leg ends inside its bucket); batch code uses searchsorted.
+The profile repeats every day.
+
+Zones are optional. A profile can carry one row of multipliers per zone
+plus the zone centres. A leg uses the zone of the stop it departs from,
+which is the nearest centre.
+"""
+
+import math
+from bisect import bisect_right
+
+import numpy as np
+
+DAY_MIN = 1440.0
+
+
+class SpeedProfile:
+    def __init__(self, starts, multipliers, centres=None):
+        starts = [float(s) for s in starts]
+        if (
+            not starts
+            or starts[0] != 0.0
+            or starts[-1] >= DAY_MIN
+            or any(b <= a for a, b in zip(starts, starts[1:]))
+        ):
+            raise ValueError("bucket starts must rise from 0 and stay below 1440")
+
+        mult = np.atleast_2d(np.asarray(multipliers, dtype=np.float64))
+        if mult.ndim != 2 or mult.shape[1] != len(starts):
+            raise ValueError("need one multiplier per bucket (per zone)")
+        if not np.all(mult > 0):
+            raise ValueError("multipliers must be positive")
+
+        if centres is not None:
+            centres = np.asarray(centres, dtype=np.float64).reshape(-1, 2)
+            if len(centres) != len(mult):
+                raise ValueError("need one centre per zone")
+        elif len(mult) != 1:
+            raise ValueError("zoned profiles need zone centres")
+
+        n_zones, n_buckets = mult.shape
+        bounds = np.array(starts + [DAY_MIN])
+        progress = np.zeros((n_zones, n_buckets + 1))
+        progress[:, 1:] = np.cumsum(np.diff(bounds) / mult, axis=1)
+
+        self.bounds = bounds
+        self.multipliers = mult
+        self.progress = progress
+        self.day = progress[:, -1].copy()
+        self.centres = centres
+        self.min_multiplier = float(mult.min())
+
+        # plain lists for the scalar lookups
+        self._bounds = bounds.tolist()
+        self._mult = mult.tolist()
+        self._progress = progress.tolist()
+        self._day = self.day.tolist()
+
+        # all zones' progress rows in one ascending array (row z shifted by
+        # z * stride), so a batch inverts with a single searchsorted
+        self._stride = float(self.day.max()) + 1.0
+        self._flat = (progress + np.arange(n_zones)[:, None] * self._stride).ravel()
+
+    @classmethod
+    def hourly(cls, multipliers, centres=None) -> "SpeedProfile":
+        """24 buckets of one hour each."""
+        return cls([60.0 * h for h in range(24)], multipliers, centres)
+
+    def __len__(self):
+        return self.multipliers.shape[1]
+
+    def zones_for(self, coords) -> np.ndarray:
+        """Zone of each point: its nearest centre (all zone 0 without centres)."""
+        pts = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        if self.centres is None:
+            return np.zeros(len(pts), dtype=np.intp)
+        d = ((pts[:, None, :] - self.centres[None, :, :]) ** 2).sum(axis=2)
+        return d.argmin(axis=1).astype(np.intp)
+
+    def travel(self, zone: int, depart: float, base: float) -> float:
+        """Minutes to drive `base` free-flow minutes leaving at `depart`."""
+        bounds = self._bounds
+        mult = self._mult[zone]
+
+        days, r = divmod(depart, DAY_MIN)
+        i = min(bisect_right(bounds, r) - 1, len(mult) - 1)
+        t = base * mult[i]
+        if r + t <= bounds[i + 1]:
+            return t
+
+        prog = self._progress[zone]
+        p = prog[i] + (r - bounds[i]) / mult[i] + base
+        more, p = divmod(p, self._day[zone])
+        j = min(bisect_right(prog, p) - 1, len(mult) - 1)
+        arrival = (days + more) * DAY_MIN + bounds[j] + (p - prog[j]) * mult[j]
+        return arrival - depart
+
+    def bucket_room(self, depart: float, travel: float):
+        """
+        How far a leg's departure can move earlier / later while the leg
+        stays inside one bucket, and so keeps its duration exactly;
+        (-inf, -inf) for a leg that crosses a bucket boundary.
+        """
+        bounds = self._bounds
+        r = depart % DAY_MIN
+        i = min(bisect_right(bounds, r) - 1, len(bounds) - 2)
+        hi = bounds[i + 1] - (r + travel)
+        if hi < 0:
+            return -math.inf, -math.inf
+        return r - bounds[i], hi
+
+    def travel_array(self, zones, depart, base) -> np.ndarray:
+        """Vectorized `travel` over matching arrays."""
+        zones = np.asarray(zones, dtype=np.intp)
+        depart = np.asarray(depart, dtype=np.float64)
+        base = np.asarray(base, dtype=np.float64)
+        last = len(self) - 1
+
+        days, r = np.divmod(depart, DAY_MIN)
+        i = np.minimum(np.searchsorted(self.bounds, r, side="right") - 1, last)
+        m = self.multipliers[zones, i]
+        t = base * m
+        fits = r + t <= self.bounds[i + 1]
+        if fits.all():
+            return t
+
+        p = self.progress[zones, i] + (r - self.bounds[i]) / m + base
+        more, p = np.divmod(p, self.day[zones])
+        shift = zones * self._stride
+        j = np.searchsorted(self._flat, p + shift, side="right") - 1 - zones * (last + 2)
+        j = np.clip(j, 0, last)
+        arrival = (
+            (days + more) * DAY_MIN
+            + self.bounds[j]
+            + (p - self.progress[zones, j]) * self.multipliers[zones, j]
+        )
+        return np.where(fits, t, arrival - depart)
@@ -8,118 +8,537 @@ call a REAL traffic / incident API (e.g. TomTom, HERE, Google Routes).
 
 We keep the interface simple:
 
-    fetch_incidents_along_route(coords) -> List[dict]
+    provider = TrafficProvider()
+    await provider.incidents_along_route(coords) -> List[dict]
 
-Where each returned dict is compatible with the backend Incident model:
+Where each returned dict is an incident of model.incidents:
     {
-        "index": int,          # stop index in the coords list (>= 1)
         "kind": "traffic_jam" | "accident" | "road_closed",
         "severity": float,     # 0..1+
+        "legs": [[src, dst, fraction], ...],  # on the road of these legs ...
+        "index": int,          # ... or near this stop (>= 1)
     }
+
+src and dst index the coords list: leg l of the route is [l, l + 1].
+
+Incidents change on a minute scale, so the provider does not query per
+route. The map is cut into tiles of TILE_DEG x TILE_DEG degrees; a route
+needs the tiles its legs cross, and each tile's raw incidents are
+cached for `ttl_s`. A tile that expired but is younger than `max_stale_s`
+is served as is while it refreshes in the background; only a tile never
+seen (or far too old) makes a route call wait, and concurrent routes
+share that one fetch. A background refresher re-fetches, shortly before
+they expire, the tiles routes asked for in the last `active_s` seconds,
+so the drivers on the road keep reading from memory.
+
+A provider outage must not slow reroutes down:
+  - a caller can bound its wait (`timeout`); a tile still loading past
+    it falls back to its last cached incidents, however old (the fetch
+    goes on and fills the cache for later routes);
+  - a CircuitBreaker stops fetching after repeated failures or timeouts
+    and only lets a single probe through every `reset_s` until one
+    succeeds; meanwhile tiles are served from what is cached;
+  - fetch latency, errors, timeouts and breaker activity are counted in
+    `stats()`.
+
+Raw incidents come from a source: an object with
+
+    enabled                      False -> no incidents at all
+    start() / await close()      called from the API's event loop
+    await fetch(bbox)            TomTom incidentDetails-shaped payload
+                                 {"incidents": [...]} for (south, west,
+                                 north, east); raises on failure
+
+The default is TomTomSource (one pooled httpx.AsyncClient, keep-alive
+connections to the provider). $OPTIMILE_TRAFFIC_SOURCE picks another:
+one of the names in TRAFFIC_SOURCES ("simulated", "replay", "record";
+see model.traffic_sim), or any "package.module:factory", a zero-argument
+callable returning a source.
 """
 
+import asyncio
+import importlib
+import math
 import os
-from typing import List, Dict, Tuple
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
-import requests
+import httpx
+import numpy as np
 
+from .incident_match import match_incidents
 
-def _bbox_for_coords(coords: List[Tuple[float, float]]) -> Tuple[float, float, float, float]:
-    lats = [c[0] for c in coords]
-    lngs = [c[1] for c in coords]
-    return min(lats), min(lngs), max(lats), max(lngs)
+Tile = Tuple[int, int]
 
+# ~5.5 km of latitude; a city-scale route touches a handful of tiles
+TILE_DEG = 0.05
+
+# an incident off the route's legs still counts this close to a stop (km)
+STOP_RADIUS_KM = 0.3
+
+# See: https://developer.tomtom.com/traffic-api/documentation/traffic-incidents
+TOMTOM_URL = "https://api.tomtom.com/traffic/services/5/incidentDetails"
+TOMTOM_FIELDS = (
+    "{incidents{type,geometry{type,coordinates},"
+    "properties{id,iconCategory,magnitudeOfDelay}}}"
+)
+
+# TomTom iconCategory codes we tell apart; the rest count as traffic_jam
+ICON_ACCIDENT = 1
+ICON_ROAD_CLOSED = 8
+
+TRAFFIC_SOURCE_ENV = "OPTIMILE_TRAFFIC_SOURCE"
+
+
+def tile_of(lat: float, lng: float, tile_deg: float = TILE_DEG) -> Tile:
+    return math.floor(lat / tile_deg), math.floor(lng / tile_deg)
+
+
+def tiles_for(coords: Iterable[Tuple[float, float]], tile_deg: float = TILE_DEG) -> Set[Tile]:
+    """Tiles the legs of a route cross: its points' tiles and every tile in between."""
+    points = list(coords)
+    tiles = {tile_of(lat, lng, tile_deg) for lat, lng in points}
+    for a, b in zip(points, points[1:]):
+        tiles.update(_segment_tiles(a, b, tile_deg))
+    return tiles
+
+
+def _segment_tiles(a: Tuple[float, float], b: Tuple[float, float], tile_deg: float) -> Set[Tile]:
+    """Tiles the straight segment a -> b passes through (grid traversal, corners included)."""
+    x, y = a[0] / tile_deg, a[1] / tile_deg
+    dx, dy = b[0] / tile_deg - x, b[1] / tile_deg - y
+    i, j = tile_of(a[0], a[1], tile_deg)
+    end_i, end_j = tile_of(b[0], b[1], tile_deg)
+    step_i = 1 if dx > 0 else -1
+    step_j = 1 if dy > 0 else -1
+    # segment parameter t at the next tile border on each axis, and per tile
+    next_i = (i + (dx > 0) - x) / dx if dx else math.inf
+    next_j = (j + (dy > 0) - y) / dy if dy else math.inf
+    delta_i = abs(1.0 / dx) if dx else math.inf
+    delta_j = abs(1.0 / dy) if dy else math.inf
+
+    tiles = {(i, j)}
+    # one border crossed per step; the count bounds the walk against rounding
+    for _ in range(abs(end_i - i) + abs(end_j - j)):
+        if (i, j) == (end_i, end_j):
+            break
+        if next_i < next_j:
+            i += step_i
+            next_i += delta_i
+        elif next_j < next_i:
+            j += step_j
+            next_j += delta_j
+        else:
+            # through a corner: both side tiles touch the segment
+            tiles.add((i + step_i, j))
+            tiles.add((i, j + step_j))
+            i += step_i
+            j += step_j
+            next_i += delta_i
+            next_j += delta_j
+        tiles.add((i, j))
+    return tiles
+
+
+def tile_bbox(tile: Tile, tile_deg: float = TILE_DEG) -> Tuple[float, float, float, float]:
+    """(south, west, north, east) of a tile."""
+    i, j = tile
+    return i * tile_deg, j * tile_deg, (i + 1) * tile_deg, (j + 1) * tile_deg
 
-def fetch_incidents_along_route(coords: List[Tuple[float, float]]) -> List[Dict]:
-    """
-    Query a real traffic incident API for a bounding box that covers
-    the current route and map the response to our Incident objects.
 
-    This implementation uses the TomTom Traffic Incidents API as an
-    example. You must set the TOMTOM_API_KEY environment variable
-    in your runtime for this to be active.
+class TomTomSource:
     """
-    api_key = os.getenv("TOMTOM_API_KEY")
-    if not api_key or len(coords) < 2:
-        # No live key configured -> no automatic incidents
-        return []
-
-    south, west, north, east = _bbox_for_coords(coords)
-    # TomTom bbox: minLon, minLat, maxLon, maxLat (longitude first)
-    bbox = f"{west},{south},{east},{north}"
-
-    # See: https://developer.tomtom.com/traffic-api/documentation/traffic-incidents
-    url = "https://api.tomtom.com/traffic/services/5/incidentDetails"
-    params = {
-        "bbox": bbox,
-        "key": api_key,
-        "fields": "id,geometry,properties{iconCategory,magnitudeOfDelay,incidentCategory}",
-        "language": "en-GB",
-    }
+    TomTom incidentDetails over one pooled client. Disabled without an
+    API key ($TOMTOM_API_KEY by default).
+    """
+
+    def __init__(self, api_key: Optional[str] = None, client: Optional[httpx.AsyncClient] = None):
+        self.api_key = api_key if api_key is not None else os.getenv("TOMTOM_API_KEY")
+        self.client = client
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.api_key)
+
+    def start(self):
+        if self.client is None:
+            self.client = httpx.AsyncClient()
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
 
-    try:
-        resp = requests.get(url, params=params, timeout=2.5)
+    async def fetch(self, bbox: Tuple[float, float, float, float]) -> Dict:
+        south, west, north, east = bbox
+        params = {
+            # TomTom bbox: minLon, minLat, maxLon, maxLat (longitude first)
+            "bbox": f"{west},{south},{east},{north}",
+            "key": self.api_key,
+            "fields": TOMTOM_FIELDS,
+            "language": "en-GB",
+        }
+        resp = await self.client.get(TOMTOM_URL, params=params)
         resp.raise_for_status()
-    except Exception as exc:
-        # Never break optimization because the traffic API failed
-        print(f"[TRAFFIC] incident API error: {exc}")
-        return []
+        return resp.json()
 
-    data = resp.json()
-    incidents_raw = data.get("incidents", []) or []
 
+# $OPTIMILE_TRAFFIC_SOURCE short names -> "module:factory"
+TRAFFIC_SOURCES = {
+    "tomtom": "model.traffic_provider:TomTomSource",
+    "simulated": "model.traffic_sim:simulated_from_env",
+    "replay": "model.traffic_sim:replay_from_env",
+    "record": "model.traffic_sim:recording_from_env",
+}
+
+
+def load_source(spec: Optional[str] = None):
+    """Source named by `spec` (a TRAFFIC_SOURCES name or "module:factory"), or TomTom."""
+    spec = spec if spec is not None else os.getenv(TRAFFIC_SOURCE_ENV)
+    if not spec:
+        return TomTomSource()
+    spec = TRAFFIC_SOURCES.get(spec, spec)
+    module, _, name = spec.partition(":")
+    if not name:
+        raise ValueError(f"{TRAFFIC_SOURCE_ENV} must look like 'package.module:factory'")
+    return getattr(importlib.import_module(module), name)()
+
+
+class CircuitBreaker:
+    """
+    closed:    every fetch goes through; `failures` failed fetches in a
+               row open the breaker
+    open:      no fetch goes through for `reset_s` seconds
+    half_open: one probe fetch goes through; it closes the breaker on
+               success and opens it again on failure
+    """
+
+    def __init__(self, failures: int = 5, reset_s: float = 30.0, clock=time.monotonic):
+        self.failures = max(1, failures)
+        self.reset_s = reset_s
+        self.clock = clock
+        self.opens = 0
+        self._state = "closed"
+        self._failed = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._state == "open" and self.clock() - self._opened_at >= self.reset_s:
+            self._state = "half_open"
+        return self._state
+
+    def allow(self) -> bool:
+        """May a fetch start now? (takes the probe when half open)"""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def success(self):
+        self._state = "closed"
+        self._failed = 0
+        self._probing = False
+
+    def failure(self):
+        self._failed += 1
+        if self._state == "half_open" or self._failed >= self.failures:
+            if self._state != "open":
+                self.opens += 1
+            self._state = "open"
+            self._opened_at = self.clock()
+        self._probing = False
+
+
+class TrafficProvider:
+    """
+    Tile-cached incidents from a source ($OPTIMILE_TRAFFIC_SOURCE, TomTom
+    by default). Every fetch is cut off after `timeout_s`.
+    """
+
+    def __init__(
+        self,
+        source=None,
+        tile_deg: float = TILE_DEG,
+        ttl_s: float = 120.0,
+        max_stale_s: float = 600.0,
+        active_s: float = 900.0,
+        refresh_every_s: float = 30.0,
+        timeout_s: float = 2.5,
+        max_tiles: int = 4096,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.source = source if source is not None else load_source()
+        self.tile_deg = tile_deg
+        self.ttl_s = ttl_s
+        self.max_stale_s = max_stale_s
+        self.active_s = active_s
+        self.refresh_every_s = refresh_every_s
+        self.timeout_s = timeout_s
+        self.max_tiles = max_tiles
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.fetches = 0
+        self.errors = 0
+        self.timeouts = 0
+        # fetches the breaker refused, and tiles served past a wait or a refusal
+        self.short_circuits = 0
+        self.fallbacks = 0
+        # latency (ms) of the recent fetches, failed ones included
+        self._latency_ms: deque = deque(maxlen=512)
+
+        # tile -> (fetched at, raw provider incidents), LRU order
+        self._tiles: "OrderedDict[Tile, Tuple[float, List[Dict]]]" = OrderedDict()
+        # tile -> time a route last asked for it
+        self._active: Dict[Tile, float] = {}
+        self._flights: Dict[Tile, asyncio.Task] = {}
+        self._refresher: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.source.enabled
+
+    # -------------------------------------------------
+    # Lifecycle (called from the API's event loop)
+    # -------------------------------------------------
+
+    def start(self):
+        """Start the source and the refresher."""
+        self.source.start()
+        if self.enabled and self._refresher is None:
+            self._refresher = asyncio.get_running_loop().create_task(self._refresh_loop())
+
+    async def close(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+        for task in list(self._flights.values()):
+            task.cancel()
+        await self.source.close()
+
+    # -------------------------------------------------
+    # Route queries
+    # -------------------------------------------------
+
+    async def incidents_along_route(
+        self, coords: List[Tuple[float, float]], timeout: Optional[float] = None
+    ) -> List[Dict]:
+        """
+        Incidents near the route, mapped to stop indices (see
+        `_map_incidents`). Waits at most `timeout` seconds (None: as long
+        as a fetch takes) for tiles that are not cached.
+        """
+        if not self.enabled or len(coords) < 2:
+            # No live source configured -> no automatic incidents
+            return []
+
+        now = time.monotonic()
+        tiles = tiles_for(coords, self.tile_deg)
+        waits: Dict[Tile, asyncio.Task] = {}
+        raw: Dict[str, Dict] = {}
+
+        for tile in tiles:
+            self._active[tile] = now
+            entry = self._tiles.get(tile)
+            age = math.inf if entry is None else now - entry[0]
+            if age <= self.ttl_s:
+                self.hits += 1
+            elif age <= self.max_stale_s:
+                # serve stale, refresh behind the request
+                self.stale_hits += 1
+                self._fetch(tile)
+            else:
+                self.misses += 1
+                task = self._fetch(tile)
+                if task is not None:
+                    waits[tile] = task
+                    continue
+                # breaker open: whatever is cached, or nothing
+                self.fallbacks += 1
+                if entry is None:
+                    continue
+            self._tiles.move_to_end(tile)
+            self._collect(entry[1], raw)
+
+        if waits:
+            done, _ = await asyncio.wait(waits.values(), timeout=timeout)
+            for tile, task in waits.items():
+                if task in done:
+                    self._collect(task.result(), raw)
+                    continue
+                self.fallbacks += 1
+                entry = self._tiles.get(tile)
+                if entry is not None:
+                    self._collect(entry[1], raw)
+
+        return _map_incidents(list(raw.values()), coords)
+
+    @staticmethod
+    def _collect(incidents: List[Dict], into: Dict[str, Dict]):
+        # an incident crossing a tile border comes back from both tiles
+        for inc in incidents:
+            into[str(_incident_id(inc) or id(inc))] = inc
+
+    def _fetch(self, tile: Tile) -> Optional[asyncio.Task]:
+        """The tile's in-flight fetch, started if there is none (None if the breaker is open)."""
+        task = self._flights.get(tile)
+        if task is None:
+            if not self.breaker.allow():
+                self.short_circuits += 1
+                return None
+            task = asyncio.get_running_loop().create_task(self._fetch_tile(tile))
+            self._flights[tile] = task
+            task.add_done_callback(lambda _, tile=tile: self._flights.pop(tile, None))
+        return task
+
+    async def _fetch_tile(self, tile: Tile) -> List[Dict]:
+        """Fetch and cache one tile; on error keep what is cached (or nothing)."""
+        self.fetches += 1
+        started = time.monotonic()
+        try:
+            payload = await asyncio.wait_for(
+                self.source.fetch(tile_bbox(tile, self.tile_deg)), self.timeout_s
+            )
+            incidents = payload.get("incidents", []) or []
+        except Exception as exc:
+            # Never break optimization because the traffic API failed
+            self._latency_ms.append(1000.0 * (time.monotonic() - started))
+            self.errors += 1
+            if isinstance(exc, (asyncio.TimeoutError, httpx.TimeoutException)):
+                self.timeouts += 1
+            self.breaker.failure()
+            print(f"[TRAFFIC] incident API error tile={tile}: {str(exc) or type(exc).__name__}")
+            entry = self._tiles.get(tile)
+            return entry[1] if entry is not None else []
+
+        self._latency_ms.append(1000.0 * (time.monotonic() - started))
+        self.breaker.success()
+        self._tiles[tile] = (time.monotonic(), incidents)
+        self._tiles.move_to_end(tile)
+        while len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+        return incidents
+
+    # -------------------------------------------------
+    # Background refresh
+    # -------------------------------------------------
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_every_s)
+            try:
+                await self.refresh_active()
+            except Exception as exc:
+                print(f"[TRAFFIC] refresh error: {exc}")
+
+    async def refresh_active(self):
+        """Re-fetch active tiles that expire before the next refresh round."""
+        now = time.monotonic()
+        for tile, seen in list(self._active.items()):
+            if now - seen > self.active_s:
+                del self._active[tile]
+
+        due = []
+        for tile in self._active:
+            entry = self._tiles.get(tile)
+            if entry is None or now - entry[0] > self.ttl_s - self.refresh_every_s:
+                task = self._fetch(tile)
+                if task is not None:
+                    due.append(task)
+        if due:
+            await asyncio.gather(*due)
+
+    def stats(self) -> Dict[str, object]:
+        latency = np.asarray(self._latency_ms)
+        p50, p95 = np.percentile(latency, [50, 95]) if len(latency) else (0.0, 0.0)
+        return {
+            "enabled": self.enabled,
+            "tiles": len(self._tiles),
+            "active_tiles": len(self._active),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "fetches": self.fetches,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "short_circuits": self.short_circuits,
+            "fallbacks": self.fallbacks,
+            "breaker": self.breaker.state,
+            "breaker_opens": self.breaker.opens,
+            "latency_p50_ms": round(float(p50), 1),
+            "latency_p95_ms": round(float(p95), 1),
+            "latency_max_ms": round(float(latency.max()), 1) if len(latency) else 0.0,
+        }
+
+
+def _incident_id(inc: Dict):
+    # incidentDetails keeps the id in properties; older payloads at the top
+    return (inc.get("properties", {}) or {}).get("id") or inc.get("id")
+
+
+def _incident_kind(props: Dict) -> str:
+    """Internal kind of a provider incident (iconCategory, or a category name)."""
+    icon = props.get("iconCategory")
+    if icon == ICON_ACCIDENT:
+        return "accident"
+    if icon == ICON_ROAD_CLOSED:
+        return "road_closed"
+
+    cat = str(props.get("incidentCategory", "") or "").lower()
+    if "accident" in cat:
+        return "accident"
+    if "road" in cat and "closed" in cat:
+        return "road_closed"
+    return "traffic_jam"
+
+
+def _map_incidents(incidents_raw: List[Dict], coords: List[Tuple[float, float]]) -> List[Dict]:
+    """
+    Raw TomTom incidents -> Incident dicts on the route (model.incident_match).
+
+    An incident on the legs of the route carries, in "legs", every leg
+    it touches as (src, dst) indexes into `coords` with the affected
+    share of the leg, and is costed on those legs only; one off the legs
+    but within STOP_RADIUS_KM of a stop is attached to that stop. Any
+    other incident of the tile is not on this route and is dropped.
+    """
+    match = match_incidents(incidents_raw, coords)
     mapped: List[Dict] = []
 
-    for inc in incidents_raw:
+    for k, inc in enumerate(incidents_raw):
         props = inc.get("properties", {}) or {}
         mag = float(props.get("magnitudeOfDelay", 0.0) or 0.0)
-        cat = str(props.get("incidentCategory", "") or "").lower()
-
         # Map provider-specific categories to our internal ones
-        if "accident" in cat:
-            kind = "accident"
-        elif "road" in cat and "closed" in cat:
-            kind = "road_closed"
-        else:
-            kind = "traffic_jam"
+        kind = _incident_kind(props)
 
-        # crude nearest-stop mapping: pick the closest stop index >= 1
-        geom = inc.get("geometry", {}) or {}
-        points = geom.get("coordinates") or []
-        if not points:
-            continue
+        severity = max(0.1, min(1.0, mag / 5.0))
+        incident = {"kind": kind, "severity": float(severity)}
 
-        # TomTom coordinates are [lng, lat]; pick first point
-        first_point = points[0]
-        if not isinstance(first_point, (list, tuple)) or len(first_point) < 2:
-            continue
-        lng_i, lat_i = float(first_point[0]), float(first_point[1])
-
-        best_idx = None
-        best_dist2 = None
-        for idx, (lat, lng) in enumerate(coords):
-            if idx == 0:
-                # idx 0 is vehicle position; we only penalize downstream stops
-                continue
-            d2 = (lat - lat_i) ** 2 + (lng - lng_i) ** 2
-            if best_idx is None or d2 < best_dist2:
-                best_idx = idx
-                best_dist2 = d2
-
-        if best_idx is None:
+        fractions = match.leg_fraction[k]
+        legs = np.flatnonzero(fractions)
+        if len(legs):
+            # leg l drives coords[l] -> coords[l + 1]
+            incident["legs"] = [
+                [int(leg), int(leg) + 1, round(float(fractions[leg]), 3)] for leg in legs
+            ]
+        elif match.stop_km[k] <= STOP_RADIUS_KM:
+            incident["index"] = int(match.stop[k])
+        else:
             continue
-
-        severity = max(0.1, min(1.0, mag / 5.0))
-        mapped.append(
-            {
-                "index": int(best_idx),
-                "kind": kind,
-                "severity": float(severity),
-            }
-        )
+        mapped.append(incident)
 
     if mapped:
         print(f"[TRAFFIC] live incidents mapped={mapped}")
 
     return mapped
-
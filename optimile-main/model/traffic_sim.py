@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+"""
+Offline incident sources for load and regression testing.
+
+Both plug into TrafficProvider in place of TomTom (see the source
+interface in model.traffic_provider) and answer with TomTom
+incidentDetails-shaped payloads:
+
+    {"incidents": [{"type": "Feature",
+                    "geometry": {"type": "LineString" | "Point",
+                                 "coordinates": [[lng, lat], ...]},
+                    "properties": {"id": str, "iconCategory": int,
+                                   "magnitudeOfDelay": int}}]}
+
+  - SimulatedSource generates incidents in process, about `density` per
+    km2 of the requested bbox. They are a pure function of (seed, bbox,
+    time), so the same run sees the same incidents, and they come and go
+    every `period_s` like real ones (period 0 freezes them).
+  - ReplaySource answers from a file of recorded payloads, per bbox in
+    the order they were recorded; RecordingSource wraps another source
+    and writes such a file when it closes.
+
+Either one behaves like a real provider through a FaultProfile: each call
+takes a log-normal latency, and a share of calls fails with HTTP 503 or
+hangs well past any sane timeout. Select them with
+
+    OPTIMILE_TRAFFIC_SOURCE=simulated
+    OPTIMILE_TRAFFIC_SOURCE=replay
+    OPTIMILE_TRAFFIC_SOURCE=record
+
+and the OPTIMILE_SIM_* / OPTIMILE_REPLAY_PATH / OPTIMILE_RECORD_*
+variables read below.
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+from .distance import EARTH_RADIUS_KM
+from .traffic_provider import ICON_ACCIDENT, ICON_ROAD_CLOSED, TOMTOM_URL, load_source
+
+BBox = Tuple[float, float, float, float]
+
+KM_PER_DEG = EARTH_RADIUS_KM * math.pi / 180.0
+
+# iconCategory -> (share of simulated incidents, magnitudeOfDelay range)
+ICON_JAM = 6
+ICON_ROAD_WORKS = 9
+SIM_KINDS = {
+    ICON_JAM: (0.6, (1, 3)),
+    ICON_ACCIDENT: (0.2, (2, 4)),
+    ICON_ROAD_CLOSED: (0.1, (4, 4)),
+    ICON_ROAD_WORKS: (0.1, (1, 2)),
+}
+# share of incidents reported as a Point rather than a LineString
+POINT_SHARE = 0.2
+# LineString vertices are about this far apart (km)
+SIM_STEP_KM = 0.1
+
+
+def _bbox_key(bbox: BBox) -> str:
+    return ",".join(f"{v:.5f}" for v in bbox)
+
+
+def _seed(*parts) -> int:
+    key = ":".join(str(p) for p in parts).encode()
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+# =========================================================
+# Provider behaviour
+# =========================================================
+
+class FaultProfile:
+    """
+    Latency and failures of a simulated provider call:
+      - latency: log-normal, median `latency_s`, spread `latency_sigma`
+      - error_rate: share of calls answered with HTTP 503
+      - hang_rate: share of calls that take `hang_s` and then time out
+    """
+
+    def __init__(
+        self,
+        latency_s: float = 0.15,
+        latency_sigma: float = 0.5,
+        error_rate: float = 0.0,
+        hang_rate: float = 0.0,
+        hang_s: float = 30.0,
+        seed: int = 0,
+    ):
+        if not (0.0 <= error_rate <= 1.0 and 0.0 <= hang_rate <= 1.0 - error_rate):
+            raise ValueError("error_rate and hang_rate must be shares that sum to at most 1")
+        self.latency_s = latency_s
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang_s = hang_s
+        self.rng = random.Random(seed)
+
+    async def apply(self, bbox: BBox):
+        """Wait like the provider would, then raise if this call fails."""
+        request = httpx.Request("GET", TOMTOM_URL, params={"bbox": _bbox_key(bbox)})
+        roll = self.rng.random()
+        if roll < self.hang_rate:
+            await asyncio.sleep(self.hang_s)
+            raise httpx.ReadTimeout("simulated provider hang", request=request)
+
+        if self.latency_s > 0:
+            await asyncio.sleep(self.rng.lognormvariate(math.log(self.latency_s), self.latency_sigma))
+        if roll < self.hang_rate + self.error_rate:
+            httpx.Response(503, request=request).raise_for_status()
+
+
+def _faults_from_env() -> FaultProfile:
+    return FaultProfile(
+        latency_s=float(os.getenv("OPTIMILE_SIM_LATENCY_MS", 150)) / 1000.0,
+        latency_sigma=float(os.getenv("OPTIMILE_SIM_LATENCY_SIGMA", 0.5)),
+        error_rate=float(os.getenv("OPTIMILE_SIM_ERROR_RATE", 0.0)),
+        hang_rate=float(os.getenv("OPTIMILE_SIM_HANG_RATE", 0.0)),
+        seed=int(os.getenv("OPTIMILE_SIM_SEED", 0)),
+    )
+
+
+# =========================================================
+# Sources
+# =========================================================
+
+class SimulatedSource:
+    """
+    Generated incidents, about `density` per km2 at any time. Each lives
+    `lifetime` periods of `period_s` seconds (period 0: never change).
+    """
+
+    enabled = True
+
+    def __init__(
+        self,
+        density: float = 0.05,
+        period_s: float = 60.0,
+        lifetime: int = 5,
+        seed: int = 0,
+        faults: Optional[FaultProfile] = None,
+        clock=time.time,
+    ):
+        self.density = density
+        self.period_s = period_s
+        self.lifetime = max(1, lifetime)
+        self.seed = seed
+        self.faults = faults if faults is not None else FaultProfile(latency_s=0.0)
+        self.clock = clock
+
+    def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def fetch(self, bbox: BBox) -> Dict:
+        await self.faults.apply(bbox)
+        return self.payload(bbox)
+
+    def payload(self, bbox: BBox) -> Dict:
+        """The incidents of `bbox` right now (no latency, never fails)."""
+        if self.period_s <= 0:
+            return {"incidents": self._born(bbox, 0, self.density)}
+
+        now = int(self.clock() // self.period_s)
+        # the incidents born in the last `lifetime` periods are still on
+        incidents: List[Dict] = []
+        for epoch in range(now - self.lifetime + 1, now + 1):
+            incidents += self._born(bbox, epoch, self.density / self.lifetime)
+        return {"incidents": incidents}
+
+    def _born(self, bbox: BBox, epoch: int, density: float) -> List[Dict]:
+        south, west, north, east = bbox
+        km_lat = KM_PER_DEG
+        km_lng = KM_PER_DEG * math.cos(math.radians(0.5 * (south + north)))
+        area = (north - south) * km_lat * (east - west) * km_lng
+
+        rng = np.random.default_rng(_seed(self.seed, _bbox_key(bbox), epoch))
+        n = rng.poisson(max(area * density, 0.0))
+        icons = list(SIM_KINDS)
+        shares = np.array([SIM_KINDS[icon][0] for icon in icons])
+
+        incidents = []
+        for k in range(n):
+            icon = icons[rng.choice(len(icons), p=shares / shares.sum())]
+            lo, hi = SIM_KINDS[icon][1]
+            lat = rng.uniform(south, north)
+            lng = rng.uniform(west, east)
+
+            if rng.random() < POINT_SHARE:
+                geometry = {"type": "Point", "coordinates": [round(float(lng), 6), round(float(lat), 6)]}
+            else:
+                # a short wiggly road stretch from (lat, lng)
+                steps = int(rng.integers(1, 8))
+                heading = rng.uniform(0.0, 2.0 * math.pi) + np.cumsum(rng.normal(0.0, 0.3, steps))
+                lats = lat + np.concatenate([[0.0], np.cumsum(np.cos(heading))]) * SIM_STEP_KM / km_lat
+                lngs = lng + np.concatenate([[0.0], np.cumsum(np.sin(heading))]) * SIM_STEP_KM / km_lng
+                geometry = {
+                    "type": "LineString",
+                    "coordinates": [[round(float(x), 6), round(float(y), 6)] for x, y in zip(lngs, lats)],
+                }
+
+            incidents.append(
+                {
+                    "type": "Feature",
+                    "geometry": geometry,
+                    "properties": {
+                        "id": f"sim-{_seed(self.seed, _bbox_key(bbox), epoch):x}-{k}",
+                        "iconCategory": icon,
+                        "magnitudeOfDelay": int(rng.integers(lo, hi + 1)),
+                    },
+                }
+            )
+        return incidents
+
+
+class ReplaySource:
+    """
+    Recorded payloads, {"responses": {bbox key: [payload, ...]}} as
+    written by RecordingSource. Every fetch of a bbox returns its next
+    payload, starting over after the last; an unrecorded bbox has none.
+    """
+
+    enabled = True
+
+    def __init__(self, path: str, faults: Optional[FaultProfile] = None):
+        with open(path) as f:
+            self.responses: Dict[str, List[Dict]] = json.load(f)["responses"]
+        self.faults = faults if faults is not None else FaultProfile(latency_s=0.0)
+        self._next: Dict[str, int] = {}
+
+    def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def fetch(self, bbox: BBox) -> Dict:
+        await self.faults.apply(bbox)
+        key = _bbox_key(bbox)
+        recorded = self.responses.get(key)
+        if not recorded:
+            return {"incidents": []}
+        i = self._next.get(key, 0)
+        self._next[key] = (i + 1) % len(recorded)
+        return recorded[i]
+
+
+class RecordingSource:
+    """
+    Pass-through to `source` that keeps every payload for `save`, and
+    saves them to `path` (when given) on close.
+    """
+
+    def __init__(self, source, path: Optional[str] = None):
+        self.source = source
+        self.path = path
+        self.responses: Dict[str, List[Dict]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.source.enabled
+
+    def start(self):
+        self.source.start()
+
+    async def close(self):
+        await self.source.close()
+        if self.path:
+            self.save(self.path)
+
+    async def fetch(self, bbox: BBox) -> Dict:
+        payload = await self.source.fetch(bbox)
+        self.responses.setdefault(_bbox_key(bbox), []).append(payload)
+        return payload
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            json.dump({"responses": self.responses}, f)
+
+
+# =========================================================
+# $OPTIMILE_TRAFFIC_SOURCE factories
+# =========================================================
+
+def simulated_from_env() -> SimulatedSource:
+    return SimulatedSource(
+        density=float(os.getenv("OPTIMILE_SIM_DENSITY", 0.05)),
+        period_s=float(os.getenv("OPTIMILE_SIM_PERIOD_S", 60)),
+        seed=int(os.getenv("OPTIMILE_SIM_SEED", 0)),
+        faults=_faults_from_env(),
+    )
+
+
+def replay_from_env() -> ReplaySource:
+    path = os.getenv("OPTIMILE_REPLAY_PATH")
+    if not path:
+        raise ValueError("OPTIMILE_REPLAY_PATH must name a recorded traffic file")
+    return ReplaySource(path, faults=_faults_from_env())
+
+
+def recording_from_env() -> RecordingSource:
+    """$OPTIMILE_RECORD_SOURCE (TomTom by default), recorded to $OPTIMILE_RECORD_PATH."""
+    path = os.getenv("OPTIMILE_RECORD_PATH")
+    if not path:
+        raise ValueError("OPTIMILE_RECORD_PATH must name the file to record traffic to")
+    spec = os.getenv("OPTIMILE_RECORD_SOURCE", "")
+    if spec == "record":
+        raise ValueError("OPTIMILE_RECORD_SOURCE cannot be the recorder itself")
+    return RecordingSource(load_source(spec), path=path)
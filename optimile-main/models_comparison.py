@@ -11,6 +11,8 @@ from sklearn.pipeline import Pipeline
 from sklearn.neighbors import KNeighborsRegressor
 from sklearn.linear_model import Ridge
 
+from model.distance import haversine
+
 # =========================
 # 1. LOAD DATA
 # =========================
@@ -30,15 +32,6 @@ df = df.dropna(subset=["hour"])
 df["dayofweek"] = df["Order_Date"].dt.dayofweek
 
 # ---- Haversine Distance ----
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371
-    phi1 = np.radians(lat1)
-    phi2 = np.radians(lat2)
-    dphi = np.radians(lat2 - lat1)
-    dlambda = np.radians(lon2 - lon1)
-    a = np.sin(dphi/2)**2 + np.cos(phi1)*np.cos(phi2)*np.sin(dlambda/2)**2
-    return 2 * R * np.arcsin(np.sqrt(a))
-
 df["Distance_km"] = haversine(
     df["Store_Latitude"], df["Store_Longitude"],
     df["Drop_Latitude"], df["Drop_Longitude"]